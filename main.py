@@ -10,6 +10,20 @@ High-level flow:
 - sign in (if credentials provided)
 - open MiniHQ, extract Divine Service Prep and Schedules items
 - create folders and save files according to mapping rules
+
+The work after discovery runs as a pipeline of stages connected by bounded
+queues (see `src.pipeline`), so early months are parsed, highlighted and
+uploaded while later months are still downloading:
+
+    discover -> classify -> download -> parse -> highlight -> upload
+                                          \\-> calendar
+
+Queued downloads are fetched most urgent first (`src.priority`): this and next
+month, serving schedules before DSGs before audio, small files first.
+
+`python main.py <command>` (download, parse, calendar, highlight, upload, all)
+runs only some of the stages with the choices saved by the last interactive
+run, optionally limited with --months / --since; see `parse_args`.
 """
 
 from src.config import (
@@ -29,7 +43,6 @@ from src.config import (
     USE_UI,
 )
 from src.ui import get_user_selection
-from src.browser import init_driver
 from src.actions import (
     fill_input_field,
     submit_form,
@@ -37,42 +50,790 @@ from src.actions import (
     get_webpart_links_by_heading,
     get_webpart_link_elements,
     extract_accordion_items,
+    extract_schedule_sections,
     filter_accordion_items_by_selection,
+    save_url_to_path,
 )
 from src.actions import map_link_to_destination
 from src.actions import list_files_in_dir
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
+from src.links import LinkSelection
+from src import content_store, fs_snapshot
+from src.pipeline import Pipeline
+from src.tracing import span
+from contextlib import nullcontext
 import socket
-from urllib.parse import urlparse
-from selenium.common.exceptions import WebDriverException
+from urllib.parse import urlparse, urljoin
+import threading
 import time
 import os
-import subprocess
 import json
-from src.pdf_tools.highlighter import highlight_names_in_pdf
 
-def sync_to_onedrive():
-    """Uploads the local downloaded directory to OneDrive via Rclone."""
-    from src.config import DSGS_DIR, ONEDRIVE_REMOTE
+# selenium (browser), PyMuPDF (highlighting) and the GUI toolkit are imported
+# where they are first needed, so `python main.py --help` and the terminal
+# path start without loading them.
+
+def sync_to_onedrive(changed_files=None, full=None):
+    """Uploads files to OneDrive via Rclone.
+
+    Only `changed_files` (files created or modified in this run) are uploaded.
+    The whole directory is copied when `changed_files` is None, or when `full`
+    (default: FULL_UPLOAD in .env) is set.
+    """
+    from src.config import DSGS_DIR, ONEDRIVE_REMOTE, FULL_UPLOAD
+    from src.upload import RcloneUploader
+
+    if full is None:
+        full = FULL_UPLOAD
 
     print(f"\n--- Uploading scraped files from '{DSGS_DIR}' to OneDrive ---")
-    
-    if not os.path.exists(DSGS_DIR):
+
+    if not fs_snapshot.exists(DSGS_DIR):
         print(f"Warning: Local directory '{DSGS_DIR}' does not exist yet. Skipping upload.")
         return
 
+    uploader = RcloneUploader(DSGS_DIR, ONEDRIVE_REMOTE)
     try:
-        subprocess.run(
-            ["rclone", "copy", DSGS_DIR, ONEDRIVE_REMOTE, "--progress"],
-            check=True
-        )
-        print("Successfully synced files to OneDrive!")
+        if full or changed_files is None:
+            uploader.sync_all()
+            print("Successfully synced files to OneDrive!")
+            return
+        if not changed_files:
+            print("No files were downloaded or changed in this run. Skipping upload.")
+            return
+        count = uploader.upload_files(changed_files)
+        print(f"Successfully uploaded {count} changed file(s) to OneDrive!")
+        if uploader.server_side_copies:
+            print(f"{uploader.server_side_copies} duplicate(s) were copied on OneDrive instead of uploaded.")
     except Exception as e:
         print(f"Failed to sync to OneDrive: {e}")
 
-def main():
+
+def open_content_store():
+    """Open the dedup store for DSGS_DIR (None when DEDUP_DOWNLOADS is off)."""
+    from src.config import DSGS_DIR, DEDUP_DOWNLOADS
+
+    if not (DEDUP_DOWNLOADS and DSGS_DIR):
+        return None
+    with span("content_store"):
+        return content_store.open_store(DSGS_DIR)
+
+
+def will_be_highlighted(path, user_choices):
+    """True for schedule files the highlight step will rewrite (so their upload must wait)."""
+    lowered = path.lower()
+    return bool(user_choices.get('minister_colors')) and "youth" not in lowered and "senior" not in lowered
+
+
+def wait_for_page(driver, timeout=15):
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    WebDriverWait(driver, timeout).until(lambda d: d.execute_script('return document.readyState') == 'complete')
+
+
+def sign_in(driver):
+    """Click Sign In and fill credentials if provided. Errors are printed, not raised."""
+    try:
+        # click the sign in link (using the exact selector you provided)
+        click_element(driver, SIGNIN_LINK_SELECTOR, SIGNIN_LINK_SELECTOR_TYPE, timeout=10)
+
+        # fill username and password using the exact selectors provided
+        if USERNAME:
+            try:
+                print("Using USERNAME from env:", repr(USERNAME))
+                fill_input_field(driver, [(USERNAME_SELECTOR, USERNAME_SELECTOR_TYPE)], USERNAME, timeout=8)
+                print("Filled username")
+            except Exception as e:
+                print("Could not fill username:", e)
+
+        if PASSWORD:
+            try:
+                pwd_el = fill_input_field(driver, [(PASSWORD_SELECTOR, PASSWORD_SELECTOR_TYPE)], PASSWORD, timeout=8)
+                print("Filled password")
+                # submit using the provided submit selector
+                submitted = submit_form(driver, [(SUBMIT_SELECTOR, SUBMIT_SELECTOR_TYPE)], timeout=6)
+                if submitted:
+                    print("Submitted login form")
+                else:
+                    from selenium.webdriver.common.keys import Keys
+
+                    pwd_el.send_keys(Keys.ENTER)
+                    print("Submitted login form via Enter key")
+            except Exception as e:
+                print("Could not fill/submit password:", e)
+    except Exception as e:
+        print("Login sequence encountered an error:", e)
+
+
+def open_minihq(driver):
+    """Open MiniHQ after login and return (divine_links, schedules_links) link texts."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.common.by import By
+
+    divine_links = []
+    schedules_links = []
+    try:
+        # After submit, wait for a post-login indicator so the browser isn't closed prematurely.
+        try:
+            post_login_wait = WebDriverWait(driver, 20)
+            # Wait until MiniHQ link appears OR the Sign In link disappears (login state changed)
+            post_login_wait.until(
+                lambda d: (
+                    len(d.find_elements(By.CSS_SELECTOR, MINIHQ_LINK_SELECTOR)) > 0
+                    or len(d.find_elements(By.CSS_SELECTOR, SIGNIN_LINK_SELECTOR)) == 0
+                )
+            )
+            print("Detected post-login state or MiniHQ link.")
+        except Exception:
+            print("Timed out waiting for post-login indicator; proceeding anyway.")
+
+        # Click miniHQ link
+        click_element(driver, MINIHQ_LINK_SELECTOR, MINIHQ_LINK_SELECTOR_TYPE, timeout=8)
+        print("Clicked MiniHQ link; waiting for page to load...")
+        # wait for document ready
+        wait_for_page(driver)
+
+        # extract items
+        divine_links = get_webpart_links_by_heading(driver, "Divine Service Prep", timeout=6)
+        schedules_links = get_webpart_links_by_heading(driver, "Schedules", timeout=6)
+
+        if divine_links:
+            print("Divine Service Prep items:")
+            for t in divine_links:
+                print("- ", t)
+        else:
+            print("No Divine Service Prep items found.")
+
+        if schedules_links:
+            print("Schedules items:")
+            for t in schedules_links:
+                print("- ", t)
+        else:
+            print("No Schedules items found.")
+    except Exception as e:
+        print("MiniHQ sequence error:", e)
+    return divine_links, schedules_links
+
+
+def prepare_folders(divine_links, schedules_links, user_choices):
+    """List local DSG files from the configured folder and ensure year/month/subfolders exist."""
+    try:
+        from src.config import DSGS_DIR
+        local_files = list_files_in_dir(DSGS_DIR, "*")
+        print(f"Files in {DSGS_DIR}:")
+        if local_files:
+            for fn in local_files:
+                print("- ", fn)
+        else:
+            print("(no files found)")
+
+        # Extract years from the link texts we found and ensure year folders exist
+        from src.actions import extract_years_from_texts, ensure_year_folders_exist
+
+        years_divine = extract_years_from_texts(divine_links)
+        years_sched = extract_years_from_texts(schedules_links)
+        years = sorted(set(years_divine + years_sched))
+        if years:
+            created, existing = ensure_year_folders_exist(DSGS_DIR, years)
+            if created:
+                print("Created year folders:")
+                for p in created:
+                    print("- ", p)
+            if existing:
+                print("Already existing year folders:")
+                for p in existing:
+                    print("- ", p)
+        else:
+            print("No years extracted from MiniHQ items; no folders changed.")
+
+        # Ensure month folders inside the year folders for each Month Year item
+        from src.actions import extract_month_year_pairs, ensure_month_folders_exist
+
+        month_year_pairs = extract_month_year_pairs(divine_links + schedules_links)
+        if month_year_pairs:
+            created_m, existing_m = ensure_month_folders_exist(DSGS_DIR, month_year_pairs)
+            if created_m:
+                print("Created month folders:")
+                for p in created_m:
+                    print("- ", p)
+            if existing_m:
+                print("Already existing month folders:")
+                for p in existing_m:
+                    print("- ", p)
+        else:
+            print("No month-year pairs found to create month folders.")
+
+
+        # Ensure subfolders inside each month folder. Only create folders for
+        # features the user explicitly selected (avoid premature folder creation).
+        from src.actions import ensure_subfolders_in_months
+        # start with no default core subfolders; add only when requested
+        subfolders = []
+        # include schedule-related folders if user selected them
+        schedules_chosen = user_choices.get('schedules_chosen') or set()
+        if schedules_chosen:
+            # ensure base 'Schedules' plus specific groups if requested
+            subfolders.append('Schedules')
+            if 'youth schedules' in {s.lower() for s in schedules_chosen}:
+                subfolders.append('Youth')
+            if 'seniors schedules' in {s.lower() for s in schedules_chosen}:
+                subfolders.append('Seniors')
+            if 'nacc calendars' in {s.lower() for s in schedules_chosen}:
+                subfolders.append('NACC Calendars')
+
+        created_s, existing_s = ensure_subfolders_in_months(DSGS_DIR, month_year_pairs, subfolders)
+        if created_s:
+            print("Created subfolders:")
+            for p in created_s:
+                print("- ", p)
+        if existing_s:
+            print("Already existing subfolders:")
+            for p in existing_s:
+                print("- ", p)
+    except Exception as e:
+        print("Could not list DSG files or ensure year/month/subfolders:", e)
+
+
+def collect_month_links(driver, heading):
+    """Collect a static list of {'text', 'href'} month links under `heading` (avoids stale elements)."""
+    months = []
+    for item in get_webpart_link_elements(driver, heading, timeout=6):
+        text = item.get('text') or ''
+        href = item.get('href') or ''
+        if href:
+            months.append({'text': text, 'href': href})
+    return months
+
+
+class DownloadRun:
+    """State and stage functions for one run of the download pipeline.
+
+    Stages (worker counts come from `.env`, see `src.config`):
+    - classify: filter page links by the user's choices and map them to a destination
+    - download: save files (several in parallel, using a cookie snapshot from the browser)
+    - parse: read serving schedules and find the user's assignments
+    - calendar: sync assignments to the calendar (single worker)
+    - highlight: highlight minister names in schedule PDFs
+    - upload: push finished files to OneDrive in batches
+    Discovery (browser navigation) runs on the main thread and feeds `classify`.
+    """
+
+    # stage names accepted by --profile ('discover' is the browser work on the main thread)
+    STAGES = ("discover", "classify", "download", "parse", "calendar", "highlight", "upload")
+    # runs in a row a download may fail before it is dropped from the retry list
+    RETRY_RUNS = 5
+
+    def __init__(self, user_choices, profiler=None, stages=None):
+        from src.config import (
+            DSGS_DIR,
+            FULL_UPLOAD,
+            DOWNLOAD_WORKERS,
+            PARSE_WORKERS,
+            HIGHLIGHT_WORKERS,
+            UPLOAD_WORKERS,
+            PIPELINE_QUEUE_SIZE,
+            DOWNLOAD_PRIORITY,
+            ADAPTIVE_CONCURRENCY,
+            DOWNLOAD_MAX_WORKERS,
+            RETRY_MAX_ATTEMPTS,
+            RETRY_ERROR_BUDGET,
+            CIRCUIT_BREAKER_THRESHOLD,
+            CIRCUIT_BREAKER_RESET,
+            DOWNLOAD_RETRY_LIST,
+            DOWNLOAD_MAX_BYTES_PER_SEC,
+            DOWNLOAD_MAX_REQUESTS_PER_SEC,
+            DOWNLOAD_LIMIT_PROFILES,
+        )
+        from src.priority import DownloadPriority
+        from src.ratelimit import AdaptiveLimiter, BandwidthLimiter, parse_limit_profiles
+        from src import retry
+
+        self.user_choices = user_choices
+        # the DSG choices compiled once into a rule table for the classify stage
+        self.selection = LinkSelection(user_choices)
+        self.base_dir = DSGS_DIR
+        # one scandir walk of the archive; existence checks and folder plans use it from here on
+        self.snapshot = None
+        if DSGS_DIR:
+            with span("snapshot"):
+                self.snapshot = fs_snapshot.take_snapshot(DSGS_DIR)
+        # identical downloads are kept once and linked (see src/content_store.py)
+        self.store = open_content_store()
+        # optional src.profiling.StageProfiler wrapped around one stage
+        self.profiler = profiler
+        # stages this run does (see COMMAND_STAGES); files skip the ones left out
+        self.stages = set(stages or self.STAGES)
+        self.lock = threading.Lock()
+        # schedule file paths (saved or existing) handled in this run, in download order
+        self.schedule_files = []
+        # every file created or modified in this run (downloads and highlighting); only these get uploaded
+        self.changed_files = set()
+        self.calendar_results = {}
+        self.failed_uploads = []
+        self.uploaded = 0
+
+        # per-host AIMD window for downloads (and Retry-After holds for page loads);
+        # the download stage gets DOWNLOAD_MAX_WORKERS threads and the window decides how many run
+        self.limiter = None
+        download_workers = DOWNLOAD_WORKERS
+        if ADAPTIVE_CONCURRENCY:
+            self.limiter = AdaptiveLimiter(initial=DOWNLOAD_WORKERS, maximum=DOWNLOAD_MAX_WORKERS)
+            download_workers = DOWNLOAD_MAX_WORKERS
+
+        # global bytes/s and requests/s caps for all download workers (time-of-day profiles);
+        # without limits it only measures, so the throughput report can be used to pick them
+        try:
+            profiles = parse_limit_profiles(DOWNLOAD_LIMIT_PROFILES)
+        except ValueError as e:
+            print(f"Ignoring DOWNLOAD_LIMIT_PROFILES: {e}")
+            profiles = []
+        self.throttle = BandwidthLimiter(DOWNLOAD_MAX_BYTES_PER_SEC, DOWNLOAD_MAX_REQUESTS_PER_SEC, profiles)
+        # retries with backoff for downloads and month pages; one error budget and one
+        # circuit breaker for both, and a list of what still failed for the next run
+        budget = retry.ErrorBudget(RETRY_ERROR_BUDGET)
+        breaker = retry.CircuitBreaker(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_RESET)
+        self.download_policy = retry.RetryPolicy(RETRY_MAX_ATTEMPTS, budget=budget, breaker=breaker)
+        self.page_policy = retry.RetryPolicy(RETRY_MAX_ATTEMPTS, budget=budget, breaker=breaker)
+        self.retry_list = retry.RetryList(DOWNLOAD_RETRY_LIST)
+        self.retries_queued = False
+        # set by `main` when a browser is open: workers that get the sign-in page
+        # instead of a file ask the main thread to sign in again (src/session.py)
+        self.session = None
+        # full paths already handed to the download stage (a retried file may also be on its page again)
+        self.queued_paths = set()
+
+        self.pipeline = Pipeline()
+        q = PIPELINE_QUEUE_SIZE
+        self.pipeline.add_stage("classify", self._stage_func("classify", self.classify), workers=1, queue_size=q)
+        # most urgent file first (DOWNLOAD_PRIORITY); the queue is then unbounded so every
+        # discovered file is ranked, not just the next PIPELINE_QUEUE_SIZE in page order
+        self.priority = DownloadPriority(DOWNLOAD_PRIORITY, base_dir=DSGS_DIR)
+        if self.priority.enabled:
+            self.pipeline.add_stage(
+                "download", self._stage_func("download", self.download), workers=download_workers,
+                queue_size=0, priority=self.priority.key,
+            )
+        else:
+            self.pipeline.add_stage("download", self._stage_func("download", self.download), workers=download_workers, queue_size=q)
+        self.pipeline.add_stage("parse", self._stage_func("parse", self.parse), workers=PARSE_WORKERS, queue_size=q)
+        self.pipeline.add_stage("calendar", self._stage_func("calendar", self.calendar), workers=1, queue_size=q)
+        self.pipeline.add_stage("highlight", self._stage_func("highlight", self.highlight), workers=HIGHLIGHT_WORKERS, queue_size=q)
+        # files are pushed to OneDrive in the background as soon as they are final,
+        # unless a full sync was requested or UPLOAD_WORKERS is 0 (then everything goes at the end)
+        self.background_upload = (
+            "upload" in self.stages and not FULL_UPLOAD and UPLOAD_WORKERS > 0 and bool(DSGS_DIR)
+        )
+        if self.background_upload:
+            from src.config import ONEDRIVE_REMOTE
+            from src.upload import RcloneUploader
+
+            self.uploader = RcloneUploader(DSGS_DIR, ONEDRIVE_REMOTE)
+            self.pipeline.add_stage("upload", self._stage_func("upload", self.upload), workers=UPLOAD_WORKERS, queue_size=q, batch_size=20)
+
+    def _stage_func(self, name, func):
+        if self.profiler is not None and self.profiler.stage == name:
+            return self.profiler.wrap(func)
+        return func
+
+    def profile_section(self, name):
+        """Context manager profiling main-thread work for stage `name` when it is the profiled stage."""
+        if self.profiler is not None and self.profiler.stage == name:
+            return self.profiler.profile()
+        return nullcontext()
+
+    # -----------------------------
+    # stage functions
+    # -----------------------------
+    def classify(self, page):
+        """Turn one discovered page into download tasks."""
+        tasks = []
+        if page['kind'] == 'dsg':
+            self._classify_dsg(page, tasks)
+        else:
+            self._classify_schedules(page, tasks)
+        self._queue_downloads(tasks)
+
+    def _classify_dsg(self, page, tasks):
+        filtered = filter_accordion_items_by_selection(page['items'], self.user_choices, selection=self.selection)
+        if not filtered:
+            print(f"No accordion items found on {page['month']} page for selected filters.")
+            return
+        print(f"Accordion items on {page['month']} page:")
+        for hdr, links in filtered:
+            print(f"- {hdr}")
+            for lt, lh in links:
+                print(f"    - {lt} -> {lh}")
+                self._plan_download(tasks, 'dsg', lt, lh, hdr, page['cookies'])
+
+    def _classify_schedules(self, page, tasks):
+        # schedules page: apply the Schedules filters from the UI
+        sched_sections = page['items']
+        if not sched_sections:
+            print(f"  No schedule sections found on {page['month']}.")
+            return
+        schedules_chosen = self.user_choices.get('schedules_chosen') or set()
+        schedules_sub = self.user_choices.get('schedules_sub') or {}
+        print(f"  Options on {page['month']}:")
+        for title, links in sched_sections:
+            # apply UI filters: user must have requested this section
+            if schedules_chosen and title.lower() not in {s.lower() for s in schedules_chosen}:
+                continue
+            # within a section, if user selected sub-items, filter those
+            subs = schedules_sub.get(title, set()) or schedules_sub.get(title.title(), set())
+            print(f"   - {title}")
+            for lt, lh in links:
+                if subs:
+                    # match by link text in subs (case-insensitive, allow partial)
+                    match = False
+                    for s in subs:
+                        if s.lower() in lt.lower() or s.lower() in (lh or '').lower():
+                            match = True
+                            break
+                    if not match:
+                        continue
+
+                print(f"       -> {lt} -> {lh}")
+                self._plan_download(tasks, 'schedule', lt, lh, title, page['cookies'])
+
+    def _plan_download(self, tasks, kind, link_text, href, header, cookies):
+        try:
+            dest, newname = map_link_to_destination(href, link_text, header, self.base_dir)
+        except Exception:
+            import traceback
+            print("        -> Could not map/save destination/filename:")
+            print(traceback.format_exc())
+            return
+        tasks.append({
+            'kind': kind,
+            'url': href,
+            'dest': dest,
+            'name': newname,
+            'cookies': cookies,
+        })
+
+    def _queue_downloads(self, tasks):
+        """Create the page's missing folders in one batch, then hand the files to the download stage."""
+        if not tasks:
+            return
+        try:
+            fs_snapshot.ensure_dirs(sorted({t['dest'] for t in tasks}))
+        except OSError as e:
+            # save_url_to_path retries per file and reports the failure
+            print(f"Could not create download folders: {e}")
+        for task in tasks:
+            full_path = os.path.join(task['dest'], task['name'])
+            with self.lock:
+                if full_path in self.queued_paths:
+                    continue
+                self.queued_paths.add(full_path)
+            self.pipeline.put("download", task)
+
+    def queue_retries(self, cookies):
+        """Queue the downloads that failed in earlier runs (once, with the first page's cookies)."""
+        if self.retries_queued or "download" not in self.stages:
+            return
+        self.retries_queued = True
+        tasks = []
+        for item in self.retry_list.items("download"):
+            if item.get("failures", 0) >= self.RETRY_RUNS:
+                print(f"Giving up on {item.get('name') or item['url']} after {item['failures']} failed runs ({item.get('error')}).")
+                self.retry_list.done("download", item["url"])
+                continue
+            if item.get("dest") and item.get("name"):
+                tasks.append({
+                    'kind': item.get("task_kind") or 'dsg',
+                    'url': item["url"],
+                    'dest': item["dest"],
+                    'name': item["name"],
+                    'cookies': cookies,
+                })
+        if tasks:
+            print(f"Retrying {len(tasks)} download(s) that failed in an earlier run.")
+            self._queue_downloads(tasks)
+
+    def download(self, task):
+        dest, newname, lh = task['dest'], task['name'], task['url']
+        full_path = os.path.join(dest, newname)
+        with span("download", file=newname):
+            ok, reason = save_url_to_path(
+                lh, dest, newname, cookies=task['cookies'], overwrite=False, limiter=self.limiter,
+                policy=self.download_policy, throttle=self.throttle,
+                reauth=self.session.request if self.session is not None else None,
+            )
+        if ok or reason == 'exists':
+            self.retry_list.done("download", lh)
+        else:
+            self.retry_list.add(
+                "download", lh, reason, kind=reason.split(':', 1)[0], dest=dest, name=newname, task_kind=task['kind'],
+            )
+
+        if task['kind'] == 'dsg':
+            if ok:
+                self._mark_changed(full_path)
+                print(f"        -> Saved: {newname}")
+                print(f"           at: {dest}")
+                self._queue_upload(full_path)
+            elif reason == 'exists':
+                print(f"        -> Skipped (exists): {full_path}")
+            else:
+                print(f"        -> Failed to save ({reason}): {lh}")
+            return
+
+        if ok:
+            self._mark_changed(full_path)
+            base_label = os.path.splitext(newname)[0]
+            display_label = base_label
+            # for Serving files user prefers the 'Serving' short form
+            if base_label.endswith(' Serving Schedule'):
+                display_label = base_label.replace(' Serving Schedule', ' Serving')
+            print(f"        -> File Location <-- {full_path}")
+            print(f"           New Name: <-- {display_label}")
+        elif reason == 'exists':
+            print(f"        -> Skipped (exists): {full_path}")
+        else:
+            print(f"        -> Failed to save ({reason}): {lh}")
+            return
+
+        # record saved or existing schedule so we can still parse and highlight it
+        with self.lock:
+            self.schedule_files.append(full_path)
+        self._after_download(full_path)
+
+    def _after_download(self, path):
+        """Send a saved or existing schedule file to the first stage of this run that wants it."""
+        from tools.read_schedule import is_serving_schedule
+
+        if "parse" in self.stages and is_serving_schedule(path):
+            self.pipeline.put("parse", path)
+        else:
+            self._after_parse(path)
+
+    def _after_parse(self, path):
+        if "highlight" in self.stages and will_be_highlighted(path, self.user_choices):
+            self.pipeline.put("highlight", path)
+        else:
+            self._queue_upload(path)
+
+    def parse(self, path):
+        from tools.read_schedule import process_pdf, get_search_name
+
+        try:
+            query = get_search_name(self.user_choices)
+            matches = process_pdf(path, query, sync=False)
+            with self.lock:
+                self.calendar_results[path] = matches
+            if "calendar" in self.stages:
+                self.pipeline.put("calendar", (path, query, matches))
+        finally:
+            # the file is only read here; pass it on even if parsing failed
+            self._after_parse(path)
+
+    def calendar(self, job):
+        from tools.sync_calendar import sync_assignments
+
+        path, query, matches = job
+        if not query:
+            return
+        with span("calendar", file=os.path.basename(path), assignments=len(matches)):
+            result = sync_assignments(matches, os.path.basename(path), query)
+        print(
+            f"Calendar ({os.path.basename(path)}): {result['created']} created, {result['updated']} updated, "
+            f"{result['adopted']} adopted, {result['unchanged']} unchanged, {result['deleted']} removed, "
+            f"{result['failed']} failed"
+        )
+
+    def highlight(self, path):
+        from src.pdf_tools.highlighter import highlight_names_in_pdf
+
+        name_color_map = self.user_choices.get('minister_colors', {})
+        opacity = self.user_choices.get('highlight_opacity', 0.5)
+        try:
+            print(f"Highlighting: {os.path.basename(path)}")
+            with span("highlight", file=os.path.basename(path)):
+                changed = highlight_names_in_pdf(path, name_color_map, opacity)
+            # False for a schedule highlighted by an earlier run: it is not uploaded again
+            if changed:
+                self._mark_changed(path)
+        finally:
+            # the file is final now; hand it to the upload stage
+            self._queue_upload(path)
+
+    def upload(self, batch):
+        try:
+            with span("upload", files=len(batch)):
+                count = self.uploader.upload_files(batch)
+            with self.lock:
+                self.uploaded += count
+        except Exception as e:
+            print(f"Background upload of {len(batch)} file(s) failed: {e}")
+            with self.lock:
+                self.failed_uploads.extend(batch)
+
+    # -----------------------------
+    # helpers
+    # -----------------------------
+    def _mark_changed(self, path):
+        with self.lock:
+            self.changed_files.add(path)
+
+    def _queue_upload(self, path):
+        with self.lock:
+            changed = path in self.changed_files
+        if changed and self.background_upload:
+            self.pipeline.put("upload", path)
+
+    def finish_uploads(self):
+        """Upload whatever the background stage could not (or everything, when it is disabled)."""
+        if "upload" not in self.stages:
+            return
+        if not self.background_upload:
+            sync_to_onedrive(self.changed_files)
+            return
+        if self.failed_uploads:
+            retry, self.failed_uploads = self.failed_uploads, []
+            try:
+                self.uploaded += self.uploader.upload_files(retry)
+            except Exception as e:
+                print(f"Retrying {len(retry)} failed upload(s) did not work: {e}")
+                self.failed_uploads = retry
+        print(f"Uploaded {self.uploaded} file(s) to OneDrive; {len(self.failed_uploads)} failed.")
+        if self.uploader.server_side_copies:
+            print(f"{self.uploader.server_side_copies} duplicate(s) were copied on OneDrive instead of uploaded.")
+
+    def report_retries(self):
+        """Print the retry counts and save what still failed for the next run."""
+        if "download" in self.stages:
+            print(f"Downloads: {self.download_policy.summary()}.")
+            print(f"Month pages: {self.page_policy.summary()}.")
+        try:
+            self.retry_list.save()
+        except OSError as e:
+            print(f"Could not save the retry list {self.retry_list.path}: {e}")
+            return
+        if len(self.retry_list):
+            print(f"{len(self.retry_list)} failed item(s) saved to {self.retry_list.path}; the next run tries them again.")
+
+    def finish(self, started):
+        """Wait for the queues to drain, close the calendar, upload what is left and print the reports."""
+        # downloads, parsing, calendar, highlighting and uploads keep running until their queues drain
+        print("\n--- Waiting for downloads, calendar sync, highlighting and uploads to finish ---")
+        with span("drain"):
+            self.pipeline.join()
+        found = sum(len(m) for m in self.calendar_results.values())
+        if "calendar" in self.stages:
+            try:
+                from tools.sync_calendar import close_backend
+
+                # Write calendar feeds (ICS backend) and close the sync state store
+                close_backend()
+            except Exception as e:
+                print(f"Calendar sync failed: {e}")
+            print(f"Calendar sync checked {len(self.calendar_results)} schedule(s); {found} assignment(s) found.")
+        elif "parse" in self.stages:
+            print(f"Parsed {len(self.calendar_results)} schedule(s); {found} assignment(s) found (calendar not synced).")
+        if "highlight" in self.stages and not self.user_choices.get('minister_colors'):
+            print("No minister colors defined in UI. Skipping highlighting.")
+
+        # FINAL STEP: Upload the files this run created or changed to OneDrive
+        self.finish_uploads()
+        if self.store is not None:
+            # closing prunes objects the highlighter left unused; the summary includes them
+            content_store.close_stores()
+            if self.store.summary():
+                print(self.store.summary())
+        self.pipeline.report(time.perf_counter() - started)
+        if self.limiter is not None:
+            self.limiter.report()
+        self.throttle.report()
+        self.report_retries()
+        if self.profiler is not None:
+            self.profiler.report()
+
+
+def discover(driver, run, heading, kind, month_filter=None):
+    """Open each month page under `heading` (only the months `month_filter` allows) and feed its links to the pipeline."""
+    pipeline = run.pipeline
+    months = collect_month_links(driver, heading)
+    if month_filter is not None and month_filter.active:
+        # month pages that failed last run are opened again even outside the filter
+        failed_pages = {item['url'] for item in run.retry_list.items("page")}
+        months = [
+            ml for ml in months
+            if month_filter.allows_text(ml['text']) or urljoin(URL, ml['href']) in failed_pages
+        ]
+    if not months:
+        print(f"No {heading} month links found to open.")
+        return
+    for idx, ml in enumerate(months):
+        # a download worker may be waiting for a new sign-in (only this thread can use the browser)
+        refresh_session(driver, run)
+        with pipeline.source("discover"), span("month_page", heading=heading, month=ml['text']):
+            print(f"Processing {heading} month {idx+1}/{len(months)}: {ml['text']}")
+            full = urljoin(URL, ml['href'])
+            if run.limiter is not None:
+                # the browser loads one page at a time; only wait out a Retry-After the downloads got
+                run.limiter.wait_until_open(full)
+            def load_page():
+                driver.get(full)
+                wait_for_page(driver)
+
+            try:
+                run.page_policy.call(load_page, url=full, label=f"{heading} {ml['text']}")
+            except Exception as e:
+                print(f"Could not open month page {ml['text']} ({ml['href']}):", e)
+                run.retry_list.add("page", full, e, kind=getattr(e, 'kind', None), heading=heading, month=ml['text'])
+                continue
+            run.retry_list.done("page", full)
+
+            try:
+                with run.profile_section("discover"):
+                    if kind == 'dsg':
+                        items = extract_accordion_items(driver, timeout=8)
+                    else:
+                        items = extract_schedule_sections(driver, timeout=8)
+                cookies = driver.get_cookies()
+            except Exception as e:
+                print(f"  Error extracting items for {ml['text']}:", e)
+                items, cookies = [], []
+            if cookies:
+                run.queue_retries(cookies)
+
+        pipeline.put("classify", {'kind': kind, 'month': ml['text'], 'items': items, 'cookies': cookies})
+
+        # go back to MiniHQ before processing the next month
+        try:
+            driver.back()
+            wait_for_page(driver, timeout=10)
+            time.sleep(1)
+        except Exception:
+            # if back fails, continue — we will open next month via absolute URL
+            pass
+
+
+def refresh_session(driver, run, wait=0.0):
+    """Sign in again if a download worker asked for new cookies. Returns True when it did."""
+    if run.session is None:
+        return False
+
+    def sign_in_again():
+        driver.get(URL)
+        wait_for_page(driver)
+        with span("login"):
+            sign_in(driver)
+        wait_for_page(driver)
+        return driver.get_cookies()
+
+    return run.session.service(sign_in_again, wait=wait)
+
+
+def keep_session(driver, run):
+    """Keep the browser open while downloads run, signing in again whenever a worker asks."""
+    while not run.pipeline.idle("classify", "download"):
+        refresh_session(driver, run, wait=1.0)
+
+
+def main(user_choices=None, profiler=None, stages=None, month_filter=None):
+    """Run the browser flow. `stages` limits what happens to the downloaded files (default: everything)."""
+    started = time.perf_counter()
     # Try a DNS lookup but continue even if it fails — user requested a simple open-wait-close test
     host = urlparse(URL).hostname
     if host:
@@ -81,18 +842,26 @@ def main():
         except socket.gaierror:
             print(f"DNS resolution failed for host: {host} - continuing to try opening the URL anyway.")
 
-    # Show prompt state and retrieve choices (GUI or Terminal CLI)
-    if USE_UI:
-        print("Launching User Interface...")
-    else:
-        print("USE_UI is set to false. Running in Terminal CLI mode...")
+    if user_choices is None:
+        # Show prompt state and retrieve choices (GUI or Terminal CLI)
+        if USE_UI:
+            print("Launching User Interface...")
+        else:
+            print("USE_UI is set to false. Running in Terminal CLI mode...")
+
+        # Ask user what to extract before starting browser
+        user_choices = get_user_selection()
+
+    from selenium.common.exceptions import WebDriverException
+    from src.browser import init_driver
 
-    # Ask user what to extract before starting browser
-    user_choices = get_user_selection()
+    from src.session import SessionRefresher
 
-    driver = init_driver()
-    # collect schedule file paths during processing so we can parse them after the browser closes
-    schedule_files = []
+    run = DownloadRun(user_choices, profiler=profiler, stages=stages)
+    run.session = SessionRefresher()
+    run.pipeline.start()
+    with span("init_driver"):
+        driver = init_driver()
     try:
         try:
             driver.get(URL)
@@ -100,362 +869,185 @@ def main():
         except WebDriverException as e:
             print("WebDriver failed to load the page:", e)
             print("This is usually a network/DNS issue (net::ERR_NAME_NOT_RESOLVED).")
-            return
-        # After opening the site, try to click Sign In and fill credentials if provided.
-        try:
-            # click the sign in link (using the exact selector you provided)
-            click_element(driver, SIGNIN_LINK_SELECTOR, SIGNIN_LINK_SELECTOR_TYPE, timeout=10)
-
-            # fill username and password using the exact selectors provided
-            if USERNAME:
-                try:
-                    print("Using USERNAME from env:", repr(USERNAME))
-                    fill_input_field(driver, [(USERNAME_SELECTOR, USERNAME_SELECTOR_TYPE)], USERNAME, timeout=8)
-                    print("Filled username")
-                except Exception as e:
-                    print("Could not fill username:", e)
-
-            if PASSWORD:
-                try:
-                    pwd_el = fill_input_field(driver, [(PASSWORD_SELECTOR, PASSWORD_SELECTOR_TYPE)], PASSWORD, timeout=8)
-                    print("Filled password")
-                    # submit using the provided submit selector
-                    submitted = submit_form(driver, [(SUBMIT_SELECTOR, SUBMIT_SELECTOR_TYPE)], timeout=6)
-                    if submitted:
-                        print("Submitted login form")
-                    else:
-                        from selenium.webdriver.common.keys import Keys
+            return run
 
-                        pwd_el.send_keys(Keys.ENTER)
-                        print("Submitted login form via Enter key")
-                except Exception as e:
-                    print("Could not fill/submit password:", e)
-                    submitted = False
-                else:
-                    submitted = True
-        except Exception as e:
-            print("Login sequence encountered an error:", e)
+        # After opening the site, try to click Sign In and fill credentials if provided.
+        with span("login"):
+            sign_in(driver)
 
         # After login attempt (successful or not), click MiniHQ and extract the requested webpart link texts
-        try:
-            # After submit, wait for a post-login indicator so the browser isn't closed prematurely.
-            try:
-                post_login_wait = WebDriverWait(driver, 20)
-                # Wait until MiniHQ link appears OR the Sign In link disappears (login state changed)
-                post_login_wait.until(
-                    lambda d: (
-                        len(d.find_elements(By.CSS_SELECTOR, MINIHQ_LINK_SELECTOR)) > 0
-                        or len(d.find_elements(By.CSS_SELECTOR, SIGNIN_LINK_SELECTOR)) == 0
-                    )
-                )
-                print("Detected post-login state or MiniHQ link.")
-            except Exception:
-                print("Timed out waiting for post-login indicator; proceeding anyway.")
-
-            # Click miniHQ link
-            click_element(driver, MINIHQ_LINK_SELECTOR, MINIHQ_LINK_SELECTOR_TYPE, timeout=8)
-            print("Clicked MiniHQ link; waiting for page to load...")
-            # wait for document ready
-            WebDriverWait(driver, 15).until(lambda d: d.execute_script('return document.readyState') == 'complete')
-
-            # extract items
-            divine_links = get_webpart_links_by_heading(driver, "Divine Service Prep", timeout=6)
-            schedules_links = get_webpart_links_by_heading(driver, "Schedules", timeout=6)
-
-            if divine_links:
-                print("Divine Service Prep items:")
-                for t in divine_links:
-                    print("- ", t)
-            else:
-                print("No Divine Service Prep items found.")
-
-            if schedules_links:
-                print("Schedules items:")
-                for t in schedules_links:
-                    print("- ", t)
-            else:
-                print("No Schedules items found.")
-        except Exception as e:
-            print("MiniHQ sequence error:", e)
+        with span("open_minihq"):
+            divine_links, schedules_links = open_minihq(driver)
+        prepare_folders(divine_links, schedules_links, user_choices)
 
-        # List local DSG files from configured folder and ensure year/month/subfolders exist
+        # Divine Service Prep months first, then Schedules month pages
         try:
-            from src.config import DSGS_DIR, ONEDRIVE_REMOTE
-            local_files = list_files_in_dir(DSGS_DIR, "*")
-            print(f"Files in {DSGS_DIR}:")
-            if local_files:
-                for fn in local_files:
-                    print("- ", fn)
-            else:
-                print("(no files found)")
-
-            # Extract years from the link texts we found and ensure year folders exist
-            from src.actions import extract_years_from_texts, ensure_year_folders_exist
-
-            years_divine = extract_years_from_texts(divine_links)
-            years_sched = extract_years_from_texts(schedules_links)
-            years = sorted(set(years_divine + years_sched))
-            if years:
-                created, existing = ensure_year_folders_exist(DSGS_DIR, years)
-                if created:
-                    print("Created year folders:")
-                    for p in created:
-                        print("- ", p)
-                if existing:
-                    print("Already existing year folders:")
-                    for p in existing:
-                        print("- ", p)
-            else:
-                print("No years extracted from MiniHQ items; no folders changed.")
-
-            # Ensure month folders inside the year folders for each Month Year item
-            from src.actions import extract_month_year_pairs, ensure_month_folders_exist
-
-            month_year_pairs = extract_month_year_pairs(divine_links + schedules_links)
-            if month_year_pairs:
-                created_m, existing_m = ensure_month_folders_exist(DSGS_DIR, month_year_pairs)
-                if created_m:
-                    print("Created month folders:")
-                    for p in created_m:
-                        print("- ", p)
-                if existing_m:
-                    print("Already existing month folders:")
-                    for p in existing_m:
-                        print("- ", p)
-            else:
-                print("No month-year pairs found to create month folders.")
-
-
-            # Ensure subfolders inside each month folder. Only create folders for
-            # features the user explicitly selected (avoid premature folder creation).
-            from src.actions import ensure_subfolders_in_months
-            # start with no default core subfolders; add only when requested
-            subfolders = []
-            # include schedule-related folders if user selected them
-            schedules_chosen = user_choices.get('schedules_chosen') or set()
-            if schedules_chosen:
-                # ensure base 'Schedules' plus specific groups if requested
-                subfolders.append('Schedules')
-                if 'youth schedules' in {s.lower() for s in schedules_chosen}:
-                    subfolders.append('Youth')
-                if 'seniors schedules' in {s.lower() for s in schedules_chosen}:
-                    subfolders.append('Seniors')
-                if 'nacc calendars' in {s.lower() for s in schedules_chosen}:
-                    subfolders.append('NACC Calendars')
-
-            created_s, existing_s = ensure_subfolders_in_months(DSGS_DIR, month_year_pairs, subfolders)
-            if created_s:
-                print("Created subfolders:")
-                for p in created_s:
-                    print("- ", p)
-            if existing_s:
-                print("Already existing subfolders:")
-                for p in existing_s:
-                    print("- ", p)
+            discover(driver, run, "Divine Service Prep", 'dsg', month_filter)
         except Exception as e:
-            print("Could not list DSG files or ensure year/month/subfolders:", e)
-
-        # Open the first Divine Service Prep month link (if any) and extract accordion items
+            print("Error opening Divine Service Prep month or extracting items:", e)
         try:
-            divine_link_elements = get_webpart_link_elements(driver, "Divine Service Prep", timeout=6)
-            if not divine_link_elements:
-                print("No Divine Service Prep month links found to open.")
-            else:
-                # Collect static list of (text, href) to avoid stale element issues
-                month_links = []
-                for item in divine_link_elements:
-                    text = item.get('text') or ''
-                    href = item.get('href') or ''
-                    if href:
-                        month_links.append({'text': text, 'href': href})
-
-                from urllib.parse import urljoin
-
-                for idx, ml in enumerate(month_links):
-                    print(f"Processing month {idx+1}/{len(month_links)}: {ml['text']}")
-                    full = urljoin(URL, ml['href'])
-                    try:
-                        driver.get(full)
-                        WebDriverWait(driver, 15).until(lambda d: d.execute_script('return document.readyState') == 'complete')
-                    except Exception as e:
-                        print(f"Could not open month page {ml['text']} ({ml['href']}):", e)
-                        continue
-
-                    # extract accordion items and filter by user choices
-                    items = extract_accordion_items(driver, timeout=8)
-                    filtered = filter_accordion_items_by_selection(items, user_choices)
-                    if filtered:
-                        print(f"Accordion items on {ml['text']} page:")
-                        for hdr, links in filtered:
-                            print(f"- {hdr}")
-                            for lt, lh in links:
-                                print(f"    - {lt} -> {lh}")
-                                try:
-                                    from src.config import DSGS_DIR
-                                    from src.actions import save_url_to_path
-
-                                    dest, newname = map_link_to_destination(lh, lt, hdr, DSGS_DIR)
-                                    ok, reason = save_url_to_path(lh, dest, newname, driver=driver, overwrite=False)
-                                    if ok:
-                                        print(f"        -> Saved: {newname}")
-                                        print(f"           at: {dest}")
-                                    else:
-                                        if reason == 'exists':
-                                            print(f"        -> Skipped (exists): {os.path.join(dest, newname)}")
-                                        else:
-                                            print(f"        -> Failed to save ({reason}): {lh}")
-                                except Exception as e:
-                                    import traceback
-                                    print("        -> Could not map/save destination/filename:")
-                                    print(traceback.format_exc())
-                    else:
-                        print(f"No accordion items found on {ml['text']} page for selected filters.")
-
-                    # go back to the previous page (MiniHQ) before processing next month, per your request
-                    try:
-                        driver.back()
-                        WebDriverWait(driver, 10).until(lambda d: d.execute_script('return document.readyState') == 'complete')
-                        time.sleep(1)
-                    except Exception:
-                        # if back fails, continue — we will open next month via absolute URL
-                        pass
-
-                # After processing Divine Service Prep months, process Schedules month pages
-                # collect schedule file paths (saved or existing) so we can post-process PDFs
-                schedule_files = []
-                try:
-                    schedule_elements = get_webpart_link_elements(driver, "Schedules", timeout=6)
-                    schedule_months = []
-                    for item in schedule_elements:
-                        text = item.get('text') or ''
-                        href = item.get('href') or ''
-                        if href:
-                            schedule_months.append({'text': text, 'href': href})
-
-                    from urllib.parse import urljoin
-
-                    # schedule selection filters from UI
-                    schedules_chosen = user_choices.get('schedules_chosen') or set()
-                    schedules_sub = user_choices.get('schedules_sub') or {}
-
-                    for sm in schedule_months:
-                        print(f"Processing Schedules month: {sm['text']}")
-                        full = urljoin(URL, sm['href'])
-                        try:
-                            driver.get(full)
-                            WebDriverWait(driver, 15).until(lambda d: d.execute_script('return document.readyState') == 'complete')
-                        except Exception as e:
-                            print(f"  Could not open schedule page {sm['text']} ({sm['href']}):", e)
-                            continue
-
-                        # extract the schedule sections (grouped by H3 headings)
-                        try:
-                            from src.actions import extract_schedule_sections, save_url_to_path
-
-                            sched_sections = extract_schedule_sections(driver, timeout=8)
-                            if sched_sections:
-                                print(f"  Options on {sm['text']}:")
-                                for title, links in sched_sections:
-                                    # apply UI filters: user must have requested this section
-                                    if schedules_chosen and title.lower() not in {s.lower() for s in schedules_chosen}:
-                                        continue
-                                    # within a section, if user selected sub-items, filter those
-                                    subs = schedules_sub.get(title, set()) or schedules_sub.get(title.title(), set())
-                                    print(f"   - {title}")
-                                    for lt, lh in links:
-                                        if subs:
-                                            # match by link text in subs (case-insensitive, allow partial)
-                                            match = False
-                                            for s in subs:
-                                                if s.lower() in lt.lower() or s.lower() in (lh or '').lower():
-                                                    match = True
-                                                    break
-                                            if not match:
-                                                continue
-
-                                        print(f"       -> {lt} -> {lh}")
-                                        try:
-                                            from src.config import DSGS_DIR
-
-                                            dest, newname = map_link_to_destination(lh, lt, title, DSGS_DIR)
-                                            ok, reason = save_url_to_path(lh, dest, newname, driver=driver, overwrite=False)
-                                            if ok:
-                                                full_path = os.path.join(dest, newname)
-                                                # record saved file for post-processing
-                                                schedule_files.append(full_path)
-                                                base_label = os.path.splitext(newname)[0]
-                                                display_label = base_label
-                                                # for Serving files user prefers the 'Serving' short form
-                                                if base_label.endswith(' Serving Schedule'):
-                                                    display_label = base_label.replace(' Serving Schedule', ' Serving')
-                                                print(f"        -> File Location <-- {full_path}")
-                                                print(f"           New Name: <-- {display_label}")
-                                            else:
-                                                if reason == 'exists':
-                                                    existing_path = os.path.join(dest, newname)
-                                                    # record existing file so we can still parse it
-                                                    schedule_files.append(existing_path)
-                                                    print(f"        -> Skipped (exists): {existing_path}")
-                                                else:
-                                                    print(f"        -> Failed to save ({reason}): {lh}")
-                                        except Exception as e:
-                                            import traceback
-                                            print("        -> Could not map/save destination/filename:")
-                                            print(traceback.format_exc())
-                            else:
-                                print(f"  No schedule sections found on {sm['text']}.")
-                        except Exception as e:
-                            print(f"  Error extracting schedule items for {sm['text']}:", e)
-
-                        # go back to MiniHQ between schedule pages
-                        try:
-                            driver.back()
-                            WebDriverWait(driver, 8).until(lambda d: d.execute_script('return document.readyState') == 'complete')
-                        except Exception:
-                            pass
-                except Exception as e:
-                    print("Schedules processing error:", e)
+            discover(driver, run, "Schedules", 'schedule', month_filter)
         except Exception as e:
-            print("Error opening Divine Service Prep month or extracting items:", e)
+            print("Schedules processing error:", e)
+        keep_session(driver, run)
     finally:
+        run.session.close()
         print("Closing browser...")
         driver.quit()
+        run.finish(started)
+    return run
 
-        # START THE CALENDAR SYNC AUTOMATICALLY
-        print("\n--- Starting Google Calendar Sync ---")
-        import subprocess
-        import sys
 
-        # This command runs your read_schedule script just like you would in the terminal
-        subprocess.run([sys.executable, "tools/read_schedule.py"])
+def run_local(stages, user_choices, month_filter=None, profiler=None):
+    """Run `stages` on files already in DSGS_DIR, without opening the browser."""
+    from src.config import DSGS_DIR
+    from src.months import iter_month_files
 
-        # 1. Filter the list to exclude Youth and Senior schedules
-        # We use a list comprehension to keep it clean and readable
-        filtered_files = [
-            path for path in schedule_files 
-            if "youth" not in path.lower() and "senior" not in path.lower()
-        ]
+    started = time.perf_counter()
+    stages = set(stages)
+    if month_filter is not None and not month_filter.active:
+        month_filter = None
 
-        if filtered_files:
-            print("\n--- Highlighting Minister Names in PDFs ---")
-            
-            # Use the choices directly from the UI
-            name_color_map = user_choices.get('minister_colors', {})
-            opacity = user_choices.get('highlight_opacity', 0.5)
-            
-            if name_color_map:
-                try:
-                    from src.pdf_tools.highlighter import highlight_names_in_pdf
-                    for pdf_path in filtered_files:
-                        print(f"Processing: {os.path.basename(pdf_path)}")
-                        highlight_names_in_pdf(pdf_path, name_color_map, opacity)
-                except Exception as e:
-                    print(f"Error during highlighting process: {e}")
-            else:
-                print("No minister colors defined in UI. Skipping highlighting.")
+    if stages == {"upload"}:
+        # nothing is changed locally, so upload every file of the chosen months (or sync everything)
+        files = list(iter_month_files(DSGS_DIR, month_filter)) if month_filter else None
+        open_content_store()
+        with span("upload"):
+            sync_to_onedrive(files)
+        content_store.close_stores()
+        return None
+
+    run = DownloadRun(user_choices, profiler=profiler, stages=stages)
+    run.pipeline.start()
+    found = 0
+    try:
+        with run.pipeline.source("discover"):
+            paths = list(iter_month_files(DSGS_DIR, month_filter, subfolders=SCHEDULE_SUBFOLDERS, extensions=(".pdf",)))
+        for path in paths:
+            found += 1
+            with run.lock:
+                run.schedule_files.append(path)
+            run._after_download(path)
+    finally:
+        print(f"Found {found} schedule file(s) in {DSGS_DIR}.")
+        run.finish(started)
+    return run
+
+
+# subfolders the schedule files are saved in (see map_link_to_destination)
+SCHEDULE_SUBFOLDERS = ("Schedules", "Youth", "Seniors", "NACC Calendars")
+
+# stages each subcommand runs; `calendar` needs `parse` to find the assignments first
+COMMAND_STAGES = {
+    "download": ("discover", "classify", "download"),
+    "parse": ("parse",),
+    "calendar": ("parse", "calendar"),
+    "highlight": ("highlight",),
+    "upload": ("upload",),
+    "all": DownloadRun.STAGES,
+}
+
+
+def run_command(command, month_filter=None, no_browser=False, profiler=None):
+    """Run one subcommand with the choices saved in .env (no prompts, no GUI)."""
+    from src.ui import load_saved_choices
+
+    user_choices = load_saved_choices()
+    stages = COMMAND_STAGES[command]
+    if month_filter is not None and month_filter.active:
+        print(f"Months: {month_filter.describe()}")
+    if command == "download" or (command == "all" and not no_browser):
+        return main(user_choices, profiler=profiler, stages=stages, month_filter=month_filter)
+    return run_local(stages, user_choices, month_filter, profiler=profiler)
+
+def parse_args(argv=None):
+    import argparse
+
+    # run options are accepted before or after the subcommand (SUPPRESS keeps the
+    # subcommand from overwriting values given before it; defaults are set below)
+    options = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    options.add_argument(
+        "--trace",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="record phase timings; writes a Chrome/Perfetto trace JSON (default: logs/trace-<time>.json) "
+        "and prints a summary table",
+    )
+    options.add_argument(
+        "--profile",
+        choices=DownloadRun.STAGES,
+        metavar="STAGE",
+        help="profile one stage (%(choices)s); writes a .pstats file and a top-N report to logs/",
+    )
+    options.add_argument("--profile-top", type=int, metavar="N", help="rows in the profile text report (default: 30)")
+    options.add_argument(
+        "--profile-sampler",
+        action="store_true",
+        help="use the pyinstrument sampling profiler (if installed) instead of cProfile",
+    )
+    parser = argparse.ArgumentParser(description="Download DSG and schedule files from MiniHQ.", parents=[options])
+    parser.set_defaults(trace=None, profile=None, profile_top=30, profile_sampler=False)
+
+    # subcommands run without prompting, using the choices saved in .env by the last interactive run
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument(
+        "--months",
+        action="append",
+        metavar="MONTHS",
+        help="only these months, e.g. 'January 2026' or 2026-01,2026-02 (repeatable)",
+    )
+    filters.add_argument("--since", metavar="MONTH", help="only this month and later, e.g. 2026-01")
+    filters.add_argument(
+        "--no-browser",
+        action="store_true",
+        help="do not open the browser; work on files already in DSGS_DIR "
+        "(always the case for parse, calendar, highlight and upload)",
+    )
+    commands = parser.add_subparsers(
+        dest="command",
+        metavar="COMMAND",
+        help="run without prompts (default: ask for choices, then run everything)",
+    )
+    commands.add_parser("download", parents=[filters, options], help="download new files from MiniHQ only")
+    commands.add_parser("parse", parents=[filters, options], help="find your assignments in downloaded serving schedules")
+    commands.add_parser("calendar", parents=[filters, options], help="parse serving schedules and sync them to the calendar")
+    commands.add_parser("highlight", parents=[filters, options], help="highlight minister names in downloaded schedules")
+    commands.add_parser("upload", parents=[filters, options], help="upload the chosen months (or everything) to OneDrive")
+    commands.add_parser("all", parents=[filters, options], help="download, parse, sync, highlight and upload")
+
+    args = parser.parse_args(argv)
+    args.month_filter = None
+    if args.command:
+        from src.months import MonthFilter
+
+        if args.command == "download" and args.no_browser:
+            parser.error("download needs the browser; drop --no-browser")
+        try:
+            args.month_filter = MonthFilter.from_args(args.months, args.since)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
 
-        # FINAL STEP: Upload scraped files to OneDrive
-        sync_to_onedrive()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.trace is not None:
+        from src import tracing
+
+        tracing.enable()
+    profiler = None
+    if args.profile:
+        from src.profiling import StageProfiler
+
+        profiler = StageProfiler(args.profile, out_dir="logs", top=args.profile_top, sampler=args.profile_sampler)
+    try:
+        if args.command:
+            run_command(args.command, args.month_filter, no_browser=args.no_browser, profiler=profiler)
+        else:
+            main(profiler=profiler)
+    finally:
+        if args.trace is not None:
+            trace_path = args.trace or os.path.join("logs", time.strftime("trace-%Y%m%d-%H%M%S.json"))
+            tracing.summary()
+            print(f"Trace written to {tracing.write(trace_path)} (open in https://ui.perfetto.dev)")
@@ -7,6 +7,21 @@ and schedule files from the NACC site.
 __all__ = [
 	'actions',
 	'browser',
+	'calendar_backends',
+	'calendar_state',
 	'config',
+	'content_store',
+	'fs_snapshot',
+	'links',
+	'months',
+	'payload',
+	'pipeline',
+	'priority',
+	'profiling',
+	'ratelimit',
+	'retry',
+	'session',
+	'tracing',
 	'ui',
+	'upload',
 ]
@@ -10,16 +10,26 @@ This module provides small, focused helpers used by `main.py`:
 Comments are placed above non-obvious functions to explain intent.
 """
 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import fnmatch
 import os
-import pdfplumber
+import re
+from functools import lru_cache
+
+from src import content_store, fs_snapshot, retry
+from src.links import LinkSelection, classify_link, scan_month_year
+from src.payload import PART_SUFFIX, PayloadCheck
+from src.ratelimit import request_slot
+
+# selenium and pdfplumber are imported inside the functions that use them,
+# so tools that only need the file/mapping helpers start quickly.
 
 
 def get_button_text(driver, selector, selector_type="css", timeout=10):
     # Return the visible text for a control, or its value attribute for inputs.
     # This helps detect buttons/inputs whose caption is stored as `value`.
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     by = By.CSS_SELECTOR if selector_type.lower() == "css" else By.XPATH
     el = WebDriverWait(driver, timeout).until(EC.presence_of_element_located((by, selector)))
     text = el.text.strip()
@@ -51,6 +61,9 @@ def get_button_text(driver, selector, selector_type="css", timeout=10):
 
 def click_element(driver, selector, selector_type="css", timeout=10):
     # Click an element, falling back to JS click if needed.
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     by = By.CSS_SELECTOR if selector_type.lower() == "css" else By.XPATH
     el = WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((by, selector)))
     try:
@@ -64,6 +77,9 @@ def click_element(driver, selector, selector_type="css", timeout=10):
 
 def find_first_visible(driver, candidates, timeout=6):
     """Try a list of (selector, selector_type) tuples and return the first visible element."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     for selector, selector_type in candidates:
         by = By.CSS_SELECTOR if selector_type.lower() == "css" else By.XPATH
         try:
@@ -112,6 +128,8 @@ def get_webpart_links_by_heading(driver, heading_text, timeout=10):
     Example: heading_text='Divine Service Prep' returns ['December 2025', 'January 2026']
     """
     from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     xpath_container = f"//h2[normalize-space()={repr(heading_text)}]/ancestor::div[contains(@class,'iMIS-WebPart')][1]"
     try:
         container = WebDriverWait(driver, timeout).until(
@@ -131,6 +149,8 @@ def get_webpart_link_elements(driver, heading_text, timeout=10):
     Each item is a dict: {'text': visible text, 'href': href attribute, 'element': WebElement}
     """
     from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     xpath_container = f"//h2[normalize-space()={repr(heading_text)}]/ancestor::div[contains(@class,'iMIS-WebPart')][1]"
     try:
         container = WebDriverWait(driver, timeout).until(
@@ -154,6 +174,8 @@ def extract_accordion_items(driver, timeout=10):
     Returns list of (header_text, [ (link_text, href), ... ])
     """
     from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     # Wait for accordion presence
     try:
         WebDriverWait(driver, timeout).until(
@@ -186,19 +208,26 @@ def extract_accordion_items(driver, timeout=10):
     return results
 
 
+def _glob_names(path, pattern):
+    """Names in folder `path` matching the glob `pattern` (hidden names only if the pattern starts with '.')."""
+    try:
+        names = fs_snapshot.listdir(path)
+    except OSError:
+        return []
+    hidden_ok = pattern.startswith('.')
+    return [n for n in names if fnmatch.fnmatch(n, pattern) and (hidden_ok or not n.startswith('.'))]
+
+
 def list_files_in_dir(path, pattern="*"):
-    """Return list of filenames in `path` matching `pattern` (glob)."""
-    import os
-    import glob
+    """Return list of filenames in `path` matching `pattern` (glob).
 
+    Answered from the DSGS_DIR snapshot when one was taken (see `src.fs_snapshot`).
+    """
     if not path:
         return []
-    if not os.path.exists(path):
+    if not fs_snapshot.exists(path):
         return []
-    search = os.path.join(path, pattern)
-    files = glob.glob(search)
-    # return basenames
-    return [os.path.basename(f) for f in files]
+    return _glob_names(path, pattern)
 
 
 def extract_years_from_texts(texts):
@@ -217,20 +246,9 @@ def extract_years_from_texts(texts):
 
 def ensure_year_folders_exist(base_dir, years):
     """Ensure a folder exists for each year under `base_dir`. Returns tuple (created, existing) lists of full paths."""
-    import os
-
-    created = []
-    existing = []
     if not base_dir:
-        return created, existing
-    for y in years:
-        folder = os.path.join(base_dir, str(y))
-        if os.path.exists(folder):
-            existing.append(folder)
-        else:
-            os.makedirs(folder, exist_ok=True)
-            created.append(folder)
-    return created, existing
+        return [], []
+    return fs_snapshot.ensure_dirs([os.path.join(base_dir, str(y)) for y in years])
 
 
 def extract_month_year_pairs(texts):
@@ -257,21 +275,9 @@ def ensure_month_folders_exist(base_dir, month_year_pairs):
 
     Returns (created, existing) lists of full paths.
     """
-    import os
-
-    created = []
-    existing = []
     if not base_dir:
-        return created, existing
-    for month, year in month_year_pairs:
-        year_folder = os.path.join(base_dir, year)
-        month_folder = os.path.join(year_folder, month)
-        if os.path.exists(month_folder):
-            existing.append(month_folder)
-        else:
-            os.makedirs(month_folder, exist_ok=True)
-            created.append(month_folder)
-    return created, existing
+        return [], []
+    return fs_snapshot.ensure_dirs([os.path.join(base_dir, year, month) for month, year in month_year_pairs])
 
 
 def ensure_subfolders_in_months(base_dir, month_year_pairs, subfolders):
@@ -279,22 +285,11 @@ def ensure_subfolders_in_months(base_dir, month_year_pairs, subfolders):
 
     Returns (created, existing) lists of full paths for subfolders.
     """
-    import os
-
-    created = []
-    existing = []
     if not base_dir:
-        return created, existing
-    for month, year in month_year_pairs:
-        month_folder = os.path.join(base_dir, year, month)
-        for sub in subfolders:
-            p = os.path.join(month_folder, sub)
-            if os.path.exists(p):
-                existing.append(p)
-            else:
-                os.makedirs(p, exist_ok=True)
-                created.append(p)
-    return created, existing
+        return [], []
+    return fs_snapshot.ensure_dirs(
+        [os.path.join(base_dir, year, month, sub) for month, year in month_year_pairs for sub in subfolders]
+    )
 
 
 def extract_schedule_sections(driver, timeout=8):
@@ -342,199 +337,18 @@ def extract_schedule_sections(driver, timeout=8):
     return filtered
 
 
-def filter_accordion_items_by_selection(items, user_choices):
+def filter_accordion_items_by_selection(items, user_choices, selection=None):
     """Filter accordion items according to the `user_choices` dict from `src.ui.get_user_selection()`.
 
     - `items` is list of (header, [ (link_text, href), ... ])
     - `user_choices` is the dict with keys: 'selections', 'bible_reading_langs', 'full_dsg_langs', 'se_dsg_langs'
+    - `selection` is `LinkSelection(user_choices)`; pass it in to compile the choices once per run
 
     Returns filtered list of (header, [(text, href), ...]) where empty-headers or items with no links are omitted.
+    Links are classified once each by `src.links.classify_link` (cached by href).
     """
-    import os
-
-    selections = set(user_choices.get('selections') or [])
-    # normalize
-    selections = {s.lower() for s in selections}
-
-    english_selected = 'english' in selections
-    french_selected = 'french' in selections
-
-    # per-type language preferences (lowercase names)
-    br_langs = {l.lower() for l in (user_choices.get('bible_reading_langs') or [])}
-    full_langs = {l.lower() for l in (user_choices.get('full_dsg_langs') or [])}
-    se_langs = {l.lower() for l in (user_choices.get('se_dsg_langs') or [])}
-    foreword_langs = {l.lower() for l in (user_choices.get('foreword_langs') or [])}
-    bibref_langs = {l.lower() for l in (user_choices.get('bible_references_langs') or [])}
-
-    # detect which specific "type" selections are present
-    type_selections = set()
-    for key in (
-        'audio',
-        'transcript',
-        'references',
-        'bible references',
-        'bible reading',
-        'full dsg',
-        'special edition dsg',
-        'foreword',
-    ):
-        if key in selections:
-            type_selections.add(key)
-
-    def detect_flags(href):
-        h = (href or '').lower()
-        fname = os.path.basename(h)
-        flags = {}
-        # detect language codes in path or filename (en, fr, de, it, pt, ru, es)
-        import re as _re
-        codes = set()
-        if '/english/' in h:
-            codes.add('en')
-        if '/french/' in h:
-            codes.add('fr')
-        # look for language codes in filename or path segments: -en., _en., .en., /en/
-        m = _re.search(r'(?:(?:-|_|\.|/))(en|fr|de|it|pt|ru|es)(?:\.|_|/|-|$)', h)
-        if m:
-            codes.add(m.group(1))
-        # also detect full language names in the path (English, French, German, etc.)
-        names = set()
-        for name, code in (('english', 'en'), ('french', 'fr'), ('german', 'de'), ('italian', 'it'), ('portuguese', 'pt'), ('russian', 'ru'), ('spanish', 'es')):
-            if name in h or name in fname.lower():
-                names.add(code)
-                codes.add(code)
-        flags['codes'] = codes
-        flags['lang_names'] = names
-        flags['english'] = 'en' in codes
-        flags['french'] = 'fr' in codes
-        flags['audio'] = 'audio' in h or 'audio%20' in h or '-audio-' in fname
-        flags['transcript'] = 'transcript' in h
-        flags['bible_references'] = (
-            ('bible' in h and 'reference' in h) or 'bible-references' in fname or 'bible_references' in fname
-        )
-        flags['bible_reading'] = 'bible-reading' in h or 'bible%20reading' in h or 'bible-reading' in fname
-        flags['full_dsg'] = ('full' in h and 'dsg' in h) or 'full%20dsg' in h or 'full-dsg' in fname
-        flags['se_dsg'] = (
-            'se%20dsg' in h
-            or 'se-dsg' in h
-            or ('/se%20' in h and 'dsg' in h)
-            or ('/document%20library' in h and 'se' in h)
-        )
-        flags['foreword'] = 'foreword' in h or 'foreword' in fname
-        # detect serving schedules / schedule PDFs
-        flags['serving'] = 'serving schedules' in h or '/serving schedules/' in h or 'serving schedule' in h or 'serving schedule' in fname or 'serving schedules' in fname or 'serving' in h
-        return flags
-
-    def link_matches(href):
-        flags = detect_flags(href)
-
-        # language selection handling
-        langs_selected = english_selected or french_selected
-
-        # If type selections exist (e.g., audio/transcript/full dsg/se dsg/etc.) then require type match
-        has_type_selection = len(type_selections) > 0
-
-        # map type selection keys to checks
-        def lang_ok_for_link(flags, per_langs):
-            # per_langs is a set of lowercase language names; if empty -> no restriction
-            lang_map = {
-                'english': 'en',
-                'french': 'fr',
-                'german': 'de',
-                'italian': 'it',
-                'portuguese': 'pt',
-                'russian': 'ru',
-                'spanish': 'es',
-            }
-            req_codes = set()
-            for ln in (per_langs or []):
-                code = lang_map.get(ln.lower())
-                if code:
-                    req_codes.add(code)
-            if req_codes:
-                # match by detected codes OR by language name presence
-                if len(flags.get('codes', set()) & req_codes) > 0:
-                    return True
-                # also check lang_names (from literal name matches)
-                if len(flags.get('lang_names', set()) & req_codes) > 0:
-                    return True
-                return False
-            # fall back to global English/French selections
-            glob_codes = set()
-            if english_selected:
-                glob_codes.add('en')
-            if french_selected:
-                glob_codes.add('fr')
-            if glob_codes:
-                return len(flags.get('codes', set()) & glob_codes) > 0
-            return True
-
-        def type_check():
-            # if any of the type selections match, return True (respecting per-type language choices)
-            for t in type_selections:
-                if t == 'audio' and flags.get('audio'):
-                    if lang_ok_for_link(flags, set()):
-                        return True
-                if t == 'transcript' and flags.get('transcript'):
-                    if lang_ok_for_link(flags, set()):
-                        return True
-                if t in ('references', 'bible references') and flags.get('bible_references'):
-                    # if this link is also a Full DSG item, require Full DSG to be selected as well
-                    if flags.get('full_dsg') and 'full dsg' not in type_selections:
-                        continue
-                    if lang_ok_for_link(flags, bibref_langs):
-                        return True
-                if t == 'bible reading' and flags.get('bible_reading'):
-                    if lang_ok_for_link(flags, br_langs):
-                        return True
-                if t == 'full dsg' and flags.get('full_dsg'):
-                    # if this link is a bible reference inside Full DSG, only include if bible references also selected
-                    if flags.get('bible_references') and 'bible references' not in type_selections:
-                        continue
-                    if lang_ok_for_link(flags, full_langs):
-                        return True
-                if t == 'special edition dsg' and flags.get('se_dsg'):
-                    if lang_ok_for_link(flags, se_langs):
-                        return True
-                if t == 'foreword' and flags.get('foreword'):
-                    if lang_ok_for_link(flags, foreword_langs):
-                        return True
-            return False
-
-        # If languages are explicitly selected
-        if langs_selected:
-            # standard DSG (language file) is a link that is language-specific but not any special type
-            is_standard = (flags.get('english') or flags.get('french')) and not (
-                flags.get('audio')
-                or flags.get('transcript')
-                or flags.get('bible_references')
-                or flags.get('bible_reading')
-                or flags.get('full_dsg')
-                or flags.get('se_dsg')
-                or flags.get('foreword')
-            )
-            if has_type_selection:
-                # include standard language files only if they match the selected global language(s)
-                include_standard = False
-                if english_selected and flags.get('english'):
-                    include_standard = True
-                if french_selected and flags.get('french'):
-                    include_standard = include_standard or True if flags.get('french') else include_standard
-                # include standard if it matches global languages, or include any matching types
-                return (is_standard and include_standard) or type_check()
-            # no type selection: include only standard language files
-            # require the standard file to match the selected global language(s)
-            if english_selected and flags.get('english'):
-                return is_standard
-            if french_selected and flags.get('french'):
-                return is_standard
-            return False
-
-        # No explicit language selection
-        if has_type_selection:
-            return type_check()
-
-        # No selections at all — default to include everything
-        return True
+    if selection is None:
+        selection = LinkSelection(user_choices)
 
     filtered = []
     for hdr, links in items:
@@ -543,7 +357,7 @@ def filter_accordion_items_by_selection(items, user_choices):
             if not h:
                 continue
             try:
-                if link_matches(h):
+                if selection.matches_href(h):
                     kept.append((t, h))
             except Exception:
                 # if detection fails, be conservative and skip
@@ -558,118 +372,7 @@ def map_link_to_destination(href, link_text, header_text, base_dir):
 
     Returns (dest_folder, filename_with_ext).
     """
-    import os
-    import re
-    import urllib.parse
-    from datetime import datetime
-
-    raw = href or ''
-    decoded = urllib.parse.unquote(raw)
-    h = decoded.lower()
-    fname = os.path.basename(decoded)
-    ext = os.path.splitext(fname)[1] or ''
-
-    # detect simple flags
-    flags = {
-        'serving': 'serving' in h and 'schedule' in h,
-        'youth': 'youth' in h or 'youth' in fname.lower() or ('youth' in (header_text or '').lower()),
-        'children': 'children' in h or 'child' in fname.lower() or ('children' in (header_text or '').lower()),
-        'senior': 'senior' in h or 'seniors' in h or 'senior' in fname.lower() or 'seniors' in fname.lower() or ('senior' in (header_text or '').lower()),
-        'nacc': 'nacc' in (header_text or '').lower() or 'nacc' in h,
-    }
-
-    # detect DSG-related flags
-    flags['dsg'] = ('divine service prep' in h) or ('dsg' in fname.lower()) or ('divine' in h) or ('divine' in (header_text or '').lower())
-    flags['full_dsg'] = 'full' in h and 'dsg' in h or 'full dsg' in h or 'full-dsg' in fname.lower()
-    flags['se_dsg'] = 'special edition' in h or 'se dsg' in h or 'se-dsg' in fname.lower()
-    flags['foreword'] = 'foreword' in h or 'foreword' in fname.lower() or 'foreword' in (header_text or '').lower() or 'forward' in (header_text or '').lower()
-    flags['audio'] = 'audio' in h or 'audio' in fname.lower()
-    flags['transcript'] = 'transcript' in h or 'transcript' in fname.lower()
-    flags['bibleref'] = ('bible' in h and 'reference' in h) or 'bible-references' in fname.lower() or 'bible references' in h
-
-    # try ISO date in raw href
-    date_obj = None
-    m_iso = re.search(r'(20\d{2}-\d{2}-\d{2})', raw)
-    if m_iso:
-        try:
-            date_obj = datetime.strptime(m_iso.group(1), '%Y-%m-%d')
-        except Exception:
-            date_obj = None
-
-    year = None
-    month = None
-    if date_obj:
-        year = str(date_obj.year)
-        month = date_obj.strftime('%B')
-    else:
-        # try to find Month Year in decoded path (e.g., 'January 2026')
-        m_my = re.search(r'(january|february|march|april|may|june|july|august|september|october|november|december)[\s%20_-]+(20\d{2})', h)
-        if m_my:
-            month = m_my.group(1).title()
-            year = m_my.group(2)
-        else:
-            m_year = re.search(r'(20\d{2})', raw)
-            if m_year:
-                year = m_year.group(1)
-
-        # If month/year still not found, try parsing from the visible link text or header_text
-        if not month or not year:
-            combined_search = ' '.join([decoded, link_text or '', header_text or '']).lower()
-            m_comb = re.search(r'(january|february|march|april|may|june|july|august|september|october|november|december)[\s\-_,]+(20\d{2})', combined_search)
-            if m_comb:
-                month = m_comb.group(1).title()
-                year = m_comb.group(2)
-            else:
-                # look for numeric year-month patterns like 2025-12 or 2025_12 or 2025.12
-                m_num = re.search(r'(20\d{2})[-_\.](0[1-9]|1[0-2])', combined_search)
-                if not m_num:
-                    # also try patterns in filename/decoded path
-                    m_num = re.search(r'(20\d{2})[-_\.](0[1-9]|1[0-2])', decoded)
-                if m_num:
-                    y = m_num.group(1)
-                    mm = m_num.group(2)
-                    month_map = {
-                        '01': 'January', '02': 'February', '03': 'March', '04': 'April', '05': 'May', '06': 'June',
-                        '07': 'July', '08': 'August', '09': 'September', '10': 'October', '11': 'November', '12': 'December'
-                    }
-                    year = y
-                    month = month_map.get(mm, None)
-
-    # choose subfolder — preference order: DSG-related categories, then schedules
-    sub = 'DSG'
-    if flags.get('dsg'):
-        # dsg subcategories
-        if flags.get('foreword'):
-            sub = 'Forward'
-        elif flags.get('youth'):
-            sub = 'Youth'
-        elif flags.get('children'):
-            sub = 'Childrens Service'
-        elif flags.get('full_dsg'):
-            sub = 'Full DSGs'
-        elif flags.get('se_dsg'):
-            sub = 'Special DSG'
-        elif flags.get('bibleref'):
-            sub = 'Bible References'
-        elif flags.get('audio'):
-            sub = 'Audio'
-        elif flags.get('transcript'):
-            sub = 'Transcripts'
-        else:
-            sub = 'DSG'
-    else:
-        # not DSG -> schedules area
-        # prefer Youth when 'youth' appears in name/href, then serving schedules, then seniors, then NACC
-        if flags.get('youth'):
-            sub = 'Youth'
-        elif flags.get('serving'):
-            sub = 'Schedules'
-        elif flags.get('senior'):
-            sub = 'Seniors'
-        elif flags.get('nacc'):
-            sub = 'NACC Calendars'
-
-    # build dest folder
+    year, month, sub, filename = _link_destination(href, link_text, header_text)
     dest = base_dir
     if year:
         dest = os.path.join(dest, year)
@@ -677,179 +380,290 @@ def map_link_to_destination(href, link_text, header_text, base_dir):
         dest = os.path.join(dest, month)
     if sub:
         dest = os.path.join(dest, sub)
+    return dest, filename
 
-    # build filename according to requested conventions
-    def clean_loc(s):
-        return (s or '').strip().replace('/', '-').replace('\\', '-')
-
-    loc = clean_loc(link_text)
-
-    # DSG items
-    if sub in ('DSG', 'Full DSGs', 'Special DSG', 'Forward', 'Childrens Service'):
-        # language detection for file label
-        lang = ''
-        # prefer language words in decoded href or filename
-        for name in ('English', 'French', 'German', 'Italian', 'Portuguese', 'Russian', 'Spanish'):
-            if name.lower() in h:
-                lang = name
-                break
-
-        if sub == 'Forward':
-            # "[Month] [Year] Forward [Language]"
-            if month and year:
-                label = f"{month} {year} Forward {lang}" if lang else f"{month} {year} Forward"
-            elif year:
-                label = f"{year} Forward {lang}" if lang else f"{year} Forward"
-            else:
-                label = f"Forward {loc}"
-        elif sub == 'Full DSGs' or sub == 'Special DSG':
-            # "[Month] [Year] Full DSG [Language]" or Special Edition
-            tag = 'Full DSG' if sub == 'Full DSGs' else 'Special Edition DSG'
-            if month and year:
-                label = f"{month} {year} {tag} {lang}" if lang else f"{month} {year} {tag}"
-            elif year:
-                label = f"{year} {tag} {lang}" if lang else f"{year} {tag}"
-            else:
-                label = f"{tag} {loc}"
-        elif sub == 'Childrens Service':
-            # "[Month] [Year] Children's Service [Language]" (fall back)
-            if month and year:
-                label = f"{month} {year} Childrens Service {lang}" if lang else f"{month} {year} Childrens Service"
-            elif year:
-                label = f"{year} Childrens Service {lang}" if lang else f"{year} Childrens Service"
-            else:
-                label = f"Childrens Service {loc}"
-        else:
-            # regular DSG service with date -> "[Weekday] [Month] [Day] [Year] Divine Service Prep [Language]"
-            if date_obj:
-                weekday = date_obj.strftime('%A')
-                day = date_obj.day
-                y = date_obj.year
-                if lang:
-                    label = f"{weekday} {month} {day} {y} Divine Service Prep {lang}"
-                else:
-                    # try literal language in href or default to English
-                    label_lang = 'English' if 'en' in h or 'english' in h else ''
-                    label = f"{weekday} {month} {day} {y} Divine Service Prep {label_lang}".strip()
-            else:
-                # fallback
-                label = loc or 'Divine Service Prep'
-
-    # Schedules items
-    elif sub == 'Schedules':
-        # "[Month] [Year] [Location] Serving Schedule"
-        if month and year:
-            label = f"{month} {year} {loc} Serving Schedule"
-        elif year:
-            label = f"{year} {loc} Serving Schedule"
-        else:
-            label = f"{loc} Serving Schedule"
-    elif sub == 'Youth':
-        # Youth schedules (from schedule area) or youth DSG (from DSG area)
-        if flags.get('serving'):
-            if month and year:
-                label = f"{month} {year} {loc} Youth Schedule"
-            elif year:
-                label = f"{year} {loc} Youth Schedule"
-            else:
-                label = f"{loc} Youth Schedule"
-        else:
-            # youth DSG under Divine Service Prep: "[Month] [Year] Youth [Language]"
-            lang = ''
-            for name in ('English', 'French'):
-                if name.lower() in h:
-                    lang = name
-                    break
-            if month and year:
-                label = f"{month} {year} Youth {lang}" if lang else f"{month} {year} Youth"
-            elif year:
-                label = f"{year} Youth {lang}" if lang else f"{year} Youth"
-            else:
-                label = f"Youth {loc}"
-    elif sub == 'Seniors':
-        if month and year:
-            label = f"{month} {year} {loc} Seniors Schedule"
-        elif year:
-            label = f"{year} {loc} Seniors Schedule"
-        else:
-            label = f"{loc} Seniors Schedule"
-    elif sub == 'NACC Calendars':
-        # "[Month] [Year] NACC Calendar [National/Districts]"
-        if month and year:
-            label = f"{month} {year} NACC Calendar {loc}"
-        elif year:
-            label = f"{year} NACC Calendar {loc}"
-        else:
-            label = f"NACC Calendar {loc}"
+
+# -----------------------------
+# routing and naming rules for map_link_to_destination
+# -----------------------------
+# subfolder for Divine Service Prep links: the first flag that is set wins, else 'DSG'
+DSG_ROUTES = (
+    ('foreword', 'Forward'),
+    ('youth', 'Youth'),
+    ('children', 'Childrens Service'),
+    ('full_dsg', 'Full DSGs'),
+    ('se_dsg', 'Special DSG'),
+    ('bibleref', 'Bible References'),
+    ('audio', 'Audio'),
+    ('transcript', 'Transcripts'),
+)
+# subfolder for everything else (the Schedules area), same rule
+SCHEDULE_ROUTES = (
+    ('youth', 'Youth'),
+    ('serving', 'Schedules'),
+    ('senior', 'Seniors'),
+    ('nacc', 'NACC Calendars'),
+)
+# filename templates: (month and year known, only the year, neither)
+# {lang} is ' <Language>' or '', {loc} the cleaned link text
+NAME_TEMPLATES = {
+    'Forward': ("{month} {year} Forward{lang}", "{year} Forward{lang}", "Forward {loc}"),
+    'Full DSGs': ("{month} {year} Full DSG{lang}", "{year} Full DSG{lang}", "Full DSG {loc}"),
+    'Special DSG': (
+        "{month} {year} Special Edition DSG{lang}",
+        "{year} Special Edition DSG{lang}",
+        "Special Edition DSG {loc}",
+    ),
+    'Childrens Service': (
+        "{month} {year} Childrens Service{lang}",
+        "{year} Childrens Service{lang}",
+        "Childrens Service {loc}",
+    ),
+    # youth DSG under Divine Service Prep (English/French only)
+    'Youth': ("{month} {year} Youth{lang}", "{year} Youth{lang}", "Youth {loc}"),
+    'Youth Schedule': ("{month} {year} {loc} Youth Schedule", "{year} {loc} Youth Schedule", "{loc} Youth Schedule"),
+    'Schedules': ("{month} {year} {loc} Serving Schedule", "{year} {loc} Serving Schedule", "{loc} Serving Schedule"),
+    'Seniors': ("{month} {year} {loc} Seniors Schedule", "{year} {loc} Seniors Schedule", "{loc} Seniors Schedule"),
+    'NACC Calendars': ("{month} {year} NACC Calendar {loc}", "{year} NACC Calendar {loc}", "NACC Calendar {loc}"),
+}
+_SLASHES_RE = re.compile(r'[\\/]+')
+
+
+def _route_flags(info, header_text):
+    """Routing flags: the href's (from the classifier) plus what the section header adds."""
+    hdr = (header_text or '').lower()
+    return {
+        'serving': info.path_serving,
+        'youth': info.path_youth or 'youth' in hdr,
+        'children': info.path_children or 'children' in hdr,
+        'senior': info.path_senior or 'senior' in hdr,
+        'nacc': info.path_nacc or 'nacc' in hdr,
+        'dsg': info.path_dsg or 'divine' in hdr,
+        'full_dsg': info.path_full_dsg,
+        'se_dsg': info.path_se_dsg,
+        'foreword': info.path_foreword or 'foreword' in hdr or 'forward' in hdr,
+        'audio': info.path_audio,
+        'transcript': info.path_transcript,
+        'bibleref': info.path_bibleref,
+    }
+
+
+def _dsg_label(info, month, loc):
+    """Regular DSG: "[Weekday] [Month] [Day] [Year] Divine Service Prep [Language]"."""
+    date_obj = info.date
+    if not date_obj:
+        return loc or 'Divine Service Prep'
+    head = f"{date_obj.strftime('%A')} {month} {date_obj.day} {date_obj.year} Divine Service Prep"
+    if info.language:
+        return f"{head} {info.language}"
+    # no language word: default to English when 'en' appears anywhere in the href
+    return f"{head} English" if info.mentions_en else head
+
+
+# the same link is often mapped again (re-runs, --warm benchmarks); remember the answer
+@lru_cache(maxsize=4096)
+def _link_destination(href, link_text, header_text):
+    """Return (year, month, subfolder, filename) for a link; `base_dir` is joined by the caller."""
+    info = classify_link(href)
+    flags = _route_flags(info, header_text)
+
+    # ISO date or Month Year in the href, else Month Year / YYYY-MM in href + link text + header
+    year = info.year
+    month = info.month
+    if not info.date and (not month or not year):
+        found = scan_month_year(' '.join([info.decoded, link_text or '', header_text or '']).lower())
+        if found:
+            year, month = found
+
+    routes = DSG_ROUTES if flags['dsg'] else SCHEDULE_ROUTES
+    sub = next((folder for flag, folder in routes if flags[flag]), 'DSG')
+
+    loc = (link_text or '').strip().replace('/', '-').replace('\\', '-')
+    template = 'Youth Schedule' if sub == 'Youth' and flags['serving'] else sub
+    if template == 'DSG':
+        label = _dsg_label(info, month, loc)
+    elif template in NAME_TEMPLATES:
+        lang = info.youth_language if template == 'Youth' else info.language
+        with_month, with_year, bare = NAME_TEMPLATES[template]
+        pattern = with_month if month and year else with_year if year else bare
+        label = pattern.format(month=month, year=year, loc=loc, lang=f" {lang}" if lang else '')
     else:
-        # fallback to original filename
-        label = os.path.splitext(fname)[0] or loc or 'download'
+        # Bible References, Audio, Transcripts: keep the original filename
+        label = os.path.splitext(info.filename)[0] or loc or 'download'
 
-    filename = label + (ext or '')
-    filename = re.sub(r'[\\/]+', '-', filename)
-    return dest, filename
+    filename = _SLASHES_RE.sub('-', label + info.ext)
+    return year, month, sub, filename
+
+
+def _open_download(path):
+    """Open `path`.part for a new download (a stale one from an earlier crash is replaced).
+
+    The real file is only replaced by `_commit_download`, so a failed or bad
+    download never leaves a broken file under the real name, and a
+    deduplicated file sharing its inode with other copies (see
+    `src.content_store`) is swapped out instead of truncated.
+    """
+    part = path + PART_SUFFIX
+    if os.path.lexists(part):
+        os.remove(part)
+    return open(part, 'wb')
+
+
+def _commit_download(path, digest):
+    """Move the checked `.part` file into place, note it in the snapshot and give it to the content store."""
+    os.replace(path + PART_SUFFIX, path)
+    fs_snapshot.record_file(path)
+    content_store.add_download(path, digest.hexdigest())
 
 
-def save_url_to_path(url, dest_folder, filename, driver=None, overwrite=False):
+def save_url_to_path(url, dest_folder, filename, driver=None, overwrite=False, cookies=None, limiter=None,
+                     policy=None, throttle=None, reauth=None):
     """Download `url` to `os.path.join(dest_folder, filename)`.
 
     - Creates `dest_folder` if missing.
     - Skips download if file exists and `overwrite` is False.
-    - Tries `requests` first; on failure (or missing auth) falls back to using Selenium cookies with urllib.
-    - Returns (True, reason) on success, (False, reason) on failure.
+    - Sends the browser cookies with `requests` (urllib when `requests` is missing or got no answer).
+    - `cookies` is an optional snapshot of `driver.get_cookies()`; pass it instead of
+      `driver` when downloading from worker threads (WebDriver is not thread-safe).
+    - `limiter` is an optional `src.ratelimit.AdaptiveLimiter`; each request then waits
+      for a slot on the host and reports its status, latency and Retry-After.
+    - `policy` is an optional `src.retry.RetryPolicy`; timeouts, 5xx, throttling and
+      network errors are then retried with backoff (default: one attempt).
+    - `throttle` is an optional `src.ratelimit.BandwidthLimiter` shared by all workers;
+      every request and every chunk read waits for it.
+    - The file is written to `<filename>.part` and checked while it streams
+      (`src.payload.PayloadCheck`: Content-Type, first bytes, Content-Length); only a
+      file that passes is renamed to `filename`.
+    - `reauth(stale_cookies)` (optional) is called once when the site answers with its
+      sign-in page (or 401/403); it returns fresh cookies to retry with, or None.
+    - Hashes the file while it is written; when a content store is open for the
+      folder, a file whose content was downloaded before becomes a link to that copy.
+    - Returns (True, reason) on success, (False, reason) on failure; failure reasons
+      start with the error kind, e.g. 'timeout: ...', 'auth: ...' or 'not_found: ...'.
     """
-    import os
-    import shutil
-
     path = os.path.join(dest_folder, filename)
     try:
-        os.makedirs(dest_folder, exist_ok=True)
+        # a no-op when the folder is already in the snapshot (or was planned by the caller)
+        fs_snapshot.ensure_dirs([dest_folder])
     except Exception as e:
         return False, f"mkdir_failed: {e}"
 
-    if os.path.exists(path) and not overwrite:
+    if fs_snapshot.exists(path) and not overwrite:
         return False, "exists"
 
+    policy = policy or retry.RetryPolicy.single()
+    current = {'cookies': cookies}
+
+    def attempt():
+        return _download_once(url, path, driver, current['cookies'], limiter, throttle)
+
+    signed_in_again = False
+    while True:
+        try:
+            how = policy.call(attempt, url=url, label=filename)
+        except retry.RetryError as e:
+            if e.kind == retry.AUTH and reauth is not None and not signed_in_again:
+                signed_in_again = True
+                fresh = reauth(current['cookies'])
+                if fresh:
+                    current['cookies'] = fresh
+                    continue
+            return False, f'{e.kind}: {e.error}'
+        return True, how
+
+
+def _download_once(url, path, driver, cookies, limiter, throttle=None):
+    """One attempt with the browser cookies: `requests`, else urllib. Raises the failure.
+
+    urllib is also tried when `requests` got no answer at all (e.g. a TLS or
+    proxy problem of its own); once the server has answered, that answer
+    (a status, a sign-in page, a broken transfer) is the result of the attempt.
+    """
+    filename = os.path.basename(path)
+    if cookies is None and driver is not None:
+        try:
+            cookies = driver.get_cookies()
+        except Exception:
+            cookies = None
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    if cookies:
+        headers['Cookie'] = '; '.join([f"{c['name']}={c['value']}" for c in cookies])
+
     # First attempt: requests
     try:
         import requests
-
-        with requests.Session() as s:
-            resp = s.get(url, stream=True, timeout=30)
-            if resp.status_code == 200:
-                with open(path, 'wb') as f:
+    except ImportError:
+        requests = None
+    if requests is not None:
+        slot = None
+        try:
+            if throttle is not None:
+                throttle.request()
+            with requests.Session() as s, request_slot(limiter, url) as slot:
+                resp = s.get(url, headers=headers, stream=True, timeout=30)
+                slot.response(resp.status_code, resp.headers)
+                if resp.status_code != 200:
+                    raise retry.HttpStatusError(resp.status_code, url, slot.retry_after)
+                check = PayloadCheck.for_response(filename, resp.headers)
+                digest = content_store.new_hasher()
+                with _open_download(path) as f:
                     for chunk in resp.iter_content(1024 * 8):
                         if chunk:
+                            if throttle is not None:
+                                throttle.consume(len(chunk))
+                            check.feed(chunk)
                             f.write(chunk)
-                return True, 'downloaded_via_requests'
-            # if not OK, continue to fallback
-    except Exception:
-        pass
+                            digest.update(chunk)
+                check.finish()
+            _commit_download(path, digest)
+            return 'downloaded_via_requests'
+        except Exception:
+            _remove_partial(path)
+            if slot is not None and slot.status is not None:
+                raise
+        # no answer from the server; continue to fallback
 
-    # Fallback: try urllib with cookies from Selenium (if provided)
-    try:
-        import urllib.request
+    # Fallback: urllib with the same cookies
+    import urllib.error
+    import urllib.request
 
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        if driver is not None:
-            try:
-                cookies = driver.get_cookies()
-                cookie_header = '; '.join([f"{c['name']}={c['value']}" for c in cookies])
-                headers['Cookie'] = cookie_header
-            except Exception:
-                pass
+    try:
         req = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(req, timeout=60) as resp, open(path, 'wb') as out:
-            shutil.copyfileobj(resp, out)
-        return True, 'downloaded_via_urllib'
-    except Exception as e:
-        # cleanup partial file
-        try:
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception:
-            pass
-        return False, f'failed: {e}'
+        digest = content_store.new_hasher()
+        if throttle is not None:
+            throttle.request()
+        with request_slot(limiter, url) as slot:
+            try:
+                resp = urllib.request.urlopen(req, timeout=60)
+            except urllib.error.HTTPError as e:
+                slot.response(e.code, e.headers)
+                raise retry.HttpStatusError(e.code, url, e.headers.get('Retry-After')) from e
+            with resp:
+                slot.response(resp.status, resp.headers)
+                check = PayloadCheck.for_response(filename, resp.headers)
+                with _open_download(path) as out:
+                    for chunk in iter(lambda: resp.read(content_store.CHUNK_SIZE), b''):
+                        if throttle is not None:
+                            throttle.consume(len(chunk))
+                        check.feed(chunk)
+                        out.write(chunk)
+                        digest.update(chunk)
+                check.finish()
+        _commit_download(path, digest)
+        return 'downloaded_via_urllib'
+    except Exception:
+        _remove_partial(path)
+        raise
+
+
+def _remove_partial(path):
+    """Delete the `.part` file a failed attempt left for `path`."""
+    try:
+        part = path + PART_SUFFIX
+        if os.path.exists(part):
+            os.remove(part)
+    except Exception:
+        pass
 
 
 # -----------------------------
@@ -860,6 +674,8 @@ def extract_text_from_pdf(path: str) -> str:
     if not path or not os.path.exists(path):
         return ""
 
+    import pdfplumber
+
     formatted_text = ""
     try:
         with pdfplumber.open(path) as pdf:
@@ -990,31 +806,27 @@ def find_schedule_pdfs(base_dir: str):
 
     Returns list of absolute file paths to PDFs.
     """
-    import glob
-    import re
-
     results = []
-    if not base_dir or not os.path.exists(base_dir):
+    if not base_dir or not fs_snapshot.exists(base_dir):
         return results
 
-    for year in os.listdir(base_dir):
+    for year in fs_snapshot.listdir(base_dir):
         year_path = os.path.join(base_dir, year)
-        if not os.path.isdir(year_path):
+        if not fs_snapshot.isdir(year_path):
             continue
         # prefer folders that look like years
         if not re.match(r'^20\d{2}$', year):
             continue
-        for month in os.listdir(year_path):
+        for month in fs_snapshot.listdir(year_path):
             month_path = os.path.join(year_path, month)
-            if not os.path.isdir(month_path):
+            if not fs_snapshot.isdir(month_path):
                 continue
             sched_dir = os.path.join(month_path, 'Schedules')
-            if not os.path.isdir(sched_dir):
+            if not fs_snapshot.isdir(sched_dir):
                 continue
             # collect PDFs
-            pdfs = glob.glob(os.path.join(sched_dir, '*.pdf'))
-            for p in pdfs:
-                results.append(os.path.abspath(p))
+            for name in _glob_names(sched_dir, '*.pdf'):
+                results.append(os.path.abspath(os.path.join(sched_dir, name)))
 
     return results
 
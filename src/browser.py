@@ -8,10 +8,9 @@ and finally checks PATH.
 
 from selenium import webdriver
 from selenium.webdriver.edge.service import Service
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 import os
 from shutil import which
-from src.config import EDGE_DRIVER_PATH, SKIP_WEBDRIVER_MANAGER
+from src.config import EDGE_DRIVER_PATH, SKIP_WEBDRIVER_MANAGER, get_settings
 
 
 def init_driver():
@@ -19,8 +18,7 @@ def init_driver():
     options.use_chromium = True
     
     # Check HEADLESS_DRIVER setting from .env
-    headless_env = os.getenv("HEADLESS_DRIVER", "false").strip().lower()
-    is_headless = headless_env in ("true", "1", "t", "yes")
+    is_headless = get_settings().headless_driver
 
     if is_headless:
         # Headless mode: run silently in background (useful for containers)
@@ -50,6 +48,8 @@ def init_driver():
 
     # Try webdriver-manager (automatic download)
     try:
+        from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
         service = Service(EdgeChromiumDriverManager().install())
         return webdriver.Edge(service=service, options=options)
     except Exception as e:
@@ -0,0 +1,552 @@
+"""
+Calendar backends used by the calendar sync.
+
+`tools/sync_calendar.py` builds event bodies (Google Calendar API shape) and
+hands them to a backend. Three backends are provided:
+
+- `GoogleCalendarBackend`: the Google Calendar API (default)
+- `IcsFeedBackend`: writes one `.ics` feed per minister, no credentials needed
+- `MemoryCalendarBackend`: keeps events in a dict, for tests and benchmarks
+
+Pick one with `CALENDAR_BACKEND=google|ics|memory` in `.env`.
+
+Remote backends are wrapped in `RateLimitedBackend`, which paces calls to the
+Calendar API quota, retries rate-limit and server errors with backoff, and
+queues deletes that still fail for the next run (a failed insert or patch is
+redone by the next sync, which still finds the assignment new or changed).
+"""
+
+import hashlib
+import os
+import re
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+
+from src.calendar_state import CalendarStateStore
+from src.config import get_settings
+from src.ratelimit import TokenBucket, backoff_delay
+from src.tracing import span
+
+
+class CalendarBackend:
+    """Interface every calendar backend implements.
+
+    Incremental backends keep events somewhere remote, so the sync uses the
+    local state store to patch/delete/skip. Non-incremental backends (feeds)
+    get every assignment of a schedule at once through `replace_source()` and
+    are regenerated from everything stored on `flush()`.
+    """
+
+    name = "base"
+    incremental = True
+
+    def __init__(self, store=None):
+        self._store = store
+
+    @property
+    def store(self):
+        """State store used for incremental sync; opened on first use."""
+        if self._store is None:
+            self._store = CalendarStateStore()
+        return self._store
+
+    def find_event(self, summary, start_dt):
+        """Return the id of an existing event with `summary` at `start_dt`, or None."""
+        raise NotImplementedError
+
+    def insert_event(self, body, key=None):
+        """Create an event from `body` and return its id."""
+        raise NotImplementedError
+
+    def patch_event(self, event_id, body):
+        raise NotImplementedError
+
+    def delete_event(self, event_id):
+        """Delete an event. Returns False if it was already gone."""
+        raise NotImplementedError
+
+    def replace_source(self, source, minister, events):
+        """Non-incremental backends: `events` [(key, body), ...] are all of `minister`'s events from `source`."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Write out anything buffered. Called once at the end of a run."""
+        return None
+
+    def close(self):
+        self.flush()
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+
+class GoogleCalendarBackend(CalendarBackend):
+    """Google Calendar API backend.
+
+    `service_factory` returns an authorised `googleapiclient` service; it is
+    only called when the API is actually needed, so unchanged runs never log in.
+    Duplicate checks run against the local calendar mirror, refreshed once per
+    run with `syncToken` (see `refresh_mirror`).
+    """
+
+    name = "google"
+
+    def __init__(self, service_factory, calendar_id="primary", store=None):
+        super().__init__(store)
+        self._service_factory = service_factory
+        self._service = None
+        self.calendar_id = calendar_id
+        self._mirror_ready = False
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = self._service_factory()
+        return self._service
+
+    def refresh_mirror(self):
+        """Bring the local calendar mirror up to date.
+
+        The first run reads the whole calendar once and saves the returned
+        `nextSyncToken`; later runs send that token so only changes are
+        returned. A 410 Gone (token too old) falls back to a full resync.
+        """
+        store = self.store
+        token_name = "sync_token:" + self.calendar_id
+        token = store.get_meta(token_name)
+        if not token:
+            store.clear_events()
+
+        changed = 0
+        page_token = None
+        while True:
+            params = {"calendarId": self.calendar_id, "showDeleted": True, "maxResults": 2500}
+            if token:
+                params["syncToken"] = token
+            if page_token:
+                params["pageToken"] = page_token
+            try:
+                result = self.service.events().list(**params).execute()
+            except Exception as e:
+                if _http_status(e) == 410 and token:
+                    print("Calendar sync token expired; doing a full resync.")
+                    store.set_meta(token_name, None)
+                    store.clear_events()
+                    token = None
+                    page_token = None
+                    changed = 0
+                    continue
+                raise
+
+            changed += store.apply_event_changes(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                store.set_meta(token_name, result.get("nextSyncToken"))
+                break
+
+        mode = "incremental" if token else "full"
+        print(f"Calendar {mode} sync: {changed} change(s) fetched.")
+        self._mirror_ready = True
+        return changed
+
+    def find_event(self, summary, start_dt):
+        if not self._mirror_ready:
+            self.refresh_mirror()
+        return self.store.find_event(summary, start_dt)
+
+    def insert_event(self, body, key=None):
+        created = self.service.events().insert(calendarId=self.calendar_id, body=body).execute()
+        self.store.apply_event_changes([created])
+        return created.get("id")
+
+    def patch_event(self, event_id, body):
+        patched = self.service.events().patch(calendarId=self.calendar_id, eventId=event_id, body=body).execute()
+        self.store.apply_event_changes([patched])
+
+    def delete_event(self, event_id):
+        try:
+            self.service.events().delete(calendarId=self.calendar_id, eventId=event_id).execute()
+        except Exception as e:
+            # 404/410 means the event is already gone
+            if _http_status(e) in (404, 410):
+                return False
+            raise
+        return True
+
+
+class MemoryCalendarBackend(CalendarBackend):
+    """In-memory calendar for tests and benchmarks.
+
+    Uses an in-memory state store by default so nothing touches disk.
+    `calls` counts operations by name.
+    """
+
+    name = "memory"
+
+    def __init__(self, store=None):
+        super().__init__(store if store is not None else CalendarStateStore(":memory:"))
+        self.events = {}
+        self.calls = {"find": 0, "insert": 0, "patch": 0, "delete": 0}
+
+    def find_event(self, summary, start_dt):
+        self.calls["find"] += 1
+        wanted = start_dt.timestamp()
+        for event_id, body in self.events.items():
+            if body.get("summary") != summary:
+                continue
+            start = _parse_event_dt(body.get("start"))
+            if start is not None and abs(start.timestamp() - wanted) <= 300:
+                return event_id
+        return None
+
+    def insert_event(self, body, key=None):
+        self.calls["insert"] += 1
+        event_id = uuid.uuid4().hex
+        self.events[event_id] = dict(body)
+        return event_id
+
+    def patch_event(self, event_id, body):
+        self.calls["patch"] += 1
+        if event_id not in self.events:
+            raise KeyError(event_id)
+        self.events[event_id].update(body)
+
+    def delete_event(self, event_id):
+        self.calls["delete"] += 1
+        return self.events.pop(event_id, None) is not None
+
+
+class IcsFeedBackend(CalendarBackend):
+    """Writes one iCalendar feed per minister into `feed_dir`.
+
+    Feed events are kept in the state store per (source schedule, minister):
+    `replace_source` swaps in the events of each schedule parsed in this run
+    (dropping ones no longer on it), and `flush()` writes every feed from the
+    whole store in a single pass. Schedules not parsed in this run (older
+    months, or months left out with --months) keep their events.
+    """
+
+    name = "ics"
+    incremental = False
+
+    def __init__(self, feed_dir=None, store=None):
+        super().__init__(store)
+        self.feed_dir = feed_dir or get_settings().ics_feed_dir
+        # ministers whose feed changed in this run (written on flush even when now empty)
+        self._changed = set()
+
+    def find_event(self, summary, start_dt):
+        return None
+
+    def _uid(self, body, key=None):
+        uid_source = key or f"{body.get('summary')}|{(body.get('start') or {}).get('dateTime')}"
+        return hashlib.sha1(uid_source.encode("utf-8")).hexdigest() + "@dsg-downloader"
+
+    def insert_event(self, body, key=None):
+        props = (body.get("extendedProperties") or {}).get("private") or {}
+        minister = props.get("dsgMinister") or "calendar"
+        uid = self._uid(body, key)
+        self.store.upsert_feed_event(key or uid, uid, minister, props.get("dsgSource") or "", body)
+        self._changed.add(minister)
+        return uid
+
+    def patch_event(self, event_id, body):
+        minister = self.store.patch_feed_event(event_id, body)
+        if minister is not None:
+            self._changed.add(minister)
+
+    def delete_event(self, event_id):
+        minister = self.store.delete_feed_event(event_id)
+        if minister is None:
+            return False
+        self._changed.add(minister)
+        return True
+
+    def replace_source(self, source, minister, events):
+        self.store.replace_feed_events(source, minister, [(key, self._uid(body, key), body) for key, body in events])
+        self._changed.add(minister)
+
+    def flush(self):
+        """Write every minister's feed from the store. Returns the list of written paths."""
+        if not self._changed:
+            return []
+        feeds = self.store.feed_events()
+        for minister in self._changed:
+            # the last assignment was removed: write an empty feed instead of leaving the old one
+            feeds.setdefault(minister, {})
+        os.makedirs(self.feed_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        written = []
+        for minister, events in sorted(feeds.items()):
+            path = os.path.join(self.feed_dir, _feed_filename(minister))
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8", newline="") as f:
+                f.write(_render_calendar(minister, events, stamp))
+            os.replace(tmp, path)
+            written.append(path)
+            print(f"Wrote calendar feed: {path} ({len(events)} event(s))")
+        self._changed = set()
+        return written
+
+
+class CalendarWriteError(Exception):
+    """A calendar write that still failed after all retries (redone or replayed on the next run)."""
+
+
+class RateLimitedBackend(CalendarBackend):
+    """Wraps a remote backend with quota pacing, retries and a persisted retry queue.
+
+    - every call takes a token from a bucket sized to the API quota
+      (`CALENDAR_QPS`, `CALENDAR_BURST`)
+    - 429, 403 rateLimitExceeded/userRateLimitExceeded, 5xx and network
+      errors are retried with exponential backoff and jitter, up to
+      `CALENDAR_MAX_ATTEMPTS` attempts
+    - deletes that still fail are stored in the state store and replayed by
+      `replay_pending()` on the next run; inserts and patches are not queued,
+      since the next sync sees the assignment as new or changed and redoes
+      them from the current schedule (recording the event in `assignments`)
+
+    `stats` counts calls, retries, drops (writes given up on this run) and
+    replayed writes.
+    """
+
+    def __init__(self, inner, qps=None, burst=None, max_attempts=None, sleep=time.sleep):
+        super().__init__(None)
+        self.inner = inner
+        self.name = inner.name
+        self.incremental = inner.incremental
+        settings = get_settings()
+        qps = float(qps if qps is not None else settings.calendar_qps)
+        burst = float(burst if burst is not None else settings.calendar_burst)
+        self.max_attempts = int(max_attempts if max_attempts is not None else settings.calendar_max_attempts)
+        self._bucket = TokenBucket(qps, burst, sleep=sleep)
+        self._sleep = sleep
+        self.stats = {"calls": 0, "retries": 0, "drops": 0, "replayed": 0}
+
+    @property
+    def store(self):
+        return self.inner.store
+
+    def _call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            self._bucket.acquire()
+            self.stats["calls"] += 1
+            try:
+                with span("calendar.api", op=getattr(fn, "__name__", "call"), attempt=attempt):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_attempts:
+                    raise
+                self.stats["retries"] += 1
+                delay = backoff_delay(attempt, base=1.0, cap=32.0)
+                print(f"Calendar API busy ({_describe_error(e)}); retrying in {delay:.1f}s...")
+                self._sleep(delay)
+
+    def _write(self, op, fn, *args, key=None, event_id=None, body=None):
+        try:
+            return self._call(fn, *args)
+        except Exception as e:
+            if not is_retryable_error(e):
+                raise
+            self.stats["drops"] += 1
+            if op == "delete":
+                self.store.add_pending(op, key=key, event_id=event_id, body=body, error=_describe_error(e))
+            raise CalendarWriteError(f"{op} failed after {self.max_attempts} attempts, retried next run: {e}") from e
+
+    def find_event(self, summary, start_dt):
+        return self._call(self.inner.find_event, summary, start_dt)
+
+    def insert_event(self, body, key=None):
+        return self._write("insert", self.inner.insert_event, body, key, key=key, body=body)
+
+    def patch_event(self, event_id, body):
+        return self._write("patch", self.inner.patch_event, event_id, body, event_id=event_id, body=body)
+
+    def delete_event(self, event_id):
+        return self._write("delete", self.inner.delete_event, event_id, event_id=event_id)
+
+    def replay_pending(self):
+        """Retry deletes queued by earlier runs. Returns the number that succeeded.
+
+        Inserts and patches queued by older versions are dropped without
+        replaying them: their assignment has no up-to-date `assignments` row,
+        so the next sync creates (or adopts) and patches the event from the
+        current schedule, and one that left the schedule is not recreated.
+        """
+        done = 0
+        for row in self.store.pending_writes():
+            if row["op"] != "delete":
+                self.store.remove_pending(row["id"])
+                continue
+            try:
+                self._call(self.inner.delete_event, row["event_id"])
+            except Exception as e:
+                if is_retryable_error(e):
+                    # still failing; keep it queued
+                    continue
+                print(f"Dropping queued calendar {row['op']}: {e}")
+            else:
+                done += 1
+            self.store.remove_pending(row["id"])
+        self.stats["replayed"] += done
+        return done
+
+    def flush(self):
+        return self.inner.flush()
+
+    def close(self):
+        s = self.stats
+        if s["calls"]:
+            print(f"Calendar API: {s['calls']} call(s), {s['retries']} retr(ies), {s['drops']} failed write(s) left for next run.")
+        self.inner.close()
+
+
+def is_retryable_error(exc):
+    """True for rate limiting (429, 403 rate-limit reasons), 5xx and network errors."""
+    status = _http_status(exc)
+    if status == 429 or (status is not None and 500 <= status < 600):
+        return True
+    if status == 403:
+        text = _describe_error(exc)
+        return "ratelimitexceeded" in text.lower() or "userratelimitexceeded" in text.lower()
+    if status is None:
+        return isinstance(exc, (ConnectionError, TimeoutError, socket.timeout))
+    return False
+
+
+def get_backend(name=None, service_factory=None):
+    """Create the backend named by `name` or `CALENDAR_BACKEND` (default 'google').
+
+    Remote backends come wrapped in `RateLimitedBackend`; deletes queued by
+    earlier runs are replayed straight away.
+    """
+    name = (name or get_settings().calendar_backend).strip().lower()
+    if name == "ics":
+        return IcsFeedBackend()
+    if name == "memory":
+        return MemoryCalendarBackend()
+    if name == "google":
+        if service_factory is None:
+            raise ValueError("GoogleCalendarBackend needs a service_factory")
+        backend = RateLimitedBackend(GoogleCalendarBackend(service_factory))
+        replayed = backend.replay_pending()
+        if replayed:
+            print(f"Replayed {replayed} queued calendar delete(s) from an earlier run.")
+        return backend
+    raise ValueError(f"Unknown CALENDAR_BACKEND: {name!r} (expected google, ics or memory)")
+
+
+# -----------------------------
+# helpers
+# -----------------------------
+def _http_status(exc):
+    """Return the HTTP status of a googleapiclient HttpError (or similar), else None."""
+    resp = getattr(exc, "resp", None)
+    status = getattr(resp, "status", None) or getattr(exc, "status_code", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _describe_error(exc):
+    """Short text for an API error, including the JSON error body when there is one."""
+    content = getattr(exc, "content", b"") or b""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", "replace")
+    text = str(exc)
+    return f"{text} {content}".strip() if content and content not in text else text
+
+
+def _parse_event_dt(value):
+    start = (value or {}).get("dateTime")
+    if not start:
+        return None
+    try:
+        return datetime.fromisoformat(start.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def _feed_filename(minister):
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", minister).strip("-") or "calendar"
+    return slug + ".ics"
+
+
+def _ics_escape(text):
+    return (
+        (text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line):
+    # RFC 5545: lines longer than 75 octets are continued with CRLF + space
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        cut = 75 if not parts else 74
+        chunk = data[:cut]
+        # do not split a multi-byte character
+        while True:
+            try:
+                text = chunk.decode("utf-8")
+                break
+            except UnicodeDecodeError:
+                chunk = chunk[:-1]
+        parts.append(text)
+        data = data[len(chunk):]
+    return "\r\n ".join(parts)
+
+
+def _ics_utc(dt):
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _render_calendar(minister, events, stamp):
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//DSG Downloader//Calendar Feed//EN",
+        "CALSCALE:GREGORIAN",
+        "X-WR-CALNAME:" + _ics_escape(minister),
+    ]
+    for uid, body in sorted(events.items(), key=lambda kv: (kv[1].get("start") or {}).get("dateTime") or ""):
+        start = _parse_event_dt(body.get("start"))
+        end = _parse_event_dt(body.get("end"))
+        if start is None:
+            continue
+        lines += [
+            "BEGIN:VEVENT",
+            "UID:" + uid,
+            "DTSTAMP:" + stamp,
+            "DTSTART:" + _ics_utc(start),
+        ]
+        if end is not None:
+            lines.append("DTEND:" + _ics_utc(end))
+        lines += [
+            "SUMMARY:" + _ics_escape(body.get("summary")),
+            "LOCATION:" + _ics_escape(body.get("location")),
+            "DESCRIPTION:" + _ics_escape(body.get("description")),
+        ]
+        for reminder in ((body.get("reminders") or {}).get("overrides") or []):
+            lines += [
+                "BEGIN:VALARM",
+                "ACTION:DISPLAY",
+                "DESCRIPTION:" + _ics_escape(body.get("summary")),
+                f"TRIGGER:-PT{int(reminder.get('minutes', 0))}M",
+                "END:VALARM",
+            ]
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_ics_fold(l) for l in lines) + "\r\n"
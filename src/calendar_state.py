@@ -0,0 +1,299 @@
+"""
+Local state store for calendar sync.
+
+Remembers which calendar event was created for which schedule assignment so a
+re-run can patch changed events, delete assignments that disappeared from a
+schedule, and skip unchanged ones without asking the calendar API.
+
+An assignment is identified by (minister, date, location, source schedule).
+The store is a small SQLite file next to `token.json` by default. It also keeps
+a local mirror of the calendar (kept fresh with the Calendar API `syncToken`)
+so duplicate checks do not need to re-read the calendar on every run.
+
+For the ICS feed backend it keeps the feed events themselves (`feed_events`),
+so each feed is written from every schedule ever parsed, not just the ones
+read in this run.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from src.config import get_settings
+
+
+def assignment_key(minister, date, location, source):
+    """Build the stable key for one assignment cell.
+
+    Values are normalised (trimmed, lower-cased) so cosmetic changes in the PDF
+    text do not look like a new assignment.
+    """
+    parts = [" ".join((p or "").split()).lower() for p in (minister, date, location, source)]
+    return "|".join(parts)
+
+
+def content_hash(event_body):
+    """Return a sha256 of the event body so edits can be detected locally."""
+    payload = json.dumps(event_body, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CalendarStateStore:
+    """SQLite mapping of assignment key -> (calendar event id, content hash)."""
+
+    def __init__(self, path=None):
+        self.path = path or get_settings().calendar_state_db
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # the calendar stage may open the store on a worker thread and close it from the main thread
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS assignments (
+                key TEXT PRIMARY KEY,
+                minister TEXT NOT NULL,
+                date TEXT NOT NULL,
+                location TEXT NOT NULL,
+                source TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_assignments_source ON assignments(source)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                event_id TEXT PRIMARY KEY,
+                summary TEXT,
+                start_ts REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_start ON events(start_ts)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS feed_events (
+                key TEXT PRIMARY KEY,
+                uid TEXT NOT NULL,
+                minister TEXT NOT NULL,
+                source TEXT NOT NULL,
+                body TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_feed_events_source ON feed_events(source, minister)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_writes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                key TEXT,
+                event_id TEXT,
+                body TEXT,
+                error TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the stored row for `key` as a dict, or None."""
+        row = self._conn.execute("SELECT * FROM assignments WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def upsert(self, key, minister, date, location, source, event_id, digest):
+        self._conn.execute(
+            """
+            INSERT INTO assignments (key, minister, date, location, source, event_id, content_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                event_id = excluded.event_id,
+                content_hash = excluded.content_hash,
+                updated_at = excluded.updated_at
+            """,
+            (key, minister, date, location, source, event_id, digest, time.time()),
+        )
+        self._conn.commit()
+
+    def delete(self, key):
+        self._conn.execute("DELETE FROM assignments WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def rows_for_source(self, source):
+        """Return all stored rows that came from the schedule `source`."""
+        cur = self._conn.execute("SELECT * FROM assignments WHERE source = ?", (source,))
+        return [dict(r) for r in cur.fetchall()]
+
+    # -----------------------------
+    # Calendar mirror and sync token
+    # -----------------------------
+    def get_meta(self, name):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, name, value):
+        if value is None:
+            self._conn.execute("DELETE FROM meta WHERE name = ?", (name,))
+        else:
+            self._conn.execute(
+                "INSERT INTO meta (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (name, value),
+            )
+        self._conn.commit()
+
+    def clear_events(self):
+        """Forget the mirrored calendar (used before a full resync)."""
+        self._conn.execute("DELETE FROM events")
+        self._conn.commit()
+
+    def apply_event_changes(self, items):
+        """Apply a page of `events.list` results to the mirror.
+
+        Cancelled events are removed from the mirror and any assignment that
+        pointed at them is forgotten so the next sync recreates it.
+        Returns the number of items applied.
+        """
+        count = 0
+        for ev in items:
+            event_id = ev.get("id")
+            if not event_id:
+                continue
+            count += 1
+            if ev.get("status") == "cancelled":
+                self._conn.execute("DELETE FROM events WHERE event_id = ?", (event_id,))
+                self._conn.execute("DELETE FROM assignments WHERE event_id = ?", (event_id,))
+                continue
+            self._conn.execute(
+                """
+                INSERT INTO events (event_id, summary, start_ts) VALUES (?, ?, ?)
+                ON CONFLICT(event_id) DO UPDATE SET summary = excluded.summary, start_ts = excluded.start_ts
+                """,
+                (event_id, ev.get("summary"), _event_start_ts(ev)),
+            )
+        self._conn.commit()
+        return count
+
+    def find_event(self, summary, start_dt, window_seconds=300):
+        """Return the id of a mirrored event with `summary` starting within `window_seconds` of `start_dt`."""
+        ts = start_dt.timestamp()
+        row = self._conn.execute(
+            "SELECT event_id FROM events WHERE summary = ? AND start_ts BETWEEN ? AND ? LIMIT 1",
+            (summary, ts - window_seconds, ts + window_seconds),
+        ).fetchone()
+        return row["event_id"] if row else None
+
+    # -----------------------------
+    # Feed events (ICS backend)
+    # -----------------------------
+    def replace_feed_events(self, source, minister, events):
+        """Make `events` [(key, uid, body), ...] the only feed events of `minister` from `source`."""
+        self._conn.execute("DELETE FROM feed_events WHERE source = ? AND minister = ?", (source, minister))
+        for key, uid, body in events:
+            self._upsert_feed_event(key, uid, minister, source, body)
+        self._conn.commit()
+
+    def upsert_feed_event(self, key, uid, minister, source, body):
+        self._upsert_feed_event(key, uid, minister, source, body)
+        self._conn.commit()
+
+    def _upsert_feed_event(self, key, uid, minister, source, body):
+        self._conn.execute(
+            """
+            INSERT INTO feed_events (key, uid, minister, source, body, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                uid = excluded.uid,
+                minister = excluded.minister,
+                source = excluded.source,
+                body = excluded.body,
+                updated_at = excluded.updated_at
+            """,
+            (key, uid, minister, source, json.dumps(body), time.time()),
+        )
+
+    def _feed_minister(self, uid):
+        row = self._conn.execute("SELECT minister FROM feed_events WHERE uid = ?", (uid,)).fetchone()
+        return row["minister"] if row else None
+
+    def patch_feed_event(self, uid, body):
+        """Replace the body of the feed event `uid`. Returns its minister, or None if there is no such event."""
+        minister = self._feed_minister(uid)
+        if minister is not None:
+            self._conn.execute(
+                "UPDATE feed_events SET body = ?, updated_at = ? WHERE uid = ?", (json.dumps(body), time.time(), uid)
+            )
+            self._conn.commit()
+        return minister
+
+    def delete_feed_event(self, uid):
+        """Delete the feed event `uid`. Returns its minister, or None if there was no such event."""
+        minister = self._feed_minister(uid)
+        if minister is not None:
+            self._conn.execute("DELETE FROM feed_events WHERE uid = ?", (uid,))
+            self._conn.commit()
+        return minister
+
+    def feed_events(self):
+        """{minister: {uid: body}} for every stored feed event."""
+        feeds = {}
+        for r in self._conn.execute("SELECT minister, uid, body FROM feed_events ORDER BY minister, uid"):
+            feeds.setdefault(r["minister"], {})[r["uid"]] = json.loads(r["body"])
+        return feeds
+
+    # -----------------------------
+    # Retry queue for calendar writes
+    # -----------------------------
+    def add_pending(self, op, key=None, event_id=None, body=None, error=None):
+        """Remember a calendar write that still failed at the end of a run."""
+        self._conn.execute(
+            "INSERT INTO pending_writes (op, key, event_id, body, error, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (op, key, event_id, json.dumps(body) if body is not None else None, error, time.time()),
+        )
+        self._conn.commit()
+
+    def pending_writes(self):
+        """Return queued writes (oldest first) with `body` decoded."""
+        cur = self._conn.execute("SELECT * FROM pending_writes ORDER BY id")
+        rows = []
+        for r in cur.fetchall():
+            row = dict(r)
+            row["body"] = json.loads(row["body"]) if row["body"] else None
+            rows.append(row)
+        return rows
+
+    def remove_pending(self, pending_id):
+        self._conn.execute("DELETE FROM pending_writes WHERE id = ?", (pending_id,))
+        self._conn.commit()
+
+    def close(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _event_start_ts(event):
+    """Return the event start as a UNIX timestamp, or None for unparseable/all-day starts."""
+    start = (event.get("start") or {}).get("dateTime")
+    if not start:
+        return None
+    try:
+        # Python < 3.11 does not accept a trailing 'Z'
+        return datetime.fromisoformat(start.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
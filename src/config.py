@@ -2,51 +2,335 @@
 Configuration values loaded from environment or `.env`.
 
 Keep values minimal and documented so non-developers can review what is configurable.
+
+`.env` is parsed once per process into a `Settings` object (`get_settings()`);
+the module-level constants below are read from it. Values already set in the
+OS environment win over `.env`, except USERNAME and PASSWORD (Windows always
+sets USERNAME to the logged-in account). `save_env_values()` writes several
+keys back to `.env` in one atomic rewrite.
 """
 
+import json
 import os
-from dotenv import load_dotenv, dotenv_values
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from dotenv import dotenv_values
+
+_PROJECT_ENV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env")
+# the .env in the working folder (where the UI has always saved choices), else the project one
+ENV_PATH = os.path.join(os.getcwd(), ".env") if os.path.exists(os.path.join(os.getcwd(), ".env")) else _PROJECT_ENV
+
+_TRUE = ("true", "1", "t", "yes")
+_write_lock = threading.Lock()
+
+
+def _as_bool(value, default=False):
+    if value is None:
+        return default
+    return str(value).strip().lower() in _TRUE
+
+
+def _as_int(value, default):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_float(value, default):
+    try:
+        return float(str(value).strip())
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_size(value, default):
+    """Bytes from '500KB', '1.5MB' or a plain number."""
+    if value in (None, ""):
+        return default
+    from src.ratelimit import parse_size
+
+    try:
+        return parse_size(value)
+    except ValueError:
+        return default
+
+
+def _as_json(value, default):
+    if value in (None, ""):
+        return default
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Every setting the app reads, parsed once. `values` holds the merged raw strings."""
+
+    url: str = "https://naccanada.org"
+    dsgs_dir: str = r"C:\Users\Marcus\OneDrive\Documents\Church\DSGs"
+    onedrive_remote: str = "onedrive-dsg-downloader:Documents/Church/DSGs"
+    full_upload: bool = False
+    upload_workers: int = 2
+    dedup_downloads: bool = True
+    download_workers: int = 4
+    download_max_workers: int = 8
+    adaptive_concurrency: bool = True
+    retry_max_attempts: int = 3
+    retry_error_budget: int = 50
+    circuit_breaker_threshold: int = 5
+    circuit_breaker_reset: float = 60.0
+    download_max_bytes_per_sec: float = 0.0
+    download_max_requests_per_sec: float = 0.0
+    download_limit_profiles: str = ""
+    parse_workers: int = 1
+    highlight_workers: int = 1
+    pipeline_queue_size: int = 32
+    download_priority: str = "month,type,size"
+    edge_driver_path: str = ""
+    skip_webdriver_manager: bool = False
+    headless_driver: bool = False
+    use_ui: bool = False
+    username: str = ""
+    password: str = ""
+    search_name: str = ""
+    locations: Tuple[str, ...] = ()
+    local_timezone: str = "America/Toronto"
+    service_duration_hours: float = 1.5
+    reminder_minutes: int = 1440
+    minister_colors: Dict[str, Any] = field(default_factory=dict)
+    highlight_opacity: float = 0.3
+    pdf_path: str = ""
+    calendar_backend: str = "google"
+    calendar_state_db: str = "calendar_state.db"
+    ics_feed_dir: str = "calendar_feeds"
+    calendar_qps: float = 5.0
+    calendar_burst: float = 10.0
+    calendar_max_attempts: int = 5
+    values: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    def get(self, key, default=None):
+        """Raw string value of any .env / environment key."""
+        value = self.values.get(key)
+        return default if value is None else value
+
+    def get_json(self, key, default=None):
+        """JSON-decoded value of `key` (e.g. the saved UI choices); `default` if missing or invalid."""
+        return _as_json(self.values.get(key), default)
+
+    @classmethod
+    def from_values(cls, values):
+        v = values.get
+        raw_locs = v("LOCATIONS") or ""
+        return cls(
+            url=v("URL") or cls.url,
+            dsgs_dir=v("DSGS_DIR") or cls.dsgs_dir,
+            onedrive_remote=v("ONEDRIVE_REMOTE") or cls.onedrive_remote,
+            full_upload=_as_bool(v("FULL_UPLOAD")),
+            upload_workers=_as_int(v("UPLOAD_WORKERS"), cls.upload_workers),
+            dedup_downloads=_as_bool(v("DEDUP_DOWNLOADS"), cls.dedup_downloads),
+            download_workers=_as_int(v("DOWNLOAD_WORKERS"), cls.download_workers),
+            download_max_workers=_as_int(v("DOWNLOAD_MAX_WORKERS"), cls.download_max_workers),
+            adaptive_concurrency=_as_bool(v("ADAPTIVE_CONCURRENCY"), cls.adaptive_concurrency),
+            retry_max_attempts=_as_int(v("RETRY_MAX_ATTEMPTS"), cls.retry_max_attempts),
+            retry_error_budget=_as_int(v("RETRY_ERROR_BUDGET"), cls.retry_error_budget),
+            circuit_breaker_threshold=_as_int(v("CIRCUIT_BREAKER_THRESHOLD"), cls.circuit_breaker_threshold),
+            circuit_breaker_reset=_as_float(v("CIRCUIT_BREAKER_RESET"), cls.circuit_breaker_reset),
+            download_max_bytes_per_sec=_as_size(v("DOWNLOAD_MAX_BYTES_PER_SEC"), cls.download_max_bytes_per_sec),
+            download_max_requests_per_sec=_as_float(v("DOWNLOAD_MAX_REQUESTS_PER_SEC"), cls.download_max_requests_per_sec),
+            download_limit_profiles=v("DOWNLOAD_LIMIT_PROFILES") or "",
+            parse_workers=_as_int(v("PARSE_WORKERS"), cls.parse_workers),
+            highlight_workers=_as_int(v("HIGHLIGHT_WORKERS"), cls.highlight_workers),
+            pipeline_queue_size=_as_int(v("PIPELINE_QUEUE_SIZE"), cls.pipeline_queue_size),
+            download_priority=cls.download_priority if v("DOWNLOAD_PRIORITY") is None else v("DOWNLOAD_PRIORITY"),
+            edge_driver_path=v("EDGE_DRIVER_PATH") or "",
+            skip_webdriver_manager=_as_bool(v("SKIP_WEBDRIVER_MANAGER")),
+            headless_driver=_as_bool(v("HEADLESS_DRIVER")),
+            use_ui=_as_bool(v("USE_UI")),
+            username=v("USERNAME") or "",
+            password=v("PASSWORD") or "",
+            search_name=v("SEARCH_NAME") or "",
+            locations=tuple(loc.strip() for loc in raw_locs.split(",") if loc.strip()),
+            local_timezone=v("LOCAL_TIMEZONE") or cls.local_timezone,
+            service_duration_hours=_as_float(v("SERVICE_DURATION_HOURS"), cls.service_duration_hours),
+            reminder_minutes=_as_int(v("REMINDER_MINUTES"), cls.reminder_minutes),
+            minister_colors=_as_json(v("MINISTER_COLORS"), {}) or {},
+            highlight_opacity=_as_float(v("HIGHLIGHT_OPACITY"), cls.highlight_opacity),
+            pdf_path=(v("PDF_PATH") or "").strip('"'),
+            calendar_backend=(v("CALENDAR_BACKEND") or cls.calendar_backend).strip().lower(),
+            calendar_state_db=v("CALENDAR_STATE_DB") or cls.calendar_state_db,
+            ics_feed_dir=v("ICS_FEED_DIR") or cls.ics_feed_dir,
+            calendar_qps=_as_float(v("CALENDAR_QPS"), cls.calendar_qps),
+            calendar_burst=_as_float(v("CALENDAR_BURST"), cls.calendar_burst),
+            calendar_max_attempts=_as_int(v("CALENDAR_MAX_ATTEMPTS"), cls.calendar_max_attempts),
+            values=dict(values),
+        )
 
-load_dotenv()
-_env_vals = dotenv_values()
+
+def _read_env_file(path=None):
+    path = path or ENV_PATH
+    if not os.path.exists(path):
+        return {}
+    return {k: v for k, v in dotenv_values(path).items() if v is not None}
+
+
+@lru_cache(maxsize=1)
+def get_settings():
+    """Parse `.env` once, export its values to os.environ (without overriding) and return the Settings."""
+    file_vals = _read_env_file()
+    for key, value in file_vals.items():
+        os.environ.setdefault(key, value)
+    merged = dict(os.environ)
+    # Credentials: prefer values from project .env over OS environment
+    for key in ("USERNAME", "PASSWORD"):
+        if key in file_vals:
+            merged[key] = file_vals[key]
+    return Settings.from_values(merged)
+
+
+def reload_settings():
+    """Drop the cached settings so the next `get_settings()` re-reads `.env`."""
+    get_settings.cache_clear()
+    return get_settings()
+
+
+def _quote_env_value(value):
+    # single quotes keep JSON (double quotes) intact; python-dotenv unescapes \\ and \'
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def save_env_values(updates, path=None):
+    """Write all `updates` (key -> str) into `.env` with one atomic rewrite.
+
+    Existing lines for those keys are replaced in place; new keys are appended.
+    os.environ and the cached settings are updated to match.
+    """
+    path = path or ENV_PATH
+    if not updates:
+        return
+    with _write_lock:
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            lines = []
+
+        remaining = dict(updates)
+        out = []
+        for line in lines:
+            stripped = line.lstrip()
+            if stripped.startswith("export "):
+                stripped = stripped[len("export "):].lstrip()
+            key = stripped.split("=", 1)[0].strip() if "=" in stripped and not stripped.startswith("#") else None
+            if key in remaining:
+                if key is not None and remaining[key] is not None:
+                    out.append(f"{key}={_quote_env_value(remaining[key])}")
+                remaining[key] = None
+                continue
+            out.append(line)
+        for key, value in remaining.items():
+            if value is not None:
+                out.append(f"{key}={_quote_env_value(value)}")
+
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix=".env.", suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+                f.write("\n".join(out) + "\n")
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    for key, value in updates.items():
+        os.environ[key] = str(value)
+    get_settings.cache_clear()
+
+
+SETTINGS = get_settings()
 
 # URL of the site to open
-URL = os.getenv("URL", "https://naccanada.org")
+URL = SETTINGS.url
 
 # Selectors used for sign-in and navigation. These are configurable via .env
-BUTTON_SELECTOR = os.getenv("BUTTON_SELECTOR", "//a[contains(normalize-space(), 'Sign In')]")
-SELECTOR_TYPE = os.getenv("SELECTOR_TYPE", "xpath")
+BUTTON_SELECTOR = SETTINGS.get("BUTTON_SELECTOR", "//a[contains(normalize-space(), 'Sign In')]")
+SELECTOR_TYPE = SETTINGS.get("SELECTOR_TYPE", "xpath")
 
-SIGNIN_LINK_SELECTOR = os.getenv("SIGNIN_LINK_SELECTOR", "#ctl01_LoginStatus1")
-SIGNIN_LINK_SELECTOR_TYPE = os.getenv("SIGNIN_LINK_SELECTOR_TYPE", "css")
+SIGNIN_LINK_SELECTOR = SETTINGS.get("SIGNIN_LINK_SELECTOR", "#ctl01_LoginStatus1")
+SIGNIN_LINK_SELECTOR_TYPE = SETTINGS.get("SIGNIN_LINK_SELECTOR_TYPE", "css")
 
-USERNAME_SELECTOR = os.getenv("USERNAME_SELECTOR", "#ctl01_TemplateBody_WebPartManager1_gwpciNewContactSignInCommon_ciNewContactSignInCommon_signInUserName")
-USERNAME_SELECTOR_TYPE = os.getenv("USERNAME_SELECTOR_TYPE", "css")
+USERNAME_SELECTOR = SETTINGS.get("USERNAME_SELECTOR", "#ctl01_TemplateBody_WebPartManager1_gwpciNewContactSignInCommon_ciNewContactSignInCommon_signInUserName")
+USERNAME_SELECTOR_TYPE = SETTINGS.get("USERNAME_SELECTOR_TYPE", "css")
 
-PASSWORD_SELECTOR = os.getenv("PASSWORD_SELECTOR", "#ctl01_TemplateBody_WebPartManager1_gwpciNewContactSignInCommon_ciNewContactSignInCommon_signInPassword")
-PASSWORD_SELECTOR_TYPE = os.getenv("PASSWORD_SELECTOR_TYPE", "css")
+PASSWORD_SELECTOR = SETTINGS.get("PASSWORD_SELECTOR", "#ctl01_TemplateBody_WebPartManager1_gwpciNewContactSignInCommon_ciNewContactSignInCommon_signInPassword")
+PASSWORD_SELECTOR_TYPE = SETTINGS.get("PASSWORD_SELECTOR_TYPE", "css")
 
-SUBMIT_SELECTOR = os.getenv("SUBMIT_SELECTOR", "#ctl01_TemplateBody_WebPartManager1_gwpciNewContactSignInCommon_ciNewContactSignInCommon_SubmitButton")
-SUBMIT_SELECTOR_TYPE = os.getenv("SUBMIT_SELECTOR_TYPE", "css")
+SUBMIT_SELECTOR = SETTINGS.get("SUBMIT_SELECTOR", "#ctl01_TemplateBody_WebPartManager1_gwpciNewContactSignInCommon_ciNewContactSignInCommon_SubmitButton")
+SUBMIT_SELECTOR_TYPE = SETTINGS.get("SUBMIT_SELECTOR_TYPE", "css")
 
 # MiniHQ link selector
-MINIHQ_LINK_SELECTOR = os.getenv("MINIHQ_LINK_SELECTOR", "#ctl01_Auxiliary_Auxiliary_rptWrapper_Auxiliary_rptWrapper_rpt_ctl02_NavigationLink")
-MINIHQ_LINK_SELECTOR_TYPE = os.getenv("MINIHQ_LINK_SELECTOR_TYPE", "css")
+MINIHQ_LINK_SELECTOR = SETTINGS.get("MINIHQ_LINK_SELECTOR", "#ctl01_Auxiliary_Auxiliary_rptWrapper_Auxiliary_rptWrapper_rpt_ctl02_NavigationLink")
+MINIHQ_LINK_SELECTOR_TYPE = SETTINGS.get("MINIHQ_LINK_SELECTOR_TYPE", "css")
 
 # Local folder for saving DSGs
-DSGS_DIR = os.getenv("DSGS_DIR", r"C:\Users\Marcus\OneDrive\Documents\Church\DSGs")
+DSGS_DIR = SETTINGS.dsgs_dir
 
 # Rclone target path on OneDrive
-ONEDRIVE_REMOTE = os.getenv("ONEDRIVE_REMOTE", "onedrive-dsg-downloader:Documents/Church/DSGs")
+ONEDRIVE_REMOTE = SETTINGS.onedrive_remote
+
+# Upload the whole DSGS_DIR every run instead of only the files changed in this run
+FULL_UPLOAD = SETTINGS.full_upload
+
+# Number of parallel rclone uploads running while files download (0 = upload everything at the end)
+UPLOAD_WORKERS = SETTINGS.upload_workers
+
+# Keep one copy of identical downloads (links into DSGS_DIR/.dsg-objects; see src/content_store.py)
+DEDUP_DOWNLOADS = SETTINGS.dedup_downloads
+
+# Pipeline worker counts (see main.py / src/pipeline.py)
+DOWNLOAD_WORKERS = SETTINGS.download_workers
+PARSE_WORKERS = SETTINGS.parse_workers
+HIGHLIGHT_WORKERS = SETTINGS.highlight_workers
+# Adapt the number of parallel downloads per host to how the site responds (src/ratelimit.py
+# AdaptiveLimiter): start at DOWNLOAD_WORKERS, grow up to DOWNLOAD_MAX_WORKERS, back off on 429/503
+ADAPTIVE_CONCURRENCY = SETTINGS.adaptive_concurrency
+DOWNLOAD_MAX_WORKERS = max(SETTINGS.download_max_workers, SETTINGS.download_workers)
+
+# Retries for downloads and month pages (src/retry.py): attempts per item, retries allowed per run,
+# and how many site-down failures in a row pause requests to the site (for CIRCUIT_BREAKER_RESET seconds)
+RETRY_MAX_ATTEMPTS = SETTINGS.retry_max_attempts
+RETRY_ERROR_BUDGET = SETTINGS.retry_error_budget
+CIRCUIT_BREAKER_THRESHOLD = SETTINGS.circuit_breaker_threshold
+CIRCUIT_BREAKER_RESET = SETTINGS.circuit_breaker_reset
+# Global download caps shared by all workers (0 = no limit), e.g. "512KB" and 4, and time-of-day
+# profiles that replace them: "sun 09:30-12:30=256KB/s,2req/s; 18:00-20:00=1MB/s" (src/ratelimit.py)
+DOWNLOAD_MAX_BYTES_PER_SEC = SETTINGS.download_max_bytes_per_sec
+DOWNLOAD_MAX_REQUESTS_PER_SEC = SETTINGS.download_max_requests_per_sec
+DOWNLOAD_LIMIT_PROFILES = SETTINGS.download_limit_profiles
+
+# Items that still failed, tried again on the next run
+DOWNLOAD_RETRY_LIST = SETTINGS.get("DOWNLOAD_RETRY_LIST", "download_retry.json")
+# Max items waiting in front of each pipeline stage before producers block
+PIPELINE_QUEUE_SIZE = SETTINGS.pipeline_queue_size
+# Order of queued downloads: criteria from month,type,size (empty = page order; see src/priority.py)
+DOWNLOAD_PRIORITY = SETTINGS.download_priority
 
 # Edge driver configuration
-EDGE_DRIVER_PATH = os.getenv("EDGE_DRIVER_PATH", "")
-_skip_raw = os.getenv("SKIP_WEBDRIVER_MANAGER", "false")
-SKIP_WEBDRIVER_MANAGER = str(_skip_raw).strip().lower() in ("1", "true", "yes")
+EDGE_DRIVER_PATH = SETTINGS.edge_driver_path
+SKIP_WEBDRIVER_MANAGER = SETTINGS.skip_webdriver_manager
 
 # Credentials: prefer values from project .env over OS environment
-USERNAME = _env_vals.get("USERNAME") if _env_vals.get("USERNAME") is not None else os.getenv("USERNAME", "")
-PASSWORD = _env_vals.get("PASSWORD") if _env_vals.get("PASSWORD") is not None else os.getenv("PASSWORD", "")
+USERNAME = SETTINGS.username
+PASSWORD = SETTINGS.password
 
 # UI Configuration
-USE_UI = os.getenv("USE_UI", "false").strip().lower() in ("true", "1", "t", "yes")
\ No newline at end of file
+USE_UI = SETTINGS.use_ui
@@ -0,0 +1,369 @@
+"""
+Content-addressed store that keeps one copy of each downloaded document.
+
+The same PDF or MP3 is often linked from several months or language sections,
+so it gets saved under several names. `save_url_to_path` hashes every download
+(sha256) while it streams and hands the path and digest to `ContentStore.add`:
+
+- the first file with some content is hardlinked into
+  `DSGS_DIR/.dsg-objects/<2 hex>/<sha256><ext>` (no copy is made)
+- a later file with the same digest is replaced by a clone of that object: a
+  reflink where the filesystem supports copy-on-write clones (Btrfs, XFS,
+  APFS), otherwise a hardlink; when neither works the copy is kept
+
+`index.json` in the store remembers which archive paths hold which digest (with
+their size and mtime, so a file rewritten later, e.g. by highlighting, no
+longer counts) and which path was already uploaded with that content, so
+`src.upload` can create duplicates with a server-side copy on the remote
+instead of uploading the same bytes again.
+
+The highlighter writes a new file and renames it over the old one, so a
+highlighted schedule gets its own inode and never changes the shared object.
+`prune` (run by `close_stores`) then removes objects that no archive file
+shares any more: the unhighlighted original, or a file deleted from the
+archive, would otherwise be kept forever.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+
+# folder (under the archive root) that holds the objects and the index
+OBJECTS_DIRNAME = ".dsg-objects"
+INDEX_NAME = "index.json"
+# read/write size used when hashing a file that is already on disk
+CHUNK_SIZE = 1024 * 64
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def new_hasher():
+    """The hash object `save_url_to_path` feeds while it writes a download."""
+    return hashlib.sha256()
+
+
+def hash_file(path):
+    """sha256 hex digest of a file on disk."""
+    h = new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _reflink(src, dst):
+    """Make `dst` a copy-on-write clone of `src`. Raises OSError where not supported."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            try:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            except OSError:
+                d.close()
+                os.remove(dst)
+                raise
+        return
+    if sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+        return
+    raise OSError(f"reflinks are not supported on {sys.platform}")
+
+
+def _link_into_place(obj, path):
+    """Replace `path` with a reflink (else hardlink) of `obj`. Returns 'reflink' or 'hardlink'."""
+    tmp = path + ".dsg-link"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        _reflink(obj, tmp)
+        kind = "reflink"
+    except OSError:
+        os.link(obj, tmp)
+        kind = "hardlink"
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        os.remove(tmp)
+        raise
+    return kind
+
+
+class ContentStore:
+    """sha256 -> one stored object for the archive under `root`. Thread-safe."""
+
+    def __init__(self, root, objects_dir=None):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.abspath(objects_dir or os.path.join(self.root, OBJECTS_DIRNAME))
+        self.index_path = os.path.join(self.objects_dir, INDEX_NAME)
+        self._lock = threading.Lock()
+        # archive path ('/'-separated, relative to root) -> [digest, size, mtime_ns]
+        self._paths = {}
+        # digest -> relative path that was uploaded with that content
+        self._uploaded = {}
+        self._dirty = False
+        # what this run saved
+        self.deduped = 0
+        self.bytes_saved = 0
+        self.link_kinds = {}
+        self.pruned = 0
+        self.bytes_pruned = 0
+        self.load()
+
+    # -----------------------------
+    # index
+    # -----------------------------
+    def load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._paths = {rel: list(entry) for rel, entry in (data.get("paths") or {}).items()}
+            self._uploaded = dict(data.get("uploaded") or {})
+
+    def save(self):
+        """Write the index if it changed (atomically, via a temp file)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"paths": dict(self._paths), "uploaded": dict(self._uploaded)}
+            self._dirty = False
+        os.makedirs(self.objects_dir, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def _rel(self, path):
+        try:
+            rel = os.path.relpath(os.path.abspath(path), self.root)
+        except ValueError:
+            # different drive on Windows
+            return None
+        if rel.startswith(os.pardir):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def object_path(self, digest, ext=""):
+        return os.path.join(self.objects_dir, digest[:2], digest + ext.lower())
+
+    def covers(self, path):
+        rel = self._rel(path)
+        return rel is not None and not rel.startswith(OBJECTS_DIRNAME + "/")
+
+    # -----------------------------
+    # adding downloads
+    # -----------------------------
+    def add(self, path, digest):
+        """Record that `path` holds `digest`; link it to the stored copy when one exists.
+
+        Returns True when `path` was turned into a link to an earlier copy.
+        """
+        rel = self._rel(path)
+        if rel is None:
+            return False
+        obj = self.object_path(digest, os.path.splitext(path)[1])
+        linked = False
+        with self._lock:
+            # the lock keeps two workers from creating the same object at once
+            if os.path.exists(obj):
+                if not os.path.samefile(obj, path):
+                    size = os.path.getsize(path)
+                    kind = _link_into_place(obj, path)
+                    linked = True
+                    self.deduped += 1
+                    self.bytes_saved += size
+                    self.link_kinds[kind] = self.link_kinds.get(kind, 0) + 1
+            else:
+                os.makedirs(os.path.dirname(obj), exist_ok=True)
+                try:
+                    os.link(path, obj)
+                except OSError:
+                    # no hardlinks here (e.g. FAT); nothing can be shared, so keep just the download
+                    return False
+            st = os.stat(path)
+            self._paths[rel] = [digest, st.st_size, st.st_mtime_ns]
+            self._dirty = True
+        return linked
+
+    def add_file(self, path):
+        """Hash a file already on disk and `add` it."""
+        return self.add(path, hash_file(path))
+
+    # -----------------------------
+    # lookups for uploads
+    # -----------------------------
+    def _current_digest_locked(self, rel):
+        entry = self._paths.get(rel)
+        if entry is None:
+            return None
+        digest, size, mtime_ns = entry
+        try:
+            st = os.stat(os.path.join(self.root, rel))
+        except OSError:
+            return None
+        if st.st_size != size or st.st_mtime_ns != mtime_ns:
+            # rewritten since it was stored (e.g. highlighted)
+            return None
+        return digest
+
+    def digest_for(self, rel):
+        """Digest of the archive file `rel` ('/'-separated), or None if unknown or changed since."""
+        with self._lock:
+            return self._current_digest_locked(rel)
+
+    def uploaded_copy(self, digest, exclude=None):
+        """Relative path already uploaded with `digest` that still holds it locally, else None."""
+        with self._lock:
+            rel = self._uploaded.get(digest)
+            if rel is None or rel == exclude:
+                return None
+            if self._current_digest_locked(rel) != digest:
+                self._uploaded.pop(digest, None)
+                self._dirty = True
+                return None
+            return rel
+
+    def mark_uploaded(self, rels):
+        """Remember that these relative paths are on the remote now."""
+        with self._lock:
+            for rel in rels:
+                digest = self._current_digest_locked(rel)
+                if digest is not None and digest not in self._uploaded:
+                    self._uploaded[digest] = rel
+                    self._dirty = True
+
+    # -----------------------------
+    # cleanup
+    # -----------------------------
+    def prune(self, dry_run=False):
+        """Remove objects no archive file uses any more. Returns (objects, bytes) removed.
+
+        An object is kept while another hardlink to it exists (st_nlink > 1) or
+        an index path still holds its content (a reflinked copy has its own
+        inode). Index entries for files that are gone or rewritten are dropped.
+        """
+        removed = 0
+        freed = 0
+        with self._lock:
+            live = set()
+            for rel in list(self._paths):
+                digest = self._current_digest_locked(rel)
+                if digest is None:
+                    if not dry_run:
+                        del self._paths[rel]
+                        self._dirty = True
+                else:
+                    live.add(digest)
+            try:
+                buckets = sorted(os.scandir(self.objects_dir), key=lambda e: e.name)
+            except OSError:
+                return 0, 0
+            for bucket in buckets:
+                if not bucket.is_dir(follow_symlinks=False):
+                    continue
+                for entry in os.scandir(bucket.path):
+                    digest = entry.name.split(".", 1)[0]
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if st.st_nlink > 1 or digest in live:
+                        continue
+                    if not dry_run:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            continue
+                    removed += 1
+                    freed += st.st_size
+                if not dry_run:
+                    try:
+                        # only succeeds when the bucket is empty now
+                        os.rmdir(bucket.path)
+                    except OSError:
+                        pass
+            if not dry_run:
+                self.pruned += removed
+                self.bytes_pruned += freed
+        return removed, freed
+
+    def summary(self):
+        """One line about what this run saved, or '' when nothing was deduplicated or pruned."""
+        lines = []
+        if self.deduped:
+            kinds = ", ".join(f"{n} {kind}" for kind, n in sorted(self.link_kinds.items()))
+            lines.append(
+                f"Deduplicated {self.deduped} download(s) ({kinds}); "
+                f"{self.bytes_saved / (1024 * 1024):.1f} MB not stored twice."
+            )
+        if self.pruned:
+            lines.append(
+                f"Removed {self.pruned} stored object(s) no file uses any more "
+                f"({self.bytes_pruned / (1024 * 1024):.1f} MB)."
+            )
+        return "\n".join(lines)
+
+
+# -----------------------------
+# module-level registry (like src.fs_snapshot)
+# -----------------------------
+_stores = []
+_registry_lock = threading.Lock()
+
+
+def open_store(root, objects_dir=None):
+    """Open (or reuse) the store for the archive under `root` and use it for downloads there."""
+    key = os.path.normcase(os.path.abspath(root))
+    with _registry_lock:
+        for store in _stores:
+            if os.path.normcase(store.root) == key:
+                return store
+        store = ContentStore(root, objects_dir)
+        _stores.append(store)
+        return store
+
+
+def close_stores():
+    """Prune every open store, save its index and forget them."""
+    with _registry_lock:
+        stores = list(_stores)
+        _stores.clear()
+    for store in stores:
+        try:
+            store.prune()
+        except OSError as e:
+            print(f"Could not clean up {store.objects_dir}: {e}")
+        store.save()
+
+
+def store_for(path):
+    """The open store whose archive contains `path`, else None (dedup is off there)."""
+    with _registry_lock:
+        stores = list(_stores)
+    for store in stores:
+        if store.covers(path):
+            return store
+    return None
+
+
+def add_download(path, digest):
+    """Hand a finished download to its store. Returns True if it became a link; never raises."""
+    store = store_for(path)
+    if store is None:
+        return False
+    try:
+        return store.add(path, digest)
+    except OSError as e:
+        print(f"Could not deduplicate {os.path.basename(path)}: {e}")
+        return False
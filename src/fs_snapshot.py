@@ -0,0 +1,265 @@
+"""
+In-memory snapshot of the DSGS_DIR tree for existence checks and folder planning.
+
+On a OneDrive-backed folder every stat can be slow, so `main.py` walks the
+archive once at startup with `os.scandir` (`take_snapshot`) and the file
+helpers ask the snapshot instead of the disk:
+
+- `exists` / `isdir` / `isfile` / `listdir` / `walk` answer from memory
+- `ensure_dirs` creates every missing folder of a plan in one batch
+- `record_file` / `forget_file` keep the snapshot current as files are written or removed
+
+Paths outside a snapshot (or when none was taken, e.g. a tool run on its own)
+fall back to the normal os calls, so the helpers work either way.
+"""
+
+import os
+import threading
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class _Dir:
+    """One folder: normcased name -> real name, for subfolders and files."""
+
+    __slots__ = ("path", "dirs", "files")
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = {}
+        self.files = {}
+
+
+class FsSnapshot:
+    """The folders and files under `root`, read with one scandir walk. Thread-safe."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._root_key = _key(root)
+        self._prefix = self._root_key if self._root_key.endswith(os.sep) else self._root_key + os.sep
+        self._lock = threading.Lock()
+        self._dirs = {}
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the whole tree from disk."""
+        dirs = {}
+        stack = [self.root] if os.path.isdir(self.root) else []
+        while stack:
+            path = stack.pop()
+            node = _Dir(path)
+            dirs[_key(path)] = node
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            # uses the type returned by the directory listing; no extra stat on Windows
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            continue
+                        if is_dir:
+                            node.dirs[os.path.normcase(entry.name)] = entry.name
+                            stack.append(entry.path)
+                        else:
+                            node.files[os.path.normcase(entry.name)] = entry.name
+            except OSError:
+                pass
+        with self._lock:
+            self._dirs = dirs
+
+    def covers(self, path):
+        key = _key(path)
+        return key == self._root_key or key.startswith(self._prefix)
+
+    def counts(self):
+        """(folders, files) currently known."""
+        with self._lock:
+            return len(self._dirs), sum(len(d.files) for d in self._dirs.values())
+
+    # -----------------------------
+    # queries
+    # -----------------------------
+    def isdir(self, path):
+        with self._lock:
+            return _key(path) in self._dirs
+
+    def isfile(self, path):
+        parent, name = os.path.split(_key(path))
+        with self._lock:
+            node = self._dirs.get(parent)
+            return node is not None and name in node.files
+
+    def exists(self, path):
+        return self.isdir(path) or self.isfile(path)
+
+    def listdir(self, path):
+        """Names of the folders and files in `path` (like os.listdir)."""
+        with self._lock:
+            node = self._dirs.get(_key(path))
+            if node is None:
+                raise FileNotFoundError(f"No such directory: {path!r}")
+            return list(node.dirs.values()) + list(node.files.values())
+
+    def walk(self, top):
+        """Like os.walk(top) (top-down; `dirnames` may be edited to prune), from memory."""
+        with self._lock:
+            node = self._dirs.get(_key(top))
+            if node is None:
+                return
+            dirnames = list(node.dirs.values())
+            filenames = list(node.files.values())
+        yield top, dirnames, filenames
+        for name in dirnames:
+            yield from self.walk(os.path.join(top, name))
+
+    # -----------------------------
+    # updates
+    # -----------------------------
+    def _record_dir_locked(self, path):
+        full = os.path.abspath(path)
+        missing = []
+        while _key(full) not in self._dirs and self.covers(full):
+            missing.append(full)
+            parent = os.path.dirname(full)
+            if parent == full:
+                break
+            full = parent
+        for full in reversed(missing):
+            self._dirs[_key(full)] = _Dir(full)
+            parent = self._dirs.get(_key(os.path.dirname(full)))
+            if parent is not None:
+                name = os.path.basename(full)
+                parent.dirs[os.path.normcase(name)] = name
+
+    def record_dir(self, path):
+        with self._lock:
+            self._record_dir_locked(path)
+
+    def record_file(self, path):
+        """Note that `path` now exists (after a download or a copy)."""
+        folder, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            self._record_dir_locked(folder)
+            node = self._dirs.get(_key(folder))
+            if node is not None:
+                node.files[os.path.normcase(name)] = name
+
+    def forget_file(self, path):
+        folder, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            node = self._dirs.get(_key(folder))
+            if node is not None:
+                node.files.pop(os.path.normcase(name), None)
+
+    def ensure_dirs(self, paths):
+        """Create the folders in `paths` that do not exist yet, in one batch.
+
+        Returns (created, existing) lists of the given paths, like the
+        `ensure_*_exist` helpers in `src.actions`.
+        """
+        existing, missing = [], []
+        planned = set()
+        with self._lock:
+            for p in paths:
+                key = _key(p)
+                if key in self._dirs or key in planned:
+                    existing.append(p)
+                else:
+                    planned.add(key)
+                    missing.append(p)
+        # parents first, so each makedirs creates at most a few levels
+        for p in sorted(missing, key=lambda p: len(_key(p))):
+            os.makedirs(p, exist_ok=True)
+            self.record_dir(p)
+        return missing, existing
+
+
+# -----------------------------
+# module-level helpers (snapshot when one covers the path, else the disk)
+# -----------------------------
+_snapshots = []
+_registry_lock = threading.Lock()
+
+
+def take_snapshot(root):
+    """Walk `root` now and use the result for every path under it from here on."""
+    snap = FsSnapshot(root)
+    with _registry_lock:
+        _snapshots[:] = [s for s in _snapshots if s._root_key != snap._root_key] + [snap]
+    return snap
+
+
+def drop_snapshots():
+    """Forget every snapshot (the helpers go back to the disk)."""
+    with _registry_lock:
+        _snapshots.clear()
+
+
+def snapshot_for(path):
+    with _registry_lock:
+        snaps = list(_snapshots)
+    for snap in reversed(snaps):
+        if snap.covers(path):
+            return snap
+    return None
+
+
+def exists(path):
+    snap = snapshot_for(path)
+    return snap.exists(path) if snap else os.path.exists(path)
+
+
+def isdir(path):
+    snap = snapshot_for(path)
+    return snap.isdir(path) if snap else os.path.isdir(path)
+
+
+def isfile(path):
+    snap = snapshot_for(path)
+    return snap.isfile(path) if snap else os.path.isfile(path)
+
+
+def listdir(path):
+    snap = snapshot_for(path)
+    return snap.listdir(path) if snap else os.listdir(path)
+
+
+def walk(top):
+    snap = snapshot_for(top)
+    return snap.walk(top) if snap else os.walk(top)
+
+
+def record_file(path):
+    snap = snapshot_for(path)
+    if snap:
+        snap.record_file(path)
+
+
+def forget_file(path):
+    snap = snapshot_for(path)
+    if snap:
+        snap.forget_file(path)
+
+
+def ensure_dirs(paths):
+    """Create the missing folders among `paths` (in one batch when a snapshot covers them).
+
+    Returns (created, existing) lists of the given paths.
+    """
+    paths = list(paths)
+    snap = snapshot_for(paths[0]) if paths else None
+    if snap is not None and all(snap.covers(p) for p in paths):
+        return snap.ensure_dirs(paths)
+    created, existing = [], []
+    for p in paths:
+        if isdir(p):
+            existing.append(p)
+        else:
+            os.makedirs(p, exist_ok=True)
+            covering = snapshot_for(p)
+            if covering:
+                covering.record_dir(p)
+            created.append(p)
+    return created, existing
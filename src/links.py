@@ -0,0 +1,332 @@
+"""
+Link classification shared by the accordion filter and the download naming.
+
+`classify_link(href)` reads an href once into a compact `LinkInfo` record
+(language codes, type flags, ISO date, month/year, routing flags) and
+memoizes it by href, so filtering a month page and then naming its downloads
+does not lower-case, URL-decode and substring-scan the same URL again.
+
+Selection flags are read from the href as the site serves it (percent-encoded,
+e.g. 'bible%20reading'); routing flags and the date come from the decoded
+path. The two are kept apart so filtering and naming behave exactly as before.
+Only the selection flags are read up front: the filter sees every link on a
+page but only the kept ones are named, so the decoded path, routing flags and
+date are read on first access.
+"""
+
+import os
+import re
+import urllib.parse
+from datetime import datetime
+from functools import lru_cache
+
+# full language name -> code, in the order file labels prefer them
+LANGUAGES = (
+    ('english', 'en'),
+    ('french', 'fr'),
+    ('german', 'de'),
+    ('italian', 'it'),
+    ('portuguese', 'pt'),
+    ('russian', 'ru'),
+    ('spanish', 'es'),
+)
+LANGUAGE_CODES = dict(LANGUAGES)
+MONTH_NAMES = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+)
+# one bit per language code, for `LinkInfo.code_bits`
+CODE_BITS = {code: 1 << i for i, (_, code) in enumerate(LANGUAGES)}
+
+# one bit per selectable link type, for `LinkInfo.type_bits`
+AUDIO = 1 << 0
+TRANSCRIPT = 1 << 1
+BIBLE_REFERENCES = 1 << 2
+BIBLE_READING = 1 << 3
+FULL_DSG = 1 << 4
+SE_DSG = 1 << 5
+FOREWORD = 1 << 6
+# any of these makes a link something other than the standard DSG file
+SPECIAL_TYPES = AUDIO | TRANSCRIPT | BIBLE_REFERENCES | BIBLE_READING | FULL_DSG | SE_DSG | FOREWORD
+
+# how many hrefs to remember; a month page has a few dozen links
+LINK_CACHE_SIZE = 4096
+
+# language code as a path or filename segment: -en., _en., .en., /en/
+_LANG_CODE_RE = re.compile(r'(?:(?:-|_|\.|/))(en|fr|de|it|pt|ru|es)(?:\.|_|/|-|$)')
+_ISO_DATE_RE = re.compile(r'(20\d{2})-(\d{2})-(\d{2})')
+_PATH_MONTH_YEAR_RE = re.compile(
+    r'(january|february|march|april|may|june|july|august|september|october|november|december)[\s%20_-]+(20\d{2})'
+)
+_YEAR_RE = re.compile(r'(20\d{2})')
+# 'March 2026' / 'march-2026' or, failing that, '2026-03' / '2026_03' / '2026.03' in link text
+_TEXT_MONTH_YEAR_RE = re.compile(
+    r'(?P<name>january|february|march|april|may|june|july|august|september|october|november|december)'
+    r'[\s\-_,]+(?P<year>20\d{2})'
+    r'|(?P<num_year>20\d{2})[-_.](?P<num>0[1-9]|1[0-2])'
+)
+
+
+# `LinkInfo` fields read from the decoded path on first access
+_ROUTING_FIELDS = frozenset((
+    'decoded', 'filename', 'ext',
+    'path_serving', 'path_youth', 'path_children', 'path_senior', 'path_nacc', 'path_dsg', 'path_full_dsg',
+    'path_se_dsg', 'path_foreword', 'path_audio', 'path_transcript', 'path_bibleref',
+    'language', 'youth_language', 'mentions_en', 'date', 'year', 'month',
+))
+
+
+class LinkInfo:
+    """What one href says about its file. Build it with `classify_link`, which caches by href.
+
+    Treat instances as read-only: the same record is shared by every caller.
+    """
+
+    __slots__ = (
+        'href',
+        'decoded',
+        'filename',
+        'ext',
+        # selection (filter) flags, from the href as served
+        'codes',
+        'lang_names',
+        'code_bits',
+        'type_bits',
+        'english',
+        'french',
+        'audio',
+        'transcript',
+        'bible_references',
+        'bible_reading',
+        'full_dsg',
+        'se_dsg',
+        'foreword',
+        'serving',
+        # routing (naming) flags, from the decoded path; read on first access
+        'path_serving',
+        'path_youth',
+        'path_children',
+        'path_senior',
+        'path_nacc',
+        'path_dsg',
+        'path_full_dsg',
+        'path_se_dsg',
+        'path_foreword',
+        'path_audio',
+        'path_transcript',
+        'path_bibleref',
+        'language',
+        'youth_language',
+        'mentions_en',
+        # date found in the href itself
+        'date',
+        'year',
+        'month',
+    )
+
+    def __init__(self, href):
+        raw = href or ''
+        self.href = raw
+        self._read_selection_flags(raw.lower())
+
+    def __getattr__(self, name):
+        # only called for a slot that is not set yet; reading the routing fields sets them all
+        # (two threads may both do it; they set the same values)
+        if name not in _ROUTING_FIELDS:
+            raise AttributeError(name)
+        self._read_routing()
+        return object.__getattribute__(self, name)
+
+    def _read_routing(self):
+        raw = self.href
+        decoded = urllib.parse.unquote(raw)
+        h = decoded.lower()
+        fname = os.path.basename(decoded)
+        self.decoded = decoded
+        self.filename = fname
+        self.ext = os.path.splitext(fname)[1] or ''
+        self._read_routing_flags(h, fname.lower())
+        self._read_date(raw, h)
+
+    def _read_selection_flags(self, h):
+        codes = set()
+        if '/english/' in h:
+            codes.add('en')
+        if '/french/' in h:
+            codes.add('fr')
+        m = _LANG_CODE_RE.search(h)
+        if m:
+            codes.add(m.group(1))
+        # full language names in the path (English, French, German, etc.)
+        names = {code for name, code in LANGUAGES if name in h}
+        codes |= names
+        self.codes = frozenset(codes)
+        self.lang_names = frozenset(names)
+        self.english = 'en' in codes
+        self.french = 'fr' in codes
+        self.audio = 'audio' in h
+        self.transcript = 'transcript' in h
+        self.bible_references = 'bible' in h and 'reference' in h
+        self.bible_reading = 'bible-reading' in h or 'bible%20reading' in h
+        self.full_dsg = 'full' in h and 'dsg' in h
+        self.se_dsg = (
+            'se%20dsg' in h
+            or 'se-dsg' in h
+            or ('/se%20' in h and 'dsg' in h)
+            or ('/document%20library' in h and 'se' in h)
+        )
+        self.foreword = 'foreword' in h
+        self.serving = 'serving' in h
+        self.code_bits = 0
+        for code in codes:
+            self.code_bits |= CODE_BITS[code]
+        self.type_bits = (
+            (AUDIO if self.audio else 0)
+            | (TRANSCRIPT if self.transcript else 0)
+            | (BIBLE_REFERENCES if self.bible_references else 0)
+            | (BIBLE_READING if self.bible_reading else 0)
+            | (FULL_DSG if self.full_dsg else 0)
+            | (SE_DSG if self.se_dsg else 0)
+            | (FOREWORD if self.foreword else 0)
+        )
+
+    def _read_routing_flags(self, h, fname):
+        # the header text adds to some of these; see `src.actions.map_link_to_destination`
+        self.path_serving = 'serving' in h and 'schedule' in h
+        self.path_youth = 'youth' in h
+        self.path_children = 'children' in h or 'child' in fname
+        self.path_senior = 'senior' in h
+        self.path_nacc = 'nacc' in h
+        self.path_dsg = 'divine' in h or 'dsg' in fname
+        self.path_full_dsg = 'full' in h and 'dsg' in h
+        self.path_se_dsg = 'special edition' in h or 'se dsg' in h or 'se-dsg' in fname
+        self.path_foreword = 'foreword' in h
+        self.path_audio = 'audio' in h
+        self.path_transcript = 'transcript' in h
+        self.path_bibleref = 'bible' in h and 'reference' in h
+        self.language = next((name.title() for name, _ in LANGUAGES if name in h), '')
+        self.youth_language = next((name.title() for name, _ in LANGUAGES[:2] if name in h), '')
+        self.mentions_en = 'en' in h
+
+    def _read_date(self, raw, h):
+        self.date = None
+        self.year = None
+        self.month = None
+        m_iso = _ISO_DATE_RE.search(raw)
+        if m_iso:
+            # same result as strptime('%Y-%m-%d') (invalid dates raise), without its parsing cost
+            try:
+                self.date = datetime(int(m_iso.group(1)), int(m_iso.group(2)), int(m_iso.group(3)))
+            except ValueError:
+                self.date = None
+        if self.date:
+            self.year = m_iso.group(1)
+            self.month = MONTH_NAMES[self.date.month - 1]
+            return
+        # Month Year in the decoded path (e.g. 'January 2026'), else just a year
+        m_my = _PATH_MONTH_YEAR_RE.search(h)
+        if m_my:
+            self.month = m_my.group(1).title()
+            self.year = m_my.group(2)
+            return
+        m_year = _YEAR_RE.search(raw)
+        if m_year:
+            self.year = m_year.group(1)
+
+    def __repr__(self):
+        return f"LinkInfo({self.href!r})"
+
+
+def scan_month_year(text):
+    """Return (year, month name) for the first 'Month Year' in lower-case `text`, else the first 'YYYY-MM'.
+
+    One pass over the text; None when neither is found.
+    """
+    numeric = None
+    for m in _TEXT_MONTH_YEAR_RE.finditer(text):
+        if m.group('name'):
+            return m.group('year'), m.group('name').title()
+        if numeric is None:
+            numeric = (m.group('num_year'), MONTH_NAMES[int(m.group('num')) - 1])
+    return numeric
+
+
+@lru_cache(maxsize=LINK_CACHE_SIZE)
+def classify_link(href):
+    """Return the (cached) `LinkInfo` for `href`."""
+    return LinkInfo(href)
+
+
+def _code_mask(language_names):
+    mask = 0
+    for name in language_names or []:
+        code = LANGUAGE_CODES.get(name.lower())
+        if code:
+            mask |= CODE_BITS[code]
+    return mask
+
+
+class LinkSelection:
+    """The user's DSG choices compiled once into a small rule table.
+
+    Each rule is (required type bit, excluded type bits, allowed language bits);
+    a link is kept when any rule matches its `LinkInfo` bits. A rule with no
+    required bit matches the standard DSG file; no language bits means any
+    language. With no selections at all every link is kept.
+    """
+
+    __slots__ = ('rules', 'keep_all')
+
+    def __init__(self, user_choices):
+        selections = {s.lower() for s in (user_choices.get('selections') or [])}
+        english = 'english' in selections
+        french = 'french' in selections
+        # the English/French checkboxes also limit types that have no language list of their own
+        global_mask = (CODE_BITS['en'] if english else 0) | (CODE_BITS['fr'] if french else 0)
+
+        def langs(key):
+            return _code_mask(user_choices.get(key)) or global_mask
+
+        rules = []
+        if english or french:
+            # the standard DSG file in the chosen language(s)
+            rules.append((0, SPECIAL_TYPES, global_mask))
+        if 'audio' in selections:
+            rules.append((AUDIO, 0, global_mask))
+        if 'transcript' in selections:
+            rules.append((TRANSCRIPT, 0, global_mask))
+        if 'references' in selections or 'bible references' in selections:
+            # bible references inside the Full DSG only come with the Full DSG
+            excluded = 0 if 'full dsg' in selections else FULL_DSG
+            rules.append((BIBLE_REFERENCES, excluded, langs('bible_references_langs')))
+        if 'bible reading' in selections:
+            rules.append((BIBLE_READING, 0, langs('bible_reading_langs')))
+        if 'full dsg' in selections:
+            excluded = 0 if 'bible references' in selections else BIBLE_REFERENCES
+            rules.append((FULL_DSG, excluded, langs('full_dsg_langs')))
+        if 'special edition dsg' in selections:
+            rules.append((SE_DSG, 0, langs('se_dsg_langs')))
+        if 'foreword' in selections:
+            rules.append((FOREWORD, 0, langs('foreword_langs')))
+        self.rules = tuple(rules)
+        self.keep_all = not rules
+
+    def matches(self, info):
+        if self.keep_all:
+            return True
+        types = info.type_bits
+        codes = info.code_bits
+        for required, excluded, languages in self.rules:
+            if required and not types & required:
+                continue
+            if types & excluded:
+                continue
+            if languages and not codes & languages:
+                continue
+            return True
+        return False
+
+    def matches_href(self, href):
+        if self.keep_all:
+            return True
+        return self.matches(classify_link(href))
@@ -0,0 +1,130 @@
+"""
+Month filters for the command line (`--months`, `--since`) and helpers to
+find already-downloaded files in the DSGS_DIR/<Year>/<Month>/<subfolder>
+layout.
+
+Months can be written as 'January 2026', 'Jan 2026' or '2026-01'.
+"""
+
+import os
+import re
+
+from src import fs_snapshot
+
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+_MONTH_LOOKUP = {name.lower(): i + 1 for i, name in enumerate(MONTH_NAMES)}
+_MONTH_LOOKUP.update({name[:3].lower(): i + 1 for i, name in enumerate(MONTH_NAMES)})
+
+_NAMED_RE = re.compile(r"\b([A-Za-z]{3,9})\.?[\s\-_,]+(20\d{2})\b")
+_NUMERIC_RE = re.compile(r"\b(20\d{2})[-_/.](0?[1-9]|1[0-2])\b")
+
+
+def parse_month(text):
+    """Return (year, month number) for 'January 2026', 'Jan 2026' or '2026-01', else None."""
+    if not text:
+        return None
+    m = _NUMERIC_RE.search(text)
+    if m:
+        return int(m.group(1)), int(m.group(2))
+    for m in _NAMED_RE.finditer(text):
+        month = _MONTH_LOOKUP.get(m.group(1).lower())
+        if month:
+            return int(m.group(2)), month
+    return None
+
+
+def month_label(year, month):
+    return f"{MONTH_NAMES[month - 1]} {year}"
+
+
+class MonthFilter:
+    """Decides which months a run touches. With no months and no `since`, every month is allowed."""
+
+    def __init__(self, months=None, since=None):
+        self.months = set()
+        for text in months or []:
+            ym = parse_month(text)
+            if ym is None:
+                raise ValueError(f"Not a month: {text!r} (use e.g. 'January 2026' or 2026-01)")
+            self.months.add(ym)
+        self.since = None
+        if since:
+            self.since = parse_month(since)
+            if self.since is None:
+                raise ValueError(f"Not a month: {since!r} (use e.g. 'January 2026' or 2026-01)")
+
+    @classmethod
+    def from_args(cls, months=None, since=None):
+        """Build from CLI strings; `months` may be comma separated."""
+        items = []
+        for chunk in months or []:
+            items.extend(part.strip() for part in chunk.split(",") if part.strip())
+        return cls(items, since)
+
+    @property
+    def active(self):
+        return bool(self.months or self.since)
+
+    def allows(self, year, month):
+        if self.months and (year, month) not in self.months:
+            return False
+        if self.since and (year, month) < self.since:
+            return False
+        return True
+
+    def allows_text(self, text):
+        """True if the month named in `text` (e.g. a MiniHQ link 'January 2026') is allowed.
+
+        Text without a recognisable month is allowed only when no filter is set.
+        """
+        ym = parse_month(text)
+        if ym is None:
+            return not self.active
+        return self.allows(*ym)
+
+    def describe(self):
+        parts = []
+        if self.months:
+            parts.append(", ".join(month_label(y, m) for y, m in sorted(self.months)))
+        if self.since:
+            parts.append(f"since {month_label(*self.since)}")
+        return "; ".join(parts) or "all months"
+
+
+def iter_month_folders(base_dir, month_filter=None):
+    """Yield (year, month, path) for each DSGS_DIR/<Year>/<Month> folder the filter allows."""
+    if not base_dir or not fs_snapshot.isdir(base_dir):
+        return
+    for year_name in sorted(fs_snapshot.listdir(base_dir)):
+        year_path = os.path.join(base_dir, year_name)
+        if not (year_name.isdigit() and fs_snapshot.isdir(year_path)):
+            continue
+        year = int(year_name)
+        for month_name in fs_snapshot.listdir(year_path):
+            month = _MONTH_LOOKUP.get(month_name.lower())
+            month_path = os.path.join(year_path, month_name)
+            if not month or not fs_snapshot.isdir(month_path):
+                continue
+            if month_filter is not None and not month_filter.allows(year, month):
+                continue
+            yield year, month, month_path
+
+
+def iter_month_files(base_dir, month_filter=None, subfolders=None, extensions=None):
+    """Yield file paths under the allowed month folders, optionally only in `subfolders` / with `extensions`."""
+    subs = {s.lower() for s in subfolders} if subfolders else None
+    exts = {e.lower() for e in extensions} if extensions else None
+    for _year, _month, month_path in sorted(iter_month_folders(base_dir, month_filter)):
+        for dirpath, dirnames, filenames in fs_snapshot.walk(month_path):
+            dirnames.sort()
+            rel = os.path.relpath(dirpath, month_path)
+            top = rel.split(os.sep)[0].lower() if rel != os.curdir else ""
+            if subs is not None and top not in subs:
+                continue
+            for name in sorted(filenames):
+                if exts is not None and os.path.splitext(name)[1].lower() not in exts:
+                    continue
+                yield os.path.join(dirpath, name)
@@ -0,0 +1,137 @@
+"""
+Checks that a download is the file it claims to be before it is kept.
+
+When the site session has expired, the server answers a file link with its
+HTML sign-in page and status 200. Saved as `something.pdf`, that page would be
+skipped as 'exists' by every later run and break PDF parsing. `PayloadCheck`
+looks at a download while it streams:
+
+- Content-Type: an HTML (or other text) answer for a binary file is rejected
+  before the body is read
+- the first bytes: must start with the file type's magic number (PDF, MP3,
+  DOCX/PPTX/XLSX, DOC, M4A/MP4); an HTML page is reported as a sign-in page
+- the size: must match Content-Length when the server sent one
+
+`src.actions.save_url_to_path` writes to `<name>.part` and only renames it
+over `<name>` after `finish()` passes. A sign-in page raises `InvalidPayload`
+with the retry kind 'auth', so the caller can sign in again and retry.
+"""
+
+from src import retry
+
+# a download is written under its name plus this suffix until it passes the check
+PART_SUFFIX = ".part"
+# bytes read before the first bytes are judged (a PDF header may sit anywhere in the first 1024)
+SNIFF_BYTES = 1024
+
+_ZIP = (b"PK\x03\x04",)
+_OLE = (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",)
+# extension -> accepted file starts
+MAGIC = {
+    ".pdf": (b"%PDF-",),
+    ".mp3": (b"ID3",),
+    ".docx": _ZIP,
+    ".pptx": _ZIP,
+    ".xlsx": _ZIP,
+    ".doc": _OLE,
+    ".ppt": _OLE,
+    ".xls": _OLE,
+}
+# containers whose signature is 'ftyp' at offset 4
+_FTYP = (".m4a", ".mp4")
+_HTML_STARTS = (b"<!doctype html", b"<html", b"<head", b"<body", b"<?xml", b"<!--")
+
+
+class InvalidPayload(Exception):
+    """A download that is not the expected file; `retry_kind` tells `src.retry` how to treat it."""
+
+    def __init__(self, retry_kind, message):
+        super().__init__(message)
+        self.retry_kind = retry_kind
+
+
+def _mp3_frame(head):
+    # MPEG audio frame sync: 11 set bits
+    return len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0
+
+
+def looks_like_html(head):
+    return head.lstrip()[:32].lower().startswith(_HTML_STARTS)
+
+
+class PayloadCheck:
+    """Streaming check for one download of `filename`.
+
+    Call `feed(chunk)` for every chunk before writing it and `finish()` after
+    the last one; both raise InvalidPayload.
+    """
+
+    def __init__(self, filename, content_type=None, content_length=None, content_encoding=None):
+        self.filename = filename
+        self.ext = ("." + filename.rsplit(".", 1)[-1].lower()) if "." in filename else ""
+        self.content_type = (content_type or "").split(";")[0].strip().lower()
+        try:
+            self.expected = int(content_length) if content_length not in (None, "") else None
+        except (TypeError, ValueError):
+            self.expected = None
+        if (content_encoding or "identity").strip().lower() != "identity":
+            # Content-Length counts the compressed bytes; the decoded stream is longer
+            self.expected = None
+        self.received = 0
+        self._head = b""
+        self._sniffed = False
+        self._check_headers()
+
+    @classmethod
+    def for_response(cls, filename, headers):
+        """A check set up from a response's headers (requests or urllib)."""
+        headers = headers or {}
+        return cls(
+            filename,
+            headers.get("Content-Type"),
+            headers.get("Content-Length"),
+            headers.get("Content-Encoding"),
+        )
+
+    def _binary(self):
+        return self.ext in MAGIC or self.ext in _FTYP
+
+    def _check_headers(self):
+        if self.content_type == "text/html" or (self._binary() and self.content_type.startswith("text/")):
+            raise InvalidPayload(
+                retry.AUTH, f"{self.filename}: got {self.content_type} instead of the file (signed out?)"
+            )
+
+    def feed(self, chunk):
+        self.received += len(chunk)
+        if not self._sniffed:
+            self._head += chunk[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._sniff()
+
+    def _sniff(self):
+        self._sniffed = True
+        head = self._head
+        if looks_like_html(head):
+            raise InvalidPayload(retry.AUTH, f"{self.filename}: got an HTML page instead of the file (signed out?)")
+        if self.ext in MAGIC:
+            ok = head.startswith(MAGIC[self.ext]) or (
+                (self.ext == ".pdf" and b"%PDF-" in head) or (self.ext == ".mp3" and _mp3_frame(head))
+            )
+        elif self.ext in _FTYP:
+            ok = head[4:8] == b"ftyp"
+        else:
+            # no known signature for this type; only HTML is rejected
+            ok = True
+        if not ok:
+            raise InvalidPayload(retry.INVALID, f"{self.filename}: content does not start like a {self.ext} file")
+
+    def finish(self):
+        if not self._sniffed:
+            self._sniff()
+        if self.received == 0:
+            raise InvalidPayload(retry.NETWORK, f"{self.filename}: empty download")
+        if self.expected is not None and self.received != self.expected:
+            raise InvalidPayload(
+                retry.NETWORK, f"{self.filename}: got {self.received} of {self.expected} bytes"
+            )
@@ -1,28 +1,56 @@
 import fitz  # PyMuPDF
 import os
 
+# how far (in points) an existing highlight's corners may be from a match and still count as the same one
+# (a saved box is about 1pt larger than the text it covers)
+RECT_TOLERANCE = 2.0
+
+
+def _same_rect(a, b):
+    return all(abs(x - y) <= RECT_TOLERANCE for x, y in zip(a, b))
+
+
+def _same_color(a, b):
+    return a is not None and len(a) == len(b) and all(abs(x - y) <= 0.01 for x, y in zip(a, b))
+
+
 def highlight_names_in_pdf(pdf_path, name_color_map, opacity=0.5):
+    """Put a colored box over every occurrence of each name. Returns True if the file was changed.
+
+    A name that already has a box of the same color (from an earlier run) is
+    left alone, and one whose color was changed since gets its box recolored,
+    so running again on a highlighted schedule changes nothing and the file is
+    not rewritten (or uploaded) again.
+    """
     if not os.path.exists(pdf_path):
         return False
 
     doc = fitz.open(pdf_path)
-    found_any = False
+    changed = False
 
     for page in doc:
+        # boxes already on the page (ours from an earlier run, or any other rectangle annotation)
+        existing = [a for a in page.annots() if a.type[0] == fitz.PDF_ANNOT_SQUARE]
         for name, color in name_color_map.items():
             clean_name = name.strip()
             if not clean_name: continue
-                
+
             text_instances = page.search_for(clean_name)
             for inst in text_instances:
-                found_any = True
-                annot = page.add_rect_annot(inst)
+                annot = next((a for a in existing if _same_rect(a.rect, inst)), None)
+                if annot is not None:
+                    if _same_color(annot.colors.get("fill"), color) and abs(annot.opacity - opacity) <= 0.01:
+                        continue
+                else:
+                    annot = page.add_rect_annot(inst)
+                    existing.append(annot)
+                changed = True
                 annot.set_colors(stroke=color, fill=color)
                 annot.set_opacity(opacity)
                 annot.set_border(width=0)
                 annot.update()
 
-    if found_any:
+    if changed:
         temp_path = pdf_path + ".tmp"
         doc.save(temp_path)
         doc.close()
@@ -30,4 +58,4 @@ def highlight_names_in_pdf(pdf_path, name_color_map, opacity=0.5):
         os.rename(temp_path, pdf_path)
         return True
     doc.close()
-    return False
\ No newline at end of file
+    return False
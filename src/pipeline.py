@@ -0,0 +1,241 @@
+"""
+Small threaded pipeline used by `main.py`.
+
+A pipeline is a set of named stages. Each stage has its own worker threads
+and a bounded input queue; a stage function receives one item (or a batch of
+items for batched stages) and hands results to later stages with
+`pipeline.put(stage_name, item)`. Bounded queues give back-pressure, so a slow
+stage slows its producers instead of buffering the whole run in memory.
+
+A stage can be given a `priority` key function; its queue then hands workers
+the queued item with the lowest key first (ties in arrival order) instead of
+the oldest one.
+
+Per-stage counters (items, errors, busy time, queue depth) are kept for the
+end-of-run report.
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+
+class StageStats:
+    """Counters for one stage."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_depth = 0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, count, started, ended, failed=False):
+        self.items += count
+        self.busy += ended - started
+        if failed:
+            self.errors += 1
+        if self.first_start is None or started < self.first_start:
+            self.first_start = started
+        if self.last_end is None or ended > self.last_end:
+            self.last_end = ended
+
+    @property
+    def active_span(self):
+        """Seconds from the first item started to the last item finished."""
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+
+class _PriorityQueue(queue.Queue):
+    """Bounded queue that returns the item with the lowest `key(item)` first; `last` items sort after all others."""
+
+    def __init__(self, maxsize, key, last):
+        self.key = key
+        self.last = last
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self.queue = []
+        self._seq = itertools.count()
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        # (0, key) for work, (1, 0) for the stop marker; the sequence number keeps equal keys in arrival order
+        rank = (1, 0) if item is self.last else (0, self.key(item))
+        heapq.heappush(self.queue, (rank, next(self._seq), item))
+
+    def _get(self):
+        return heapq.heappop(self.queue)[-1]
+
+
+class _Stage:
+    def __init__(self, name, func, workers, queue_size, batch_size, priority=None, stop=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        if priority is None:
+            self.queue = queue.Queue(maxsize=max(0, int(queue_size)))
+        else:
+            self.queue = _PriorityQueue(max(0, int(queue_size)), priority, stop)
+        self.threads = []
+        self.stats = StageStats(name, self.workers)
+        # items queued or being worked on in this stage
+        self.pending = 0
+
+
+class Pipeline:
+    """Threaded stages connected by bounded queues.
+
+    Usage::
+
+        p = Pipeline()
+        p.add_stage("download", download_one, workers=4)
+        p.add_stage("upload", upload_batch, workers=2, batch_size=20)
+        p.start()
+        p.put("download", item)
+        p.join()      # waits until every queued item (and its follow-ups) is done
+        p.report()
+    """
+
+    _STOP = object()
+
+    def __init__(self):
+        self._stages = {}
+        self._order = []
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._started = False
+        self._source_stats = {}
+
+    def add_stage(self, name, func, workers=1, queue_size=32, batch_size=1, priority=None):
+        """Register stage `name`. `func(item)` or, when `batch_size` > 1, `func(list_of_items)`.
+
+        `priority(item)` (optional) returns a sort key; queued items with lower keys run first.
+        """
+        if self._started:
+            raise RuntimeError("add stages before start()")
+        self._stages[name] = _Stage(name, func, workers, queue_size, batch_size, priority, self._STOP)
+        self._order.append(name)
+
+    def has_stage(self, name):
+        return name in self._stages
+
+    def start(self):
+        self._started = True
+        for stage in self._stages.values():
+            for i in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(stage,), name=f"{stage.name}-{i + 1}", daemon=True)
+                t.start()
+                stage.threads.append(t)
+
+    def put(self, name, item):
+        """Queue `item` for stage `name`; blocks while that stage's queue is full."""
+        stage = self._stages[name]
+        with self._cond:
+            self._pending += 1
+            stage.pending += 1
+        stage.queue.put(item)
+        depth = stage.queue.qsize()
+        with self._lock:
+            if depth > stage.stats.max_depth:
+                stage.stats.max_depth = depth
+
+    @contextmanager
+    def source(self, name):
+        """Time work done outside the worker threads (e.g. browser discovery) under stage `name`."""
+        stats = self._source_stats.get(name)
+        if stats is None:
+            stats = self._source_stats[name] = StageStats(name, 1)
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            stats.record(1, started, time.perf_counter(), failed)
+
+    def _worker(self, stage):
+        while True:
+            item = stage.queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            stop_seen = False
+            while len(batch) < stage.batch_size:
+                try:
+                    nxt = stage.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is self._STOP:
+                    stop_seen = True
+                    break
+                batch.append(nxt)
+
+            started = time.perf_counter()
+            failed = False
+            try:
+                stage.func(batch if stage.batch_size > 1 else batch[0])
+            except Exception:
+                failed = True
+                print(f"[{stage.name}] stage error:")
+                print(traceback.format_exc())
+            ended = time.perf_counter()
+            with self._lock:
+                stage.stats.record(len(batch), started, ended, failed)
+            with self._cond:
+                self._pending -= len(batch)
+                stage.pending -= len(batch)
+                self._cond.notify_all()
+            if stop_seen:
+                return
+
+    def idle(self, *names):
+        """True when nothing is queued for or running in the stages `names`."""
+        with self._cond:
+            return all(self._stages[n].pending == 0 for n in names if n in self._stages)
+
+    def join(self):
+        """Wait until all queued work (including work queued by stages) is finished, then stop the workers."""
+        with self._cond:
+            while self._pending > 0:
+                self._cond.wait()
+        for stage in self._stages.values():
+            for _ in stage.threads:
+                stage.queue.put(self._STOP)
+        for stage in self._stages.values():
+            for t in stage.threads:
+                t.join()
+
+    def stats(self):
+        """Return StageStats in pipeline order (source stages first)."""
+        return list(self._source_stats.values()) + [self._stages[n].stats for n in self._order]
+
+    def report(self, wall_seconds=None):
+        """Print a per-stage summary: items, errors, busy time, throughput and max queue depth."""
+        rows = self.stats()
+        print("\n--- Pipeline summary ---")
+        print(f"{'stage':<10} {'workers':>7} {'items':>6} {'errors':>6} {'busy s':>8} {'items/s':>8} {'max queue':>9}")
+        for st in rows:
+            span = st.active_span
+            rate = st.items / span if span > 0 else 0.0
+            print(
+                f"{st.name:<10} {st.workers:>7} {st.items:>6} {st.errors:>6} "
+                f"{st.busy:>8.2f} {rate:>8.2f} {st.max_depth:>9}"
+            )
+        if wall_seconds is not None:
+            print(f"Total wall time: {wall_seconds:.1f}s")
@@ -0,0 +1,127 @@
+"""
+Order in which queued downloads are fetched.
+
+Without an order, files are fetched in page order, so a backlog of large audio
+files from old months can hold up the serving schedule needed this week.
+`DownloadPriority` turns a download task into a sort key built from the
+criteria named in `DOWNLOAD_PRIORITY` (default 'month,type,size'):
+
+- month: the current and next month first, then the nearest other months
+  (upcoming before past at the same distance)
+- type: serving schedules, other schedules, DSG PDFs, other DSG documents
+  (Full / Special Edition DSG, foreword, bible references), audio and transcripts
+- size: smaller files first, from a size hint (the site does not list sizes,
+  so the hint comes from the file type)
+
+Ties keep page order. `main.py` gives the key to the download stage of the
+pipeline, which then hands each free worker the most urgent queued file.
+"""
+
+import os
+from datetime import date
+
+from src.links import MONTH_NAMES, SPECIAL_TYPES, classify_link
+
+CRITERIA = ("month", "type", "size")
+DEFAULT_ORDER = "month,type,size"
+
+# type ranks (lower is fetched first)
+SERVING_SCHEDULE = 0
+SCHEDULE = 1
+DSG = 2
+DSG_EXTRA = 3
+MEDIA = 4
+
+# rough sizes in bytes, used only to put small files first
+_MB = 1024 * 1024
+SIZE_HINTS = {".mp3": 40 * _MB, ".m4a": 40 * _MB, ".mp4": 200 * _MB, ".docx": _MB // 2, ".doc": _MB // 2}
+PDF_SIZE_HINT = _MB
+FULL_DSG_SIZE_HINT = 8 * _MB
+DEFAULT_SIZE_HINT = 2 * _MB
+
+# month rank for files whose folder has no month (year-only or undated)
+_NO_MONTH_RANK = 1000
+
+_MONTH_NUMBERS = {name: i + 1 for i, name in enumerate(MONTH_NAMES)}
+
+
+def parse_order(spec):
+    """'month,type,size' -> ('month', 'type', 'size'). Unknown names are dropped; '' / 'none' / 'page' -> ()."""
+    names = []
+    for part in (spec or "").replace(";", ",").split(","):
+        name = part.strip().lower()
+        if name in CRITERIA and name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+def month_rank(year, month, today):
+    """0 for the current and next month, then 2, 3, ... by distance (upcoming before past)."""
+    if not year or not str(year).isdigit():
+        return _NO_MONTH_RANK
+    number = _MONTH_NUMBERS.get(month)
+    if number is None:
+        # a whole-year file (e.g. the NACC calendar): right after the current months when it is this year's
+        return 1 if int(year) == today.year else 12 * abs(int(year) - today.year) + 1
+    distance = (int(year) - today.year) * 12 + number - today.month
+    if 0 <= distance <= 1:
+        return 0
+    if distance > 1:
+        return 2 * (distance - 1)
+    return 2 * -distance + 1
+
+
+def type_rank(kind, info, name=""):
+    if kind == "schedule":
+        serving = info.path_serving or "serving" in name.lower()
+        return SERVING_SCHEDULE if serving else SCHEDULE
+    if info.path_audio or info.path_transcript or SIZE_HINTS.get(info.ext.lower(), 0) >= 10 * _MB:
+        return MEDIA
+    if info.type_bits & SPECIAL_TYPES:
+        return DSG_EXTRA
+    return DSG
+
+
+def size_hint(info):
+    ext = info.ext.lower()
+    if ext in SIZE_HINTS:
+        return SIZE_HINTS[ext]
+    if ext == ".pdf":
+        return FULL_DSG_SIZE_HINT if info.full_dsg or info.se_dsg else PDF_SIZE_HINT
+    return DEFAULT_SIZE_HINT
+
+
+class DownloadPriority:
+    """Sort key for download tasks ({'kind', 'url', 'dest', 'name', ...}); lower keys are fetched first."""
+
+    def __init__(self, spec=DEFAULT_ORDER, base_dir="", today=None):
+        self.order = parse_order(spec)
+        self.base_dir = base_dir
+        self.today = today or date.today()
+
+    @property
+    def enabled(self):
+        return bool(self.order)
+
+    def _year_month(self, dest):
+        # destinations are base_dir/<year>/<month>/<subfolder> (see map_link_to_destination)
+        try:
+            rel = os.path.relpath(dest, self.base_dir) if self.base_dir else dest
+        except ValueError:
+            return None, None
+        parts = rel.replace("\\", "/").split("/")
+        year = parts[0] if parts and len(parts[0]) == 4 and parts[0].isdigit() else None
+        month = parts[1] if year and len(parts) > 1 and parts[1] in _MONTH_NUMBERS else None
+        return year, month
+
+    def key(self, task):
+        info = classify_link(task.get("url") or "")
+        values = []
+        for name in self.order:
+            if name == "month":
+                values.append(month_rank(*self._year_month(task.get("dest") or ""), self.today))
+            elif name == "type":
+                values.append(type_rank(task.get("kind"), info, task.get("name") or ""))
+            else:
+                values.append(size_hint(info))
+        return tuple(values)
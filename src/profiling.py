@@ -0,0 +1,130 @@
+"""
+Opt-in profiler for a single pipeline stage (`main.py --profile=<stage>`).
+
+Only calls of the chosen stage are profiled, so the rest of the run keeps its
+normal speed. The profiler is switched on around each call of the stage
+function; calls of the profiled stage run one at a time while it is on.
+
+- cProfile (default): results are merged into one `.pstats` file plus a
+  top-N text report sorted by cumulative time
+- pyinstrument (sampling, `--profile-sampler`, if installed): a text and an
+  HTML report; falls back to cProfile when pyinstrument is missing
+
+Open the `.pstats` file later with `python -m pstats <file>` or snakeviz.
+"""
+
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageProfiler:
+    """Profiles every call of stage `stage` and writes reports to `out_dir`."""
+
+    def __init__(self, stage, out_dir="logs", top=30, sampler=False):
+        self.stage = stage
+        self.out_dir = out_dir
+        self.top = int(top)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._pyinstrument = None
+        self._stats = None
+        if sampler:
+            try:
+                import pyinstrument
+            except ImportError:
+                print("pyinstrument is not installed; profiling with cProfile instead.")
+            else:
+                self._pyinstrument = pyinstrument.Profiler()
+
+    @property
+    def kind(self):
+        return "pyinstrument" if self._pyinstrument is not None else "cProfile"
+
+    @contextmanager
+    def profile(self):
+        """Profile the enclosed block (one block at a time)."""
+        with self._lock:
+            self.calls += 1
+            if self._pyinstrument is not None:
+                self._pyinstrument.start()
+                try:
+                    yield
+                finally:
+                    self._pyinstrument.stop()
+                return
+
+            import cProfile
+
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                yield
+            finally:
+                prof.disable()
+                self._merge(prof)
+
+    def wrap(self, func):
+        """Return `func` with every call profiled."""
+
+        def profiled(*args, **kwargs):
+            with self.profile():
+                return func(*args, **kwargs)
+
+        profiled.__name__ = getattr(func, "__name__", "profiled")
+        return profiled
+
+    def _merge(self, prof):
+        import pstats
+
+        if self._stats is None:
+            self._stats = pstats.Stats(prof)
+        else:
+            self._stats.add(prof)
+
+    def _base_path(self):
+        return os.path.join(self.out_dir, f"profile-{self.stage}-{self._stamp}")
+
+    def write(self):
+        """Write the reports. Returns the list of written files (empty if the stage never ran)."""
+        if self.calls == 0:
+            print(f"Profiler: stage '{self.stage}' did not run; nothing to write.")
+            return []
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = self._base_path()
+        written = []
+
+        if self._pyinstrument is not None:
+            text_path = base + ".txt"
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write(self._pyinstrument.output_text(unicode=True, color=False))
+            html_path = base + ".html"
+            with open(html_path, "w", encoding="utf-8") as f:
+                f.write(self._pyinstrument.output_html())
+            return [text_path, html_path]
+
+        stats_path = base + ".pstats"
+        self._stats.dump_stats(stats_path)
+        written.append(stats_path)
+
+        text_path = base + ".txt"
+        buf = io.StringIO()
+        self._stats.stream = buf
+        buf.write(f"Stage '{self.stage}': {self.calls} call(s)\n\n")
+        self._stats.sort_stats("cumulative").print_stats(self.top)
+        buf.write("\n")
+        self._stats.sort_stats("tottime").print_stats(self.top)
+        with open(text_path, "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+        written.append(text_path)
+        return written
+
+    def report(self):
+        """Write the reports and print where they are."""
+        paths = self.write()
+        for p in paths:
+            print(f"Profile ({self.kind}, stage '{self.stage}', {self.calls} call(s)) written to {p}")
+        return paths
@@ -0,0 +1,505 @@
+"""
+Small rate-limiting helpers shared by the calendar writer and downloaders.
+
+- `TokenBucket`: thread-safe token bucket for pacing calls (or bytes)
+- `backoff_delay`: exponential backoff with full jitter
+- `AdaptiveLimiter`: per-host AIMD concurrency window for site requests
+- `BandwidthLimiter`: global bytes/second and requests/second caps for downloads,
+  with time-of-day profiles and measured throughput
+"""
+
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens/second, holding at most `capacity`.
+
+    `acquire(n)` blocks until `n` tokens are available. A `rate` of 0 or None
+    disables pacing entirely.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate or 0)
+        self.capacity = float(capacity if capacity is not None else max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def set_rate(self, rate, capacity=None):
+        """Change the refill rate (and bucket size) in place; tokens already saved are kept up to the new size."""
+        with self._lock:
+            self._refill()
+            self.rate = float(rate or 0)
+            self.capacity = float(capacity if capacity is not None else max(self.rate, 1.0))
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self, n=1):
+        """Take `n` tokens, sleeping as needed. Returns the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        # requests larger than the bucket are let through once the bucket is full
+        n = min(float(n), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= n:
+                    self._tokens -= n
+                    self.waited += waited
+                    return waited
+                delay = (n - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, rand=random.random):
+    """Delay before retry number `attempt` (1-based): full jitter over base * 2**(attempt-1), capped."""
+    ceiling = min(cap, base * (2 ** max(0, attempt - 1)))
+    return ceiling * rand()
+
+
+# responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or an HTTP date); None if absent or invalid."""
+    if value in (None, ""):
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+class _HostWindow:
+    """AIMD state for one host."""
+
+    def __init__(self, host, window):
+        self.host = host
+        self.window = float(window)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        # typical response latency, smoothed (seconds); None until the first response
+        self.baseline = None
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.decreases = 0
+        self.min_window = self.window
+        self.max_window = self.window
+        self.latency_total = 0.0
+
+
+class _Slot:
+    """Handed out by `AdaptiveLimiter.request`; call `response()` when the status line and headers arrive."""
+
+    __slots__ = ("status", "retry_after", "started", "responded", "_clock")
+
+    def __init__(self, clock):
+        self._clock = clock
+        self.status = None
+        self.retry_after = None
+        self.started = clock()
+        self.responded = None
+
+    def response(self, status, headers=None):
+        """Record the response; latency is measured to here, not to the end of the body."""
+        self.status = status
+        self.retry_after = (headers or {}).get("Retry-After")
+        self.responded = self._clock()
+
+    @property
+    def latency(self):
+        return (self.responded or self._clock()) - self.started
+
+
+def _server_error(status):
+    return status >= 500 and status not in THROTTLE_STATUSES
+
+
+class AdaptiveLimiter:
+    """Per-host concurrency window, adjusted AIMD-style from how the server responds.
+
+    Each host starts at `initial` requests in flight. Every healthy response
+    (not 429/503, no error, latency under `latency_factor` x the smoothed
+    baseline) adds 1/window, so the window grows by about one per round of
+    requests. A throttle response, an error or a latency spike halves it (at
+    most once per `cooldown` seconds, so one burst of failures counts once),
+    never below `minimum`. A Retry-After header also holds every new request
+    to that host until the given time.
+
+    Usage::
+
+        with limiter.request(url) as slot:
+            resp = session.get(url, stream=True)
+            slot.response(resp.status_code, resp.headers)
+            ...  # read the body; the slot is held until the block ends
+
+    Latency is the time to the response headers, so a large file does not
+    look like a slow server.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, latency_factor=3.0, cooldown=2.0,
+                 clock=time.monotonic):
+        self.minimum = max(1, int(minimum))
+        self.maximum = max(self.minimum, int(maximum))
+        self.initial = min(self.maximum, max(self.minimum, int(initial)))
+        self.latency_factor = float(latency_factor)
+        self.cooldown = float(cooldown)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._hosts = {}
+        self._last_decrease = {}
+
+    def _host(self, url):
+        host = urlparse(url).netloc.lower() or url
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostWindow(host, self.initial)
+        return state
+
+    def window(self, url):
+        """Current window for the host of `url`."""
+        with self._cond:
+            return self._host(url).window
+
+    def wait_until_open(self, url):
+        """Block while a Retry-After for the host of `url` is in force, without taking a slot.
+
+        For requests that cannot run in parallel anyway (the browser's page loads).
+        """
+        with self._cond:
+            state = self._host(url)
+            while True:
+                wait = state.blocked_until - self._clock()
+                if wait <= 0:
+                    return
+                self._cond.wait(timeout=wait)
+
+    def acquire(self, url):
+        """Block until the host of `url` has a free slot (and any Retry-After has passed)."""
+        with self._cond:
+            state = self._host(url)
+            while True:
+                wait = state.blocked_until - self._clock()
+                if wait <= 0 and state.in_flight < int(state.window):
+                    state.in_flight += 1
+                    return state
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, state, latency, status=None, retry_after=None, error=False):
+        """Record one finished request and adjust the host's window."""
+        with self._cond:
+            state.in_flight -= 1
+            state.requests += 1
+            state.latency_total += latency
+            throttled = status in THROTTLE_STATUSES
+            if throttled:
+                state.throttled += 1
+            if error:
+                state.errors += 1
+            delay = parse_retry_after(retry_after)
+            if delay:
+                state.blocked_until = max(state.blocked_until, self._clock() + delay)
+
+            slow = (
+                state.baseline is not None
+                and latency > state.baseline * self.latency_factor
+            )
+            if not throttled and not error:
+                # slow answers move the baseline too, only more slowly, so a server that
+                # settles at a higher latency is normal again after a few responses
+                weight = 0.05 if slow else 0.2
+                state.baseline = latency if state.baseline is None else (1 - weight) * state.baseline + weight * latency
+            if throttled or error or slow:
+                self._decrease(state)
+            else:
+                state.window = min(float(self.maximum), state.window + 1.0 / state.window)
+                state.max_window = max(state.max_window, state.window)
+            self._cond.notify_all()
+
+    def _decrease(self, state):
+        now = self._clock()
+        if now - self._last_decrease.get(state.host, -self.cooldown) < self.cooldown:
+            return
+        self._last_decrease[state.host] = now
+        state.window = max(float(self.minimum), state.window / 2)
+        state.min_window = min(state.min_window, state.window)
+        state.decreases += 1
+
+    @contextmanager
+    def request(self, url):
+        """Hold one slot for `url`'s host around a request.
+
+        A 5xx answer (other than 503) and an exception before any response count
+        as errors; an exception after the server answered (e.g. a 404 raised as
+        HTTPError, a rejected payload) is judged by the status alone.
+        """
+        state = self.acquire(url)
+        slot = _Slot(self._clock)
+        try:
+            yield slot
+        except BaseException:
+            self.release(state, slot.latency, slot.status, slot.retry_after,
+                         error=slot.status is None or _server_error(slot.status))
+            raise
+        self.release(state, slot.latency, slot.status, slot.retry_after,
+                     error=slot.status is not None and _server_error(slot.status))
+
+    def stats(self):
+        """[(host, window, min, max, requests, throttled, errors, avg latency s)] for the run report."""
+        with self._cond:
+            return [
+                (s.host, s.window, s.min_window, s.max_window, s.requests, s.throttled, s.errors,
+                 s.latency_total / s.requests if s.requests else 0.0)
+                for s in self._hosts.values()
+            ]
+
+    def report(self):
+        rows = self.stats()
+        if not rows:
+            return
+        print("\n--- Request concurrency (per host) ---")
+        print(f"{'host':<28} {'window':>6} {'min':>5} {'max':>5} {'reqs':>6} {'429/503':>7} {'errors':>6} {'avg s':>6}")
+        for host, window, low, high, reqs, throttled, errors, avg in rows:
+            print(f"{host[:28]:<28} {window:>6.1f} {low:>5.1f} {high:>5.1f} {reqs:>6} {throttled:>7} {errors:>6} {avg:>6.2f}")
+
+
+@contextmanager
+def request_slot(limiter, url):
+    """`limiter.request(url)`, or a slot that only records the response when `limiter` is None."""
+    if limiter is None:
+        yield _Slot(time.monotonic)
+        return
+    with limiter.request(url) as slot:
+        yield slot
+
+
+# -----------------------------
+# bandwidth and request-rate limits
+# -----------------------------
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+_DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+_WINDOW_RE = re.compile(r'^(?:(?P<days>[a-z,]+)\s+)?(?P<start>\d{1,2}:\d{2})-(?P<end>\d{1,2}:\d{2})$', re.IGNORECASE)
+# smallest byte bucket, so one read chunk always fits
+MIN_BYTE_BURST = 64 * 1024
+
+
+def parse_size(text):
+    """'256KB' / '1.5MB' / '500k' / '2048' -> bytes (1 KB = 1024 bytes)."""
+    m = _SIZE_RE.match(str(text))
+    if not m:
+        raise ValueError(f"not a size: {text!r}")
+    return float(m.group(1)) * _SIZE_UNITS[m.group(2).lower()]
+
+
+def parse_limits(text):
+    """'256KB/s, 2req/s' -> (bytes per second, requests per second); a missing one is 0 (no limit)."""
+    bytes_per_sec = requests_per_sec = 0.0
+    for part in str(text).split(','):
+        part = part.strip().lower().replace(' ', '')
+        if not part:
+            continue
+        if part.endswith('req/s'):
+            requests_per_sec = float(part[:-len('req/s')])
+        elif part.endswith('/s'):
+            bytes_per_sec = parse_size(part[:-2])
+        else:
+            raise ValueError(f"expected '<size>/s' or '<n>req/s', got {part!r}")
+    return bytes_per_sec, requests_per_sec
+
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    value = int(hours) * 60 + int(minutes)
+    if not 0 <= value <= 24 * 60 or int(minutes) >= 60:
+        raise ValueError(f"not a time of day: {hhmm!r}")
+    return value
+
+
+class LimitProfile:
+    """Limits for a daily time window (optionally only on some weekdays); end before start wraps past midnight."""
+
+    __slots__ = ('label', 'days', 'start', 'end', 'bytes_per_sec', 'requests_per_sec')
+
+    def __init__(self, label, start, end, bytes_per_sec=0.0, requests_per_sec=0.0, days=None):
+        self.label = label
+        self.start = start
+        self.end = end
+        self.days = frozenset(days) if days else None
+        self.bytes_per_sec = bytes_per_sec
+        self.requests_per_sec = requests_per_sec
+
+    def active(self, now):
+        minute = now.hour * 60 + now.minute
+        if self.start <= self.end:
+            inside, day = self.start <= minute < self.end, now.weekday()
+        else:
+            # overnight: the part after midnight belongs to the previous day's window
+            inside = minute >= self.start or minute < self.end
+            day = now.weekday() if minute >= self.start else (now.weekday() - 1) % 7
+        return inside and (self.days is None or day in self.days)
+
+    def __repr__(self):
+        return f"LimitProfile({self.label!r})"
+
+
+def parse_limit_profiles(spec):
+    """'sun 09:30-12:30=256KB/s,2req/s; 18:00-20:00=1MB/s' -> [LimitProfile, ...]. Raises ValueError."""
+    profiles = []
+    for entry in (spec or '').split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        window, sep, limits = entry.partition('=')
+        m = _WINDOW_RE.match(window.strip())
+        if not sep or not m:
+            raise ValueError(f"expected '[days ]HH:MM-HH:MM=limits', got {entry!r}")
+        days = None
+        if m.group('days'):
+            names = [d.strip().lower()[:3] for d in m.group('days').split(',') if d.strip()]
+            unknown = [d for d in names if d not in _DAYS]
+            if unknown:
+                raise ValueError(f"unknown day(s) {unknown} in {entry!r}")
+            days = {_DAYS.index(d) for d in names}
+        bytes_per_sec, requests_per_sec = parse_limits(limits)
+        profiles.append(LimitProfile(
+            window.strip(), _minutes(m.group('start')), _minutes(m.group('end')),
+            bytes_per_sec, requests_per_sec, days,
+        ))
+    return profiles
+
+
+class BandwidthLimiter:
+    """Global caps shared by every download worker: bytes/second and requests/second.
+
+    The first profile whose time window contains the current local time sets
+    the limits; outside every window the default limits apply (0 = no limit).
+    The active limits are re-checked every `check_every` seconds.
+
+    Call `request()` before each request and `consume(n)` for every chunk
+    read; both block as needed. `report()` prints the measured throughput per
+    profile and the time spent waiting, to help tune the limits.
+    """
+
+    def __init__(self, bytes_per_sec=0, requests_per_sec=0, profiles=(), check_every=15.0,
+                 now=datetime.now, clock=time.monotonic, sleep=time.sleep):
+        self.default = LimitProfile('default', 0, 0, float(bytes_per_sec or 0), float(requests_per_sec or 0))
+        self.profiles = list(profiles)
+        self.check_every = float(check_every)
+        self._now = now
+        self._clock = clock
+        self._bytes = TokenBucket(0, clock=clock, sleep=sleep)
+        self._requests = TokenBucket(0, clock=clock, sleep=sleep)
+        self._lock = threading.Lock()
+        self._checked = None
+        self.profile = None
+        # profile label -> [bytes, requests, byte wait s, request wait s, first use, last use]
+        self._stats = {}
+        self._apply()
+
+    @property
+    def enabled(self):
+        return any(p.bytes_per_sec or p.requests_per_sec for p in [self.default] + self.profiles)
+
+    def _current(self):
+        now = self._now()
+        return next((p for p in self.profiles if p.active(now)), self.default)
+
+    def _apply(self):
+        stamp = self._clock()
+        with self._lock:
+            if self._checked is not None and stamp - self._checked < self.check_every:
+                return self.profile
+            self._checked = stamp
+            profile = self._current()
+            if profile is self.profile:
+                return profile
+            self.profile = profile
+        self._bytes.set_rate(profile.bytes_per_sec, max(profile.bytes_per_sec, MIN_BYTE_BURST))
+        self._requests.set_rate(profile.requests_per_sec, max(profile.requests_per_sec, 1.0))
+        if profile.bytes_per_sec or profile.requests_per_sec:
+            print(f"Download limits now {_describe(profile)} ({profile.label}).")
+        return profile
+
+    def _record(self, profile, nbytes, nrequests, byte_wait, request_wait):
+        stamp = self._clock()
+        with self._lock:
+            row = self._stats.get(profile.label)
+            if row is None:
+                row = self._stats[profile.label] = [0, 0, 0.0, 0.0, stamp, stamp]
+            row[0] += nbytes
+            row[1] += nrequests
+            row[2] += byte_wait
+            row[3] += request_wait
+            row[5] = stamp
+
+    def request(self):
+        """Wait for a request token."""
+        profile = self._apply()
+        waited = self._requests.acquire(1)
+        self._record(profile, 0, 1, 0.0, waited)
+        return waited
+
+    def consume(self, nbytes):
+        """Wait until `nbytes` more may be read."""
+        profile = self._apply()
+        waited = self._bytes.acquire(nbytes)
+        self._record(profile, nbytes, 0, waited, 0.0)
+        return waited
+
+    def stats(self):
+        """[(profile label, bytes, requests, seconds, byte wait s, request wait s)]."""
+        with self._lock:
+            return [
+                (label, row[0], row[1], row[5] - row[4], row[2], row[3])
+                for label, row in self._stats.items()
+            ]
+
+    def report(self):
+        rows = self.stats()
+        if not rows:
+            return
+        print("\n--- Download throughput ---")
+        print(f"{'limits':<22} {'MB':>8} {'reqs':>6} {'secs':>7} {'MB/s':>7} {'req/s':>6} {'wait s':>7}")
+        for label, nbytes, nrequests, secs, byte_wait, request_wait in rows:
+            mb = nbytes / (1024 * 1024)
+            print(
+                f"{label[:22]:<22} {mb:>8.1f} {nrequests:>6} {secs:>7.1f} "
+                f"{mb / secs if secs > 0 else 0.0:>7.2f} {nrequests / secs if secs > 0 else 0.0:>6.2f} "
+                f"{byte_wait + request_wait:>7.1f}"
+            )
+
+
+def _describe(profile):
+    parts = []
+    if profile.bytes_per_sec:
+        parts.append(f"{profile.bytes_per_sec / 1024:.0f} KB/s")
+    if profile.requests_per_sec:
+        parts.append(f"{profile.requests_per_sec:g} req/s")
+    return ", ".join(parts) or "unlimited"
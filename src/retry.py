@@ -0,0 +1,343 @@
+"""
+Retry layer shared by downloads and month page loads.
+
+- `classify_error`: sorts a failure into timeout, server (5xx), throttled
+  (429/503), auth (401/403 or a sign-in page), not_found, client (other 4xx),
+  dns, network, invalid (not the expected file) or other
+- `RetryPolicy.call`: runs one attempt after another with exponential backoff
+  and jitter (`src.ratelimit.backoff_delay`, at least any Retry-After) while
+  the error is worth retrying (timeout, server, throttled, dns, network)
+- `ErrorBudget`: retries allowed in one run; once spent, failures fail fast
+- `CircuitBreaker`: after several site-down failures in a row a host is left
+  alone for a while, then one trial request decides whether to resume
+- `RetryList`: what still failed, saved to a JSON file so the next run tries it again
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+from src.ratelimit import backoff_delay, parse_retry_after
+
+TIMEOUT = "timeout"
+SERVER = "server"
+THROTTLED = "throttled"
+AUTH = "auth"
+NOT_FOUND = "not_found"
+CLIENT = "client"
+DNS = "dns"
+NETWORK = "network"
+CIRCUIT_OPEN = "circuit_open"
+INVALID = "invalid"
+OTHER = "other"
+
+# worth another attempt
+RETRYABLE = frozenset({TIMEOUT, SERVER, THROTTLED, DNS, NETWORK})
+# mean the site (or the way to it) is down; these trip the circuit breaker
+SITE_DOWN = frozenset({TIMEOUT, SERVER, DNS, NETWORK})
+
+DEFAULT_RETRY_LIST = "download_retry.json"
+
+
+class HttpStatusError(Exception):
+    """A response with a status that is not a success."""
+
+    def __init__(self, status, url="", retry_after=None):
+        super().__init__(f"HTTP {status} for {url}" if url else f"HTTP {status}")
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker for a host is open; the request was not sent."""
+
+
+class RetryError(Exception):
+    """The last failure of a call that will not be retried (any more) this run."""
+
+    def __init__(self, kind, error, attempts):
+        super().__init__(f"{kind} after {attempts} attempt(s): {error}")
+        self.kind = kind
+        self.error = error
+        self.attempts = attempts
+
+
+def _status_of(exc):
+    for attr in ("status", "code"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def classify_status(status):
+    if status in (429, 503):
+        return THROTTLED
+    if status in (401, 403, 407):
+        return AUTH
+    if status in (404, 410):
+        return NOT_FOUND
+    if 500 <= status < 600:
+        return SERVER
+    if 400 <= status < 500:
+        return CLIENT
+    return OTHER
+
+
+def classify_error(exc):
+    """One of the kinds above for an exception from requests, urllib, sockets or selenium."""
+    if isinstance(exc, CircuitOpenError):
+        return CIRCUIT_OPEN
+    # errors that know their kind (e.g. src.payload.InvalidPayload)
+    kind = getattr(exc, "retry_kind", None)
+    if kind:
+        return kind
+    status = _status_of(exc)
+    if status is not None:
+        return classify_status(status)
+    text = f"{type(exc).__name__} {exc}".lower()
+    reason = getattr(exc, "reason", None)
+    if isinstance(exc, socket.gaierror) or isinstance(reason, socket.gaierror) or any(
+        s in text for s in ("name_not_resolved", "name resolution", "getaddrinfo", "nodename nor servname")
+    ):
+        return DNS
+    if isinstance(exc, (TimeoutError, socket.timeout)) or isinstance(reason, (TimeoutError, socket.timeout)) or (
+        "timeout" in text or "timed out" in text
+    ):
+        return TIMEOUT
+    if isinstance(exc, ConnectionError) or isinstance(reason, ConnectionError) or any(
+        s in text for s in ("connection", "net::err_", "remotedisconnected", "incompleteread")
+    ):
+        return NETWORK
+    return OTHER
+
+
+def _host(url):
+    return urlparse(url or "").netloc.lower()
+
+
+class ErrorBudget:
+    """At most `limit` retries per run (None or 0 means no limit). Thread-safe."""
+
+    def __init__(self, limit):
+        self.limit = int(limit or 0)
+        self.spent = 0
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def spend(self):
+        """Take one retry from the budget; False once it is used up."""
+        with self._lock:
+            if self.limit and self.spent >= self.limit:
+                if not self._warned:
+                    self._warned = True
+                    print(f"Error budget of {self.limit} retries used up; further failures are not retried this run.")
+                return False
+            self.spent += 1
+            return True
+
+    @property
+    def exhausted(self):
+        return bool(self.limit) and self.spent >= self.limit
+
+
+class CircuitBreaker:
+    """Per-host breaker: opens after `threshold` site-down failures in a row.
+
+    While open, requests to the host fail at once with `CircuitOpenError`.
+    After `reset_after` seconds one trial request is let through (half-open);
+    success closes the breaker, another failure opens it again.
+    """
+
+    def __init__(self, threshold=5, reset_after=60.0, clock=time.monotonic):
+        self.threshold = max(1, int(threshold))
+        self.reset_after = float(reset_after)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # host -> [consecutive failures, opened at or None, trial in flight]
+        self._hosts = {}
+        self.opened = 0
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = [0, None, False]
+        return state
+
+    def before(self, url):
+        """Raise CircuitOpenError if requests to `url`'s host are paused."""
+        host = _host(url)
+        with self._lock:
+            state = self._state(host)
+            if state[1] is None:
+                return
+            if self._clock() - state[1] < self.reset_after or state[2]:
+                raise CircuitOpenError(f"{host or url} looks down; not retrying it for now")
+            # half-open: this request is the trial
+            state[2] = True
+
+    def success(self, url):
+        with self._lock:
+            state = self._state(_host(url))
+            if state[1] is not None:
+                print(f"{_host(url)} is answering again.")
+            self._hosts[_host(url)] = [0, None, False]
+
+    def failure(self, url, kind):
+        if kind not in SITE_DOWN:
+            # the site answered (a missing file, a login problem): it is up
+            self.success(url)
+            return
+        host = _host(url)
+        with self._lock:
+            state = self._state(host)
+            state[0] += 1
+            if state[1] is not None or state[0] >= self.threshold:
+                if state[1] is None:
+                    self.opened += 1
+                    print(f"{host} failed {state[0]} times in a row; pausing requests for {self.reset_after:.0f}s.")
+                state[1] = self._clock()
+                state[2] = False
+
+    def is_open(self, url):
+        with self._lock:
+            return self._state(_host(url))[1] is not None
+
+
+class RetryPolicy:
+    """Attempts, backoff, error budget and circuit breaker for one kind of request.
+
+    `call(fn, url)` runs `fn()` until it returns, retrying the kinds in
+    RETRYABLE up to `max_attempts` times; a final failure raises RetryError
+    with the error kind. `stats` counts attempts, retries and failures by kind.
+    """
+
+    def __init__(self, max_attempts=3, base=1.0, cap=30.0, budget=None, breaker=None, sleep=time.sleep):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base = float(base)
+        self.cap = float(cap)
+        self.budget = budget
+        self.breaker = breaker
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.stats = {"attempts": 0, "retries": 0, "failed": {}}
+
+    @classmethod
+    def single(cls):
+        """One attempt, no breaker: the behaviour without a retry layer."""
+        return cls(max_attempts=1)
+
+    def _count(self, key, kind=None):
+        with self._lock:
+            if kind is None:
+                self.stats[key] += 1
+            else:
+                self.stats[key][kind] = self.stats[key].get(kind, 0) + 1
+
+    def call(self, fn, url=None, label=None):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if self.breaker is not None:
+                    self.breaker.before(url)
+                self._count("attempts")
+                result = fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if self.breaker is not None and kind != CIRCUIT_OPEN:
+                    self.breaker.failure(url, kind)
+                if (
+                    kind not in RETRYABLE
+                    or attempt >= self.max_attempts
+                    or (self.breaker is not None and self.breaker.is_open(url))
+                    or (self.budget is not None and not self.budget.spend())
+                ):
+                    self._count("failed", kind)
+                    raise RetryError(kind, e, attempt) from e
+                delay = backoff_delay(attempt, base=self.base, cap=self.cap)
+                wait = parse_retry_after(getattr(e, "retry_after", None))
+                if wait:
+                    delay = max(delay, min(wait, self.cap))
+                self._count("retries")
+                print(f"{label or url}: {kind} ({e}); retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+                self._sleep(delay)
+            else:
+                if self.breaker is not None:
+                    self.breaker.success(url)
+                return result
+
+    def summary(self):
+        s = self.stats
+        failed = ", ".join(f"{n} {kind}" for kind, n in sorted(s["failed"].items()))
+        return f"{s['attempts']} attempt(s), {s['retries']} retr(ies)" + (f"; gave up on {failed}" if failed else "")
+
+
+class RetryList:
+    """Items that failed in a run, kept in a JSON file for the next run. Thread-safe.
+
+    Each item is a dict with at least 'type' ('download' or 'page') and 'url';
+    `add` records a failure, `done` removes an item once it worked.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("DOWNLOAD_RETRY_LIST", DEFAULT_RETRY_LIST)
+        self._lock = threading.Lock()
+        self._items = {}
+        self._dirty = False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for item in json.load(f):
+                    self._items[(item["type"], item["url"])] = item
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        # what was left from the last run, before this run adds or clears anything
+        self.previous = list(self._items.values())
+
+    def items(self, type_=None):
+        with self._lock:
+            return [i for i in self._items.values() if type_ is None or i["type"] == type_]
+
+    def add(self, type_, url, error, kind=None, **fields):
+        with self._lock:
+            item = self._items.get((type_, url)) or {"type": type_, "url": url, "failures": 0, "first_failed": time.time()}
+            item.update(fields)
+            item["error"] = str(error)
+            item["kind"] = kind
+            item["failures"] += 1
+            item["last_failed"] = time.time()
+            self._items[(type_, url)] = item
+            self._dirty = True
+
+    def done(self, type_, url):
+        with self._lock:
+            if self._items.pop((type_, url), None) is not None:
+                self._dirty = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def save(self):
+        """Write the list (atomically); an empty list removes the file."""
+        with self._lock:
+            if not self._dirty:
+                return
+            items = sorted(self._items.values(), key=lambda i: (i["type"], i["url"]))
+            self._dirty = False
+        if not items:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(items, f, indent=1)
+        os.replace(tmp, self.path)
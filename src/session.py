@@ -0,0 +1,101 @@
+"""
+Fresh site cookies for download workers after the session expires.
+
+Download workers use a snapshot of the browser cookies taken when a month
+page was read. When the site session runs out, file links answer with the
+sign-in page (caught by `src.payload`), and only the browser on the main
+thread can sign in again (WebDriver is not thread-safe). `SessionRefresher`
+connects the two:
+
+- a worker calls `request(stale_cookies)` and waits for new cookies
+- the main thread calls `service(refresh)` between month pages and, after
+  discovery, while downloads are still running; `refresh()` signs in and
+  returns `driver.get_cookies()`
+
+Workers that ask right after a sign-in get the new cookies without signing in
+again; if the cookies from that sign-in fail too, they get None (signing in
+does not help, so the download fails as 'auth').
+"""
+
+import threading
+import time
+
+# seconds a worker waits for the main thread to sign in again
+REQUEST_TIMEOUT = 120.0
+# a sign-in this recent is not repeated for a worker whose cookies came from it
+REUSE_FOR = 30.0
+
+
+class SessionRefresher:
+    """Hands sign-in requests from worker threads to the thread that owns the browser. Thread-safe."""
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, reuse_for=REUSE_FOR, clock=time.monotonic):
+        self.timeout = float(timeout)
+        self.reuse_for = float(reuse_for)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._wanted = False
+        self._closed = False
+        # cookies from the last sign-in and when it finished
+        self._cookies = None
+        self._refreshed_at = None
+        # bumped after every sign-in attempt, so waiters know theirs is done
+        self._generation = 0
+        self.refreshes = 0
+
+    def request(self, stale):
+        """Called by a worker whose `stale` cookies got the sign-in page. Returns new cookies or None."""
+        with self._cond:
+            if self._closed:
+                return None
+            if self._cookies is not None and stale != self._cookies:
+                # someone already signed in after these cookies were taken
+                return self._cookies
+            if self._refreshed_at is not None and self._clock() - self._refreshed_at < self.reuse_for:
+                # the cookies of a sign-in moments ago fail too
+                return None
+            generation = self._generation
+            self._wanted = True
+            self._cond.notify_all()
+            deadline = self._clock() + self.timeout
+            while self._generation == generation and not self._closed:
+                left = deadline - self._clock()
+                if left <= 0:
+                    return None
+                self._cond.wait(left)
+            if self._generation == generation or self._cookies == stale:
+                # timed out, closed, or the sign-in failed
+                return None
+            return self._cookies
+
+    def service(self, refresh, wait=0.0):
+        """On the browser thread: sign in with `refresh()` if a worker asked (waits up to `wait` seconds for one).
+
+        Returns True when a sign-in was done.
+        """
+        with self._cond:
+            if not self._wanted and wait > 0 and not self._closed:
+                self._cond.wait(wait)
+            if not self._wanted or self._closed:
+                return False
+        print("Site session expired; signing in again for the downloads...")
+        try:
+            cookies = refresh() or None
+        except Exception as e:
+            print("Signing in again failed:", e)
+            cookies = None
+        with self._cond:
+            if cookies:
+                self._cookies = cookies
+                self.refreshes += 1
+            self._refreshed_at = self._clock()
+            self._wanted = False
+            self._generation += 1
+            self._cond.notify_all()
+        return True
+
+    def close(self):
+        """No more sign-ins (the browser is closing); waiting workers get None."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
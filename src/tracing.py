@@ -0,0 +1,161 @@
+"""
+Lightweight span tracing for finding where a run spends its time.
+
+Wrap a phase in `with span("download", file=name): ...`. Tracing is off by
+default and `span()` then returns a shared no-op object, so leaving the calls
+in place costs one global lookup per phase.
+
+When enabled (`main.py --trace`), every span is recorded as a Chrome trace
+"complete" event. `write(path)` saves a JSON file that opens in
+chrome://tracing or https://ui.perfetto.dev (one row per thread), and
+`summary()` prints count, total and percentiles per span name.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args = dict(self.args, error=exc_type.__name__)
+        self.tracer.record(self.name, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    """Collects finished spans from any thread."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end, args=None):
+        thread = threading.current_thread()
+        # list.append is atomic; the lock only guards the thread-name table
+        self.events.append((name, start, end, thread.ident, args or None))
+        if thread.ident not in self.threads:
+            with self._lock:
+                self.threads[thread.ident] = thread.name
+
+    def chrome_trace(self):
+        """Return the spans as a Chrome trace / Perfetto JSON object."""
+        pid = os.getpid()
+        trace = []
+        for tid, tname in self.threads.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": tname}})
+        for name, start, end, tid, args in self.events:
+            event = {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round((end - start) * 1e6, 1),
+                "pid": pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = {k: str(v) for k, v in args.items()}
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def durations(self):
+        """Return {span name: [seconds, ...]}."""
+        out = {}
+        for name, start, end, _tid, _args in self.events:
+            out.setdefault(name, []).append(end - start)
+        return out
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+_TRACER = None
+
+
+def enable():
+    """Start recording spans (replaces any previous tracer)."""
+    global _TRACER
+    _TRACER = Tracer()
+    return _TRACER
+
+
+def disable():
+    global _TRACER
+    _TRACER = None
+
+
+def is_enabled():
+    return _TRACER is not None
+
+
+def span(name, **args):
+    """Context manager timing the enclosed block as span `name` (no-op when tracing is off)."""
+    tracer = _TRACER
+    if tracer is None:
+        return _NULL_SPAN
+    return _Span(tracer, name, args)
+
+
+def write(path):
+    """Write the Chrome trace JSON to `path`. Returns the path, or None when tracing is off."""
+    if _TRACER is None:
+        return None
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_TRACER.chrome_trace(), f)
+    return path
+
+
+def summary():
+    """Print count, total, mean, p50, p90, p99 and max seconds per span name."""
+    if _TRACER is None:
+        return
+    rows = []
+    for name, values in _TRACER.durations().items():
+        values.sort()
+        rows.append((sum(values), name, values))
+    rows.sort(reverse=True)
+    print("\n--- Trace summary (seconds) ---")
+    print(f"{'phase':<22} {'count':>6} {'total':>9} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for total, name, values in rows:
+        print(
+            f"{name:<22} {len(values):>6} {total:>9.2f} {total / len(values):>8.3f} "
+            f"{percentile(values, 50):>8.3f} {percentile(values, 90):>8.3f} "
+            f"{percentile(values, 99):>8.3f} {values[-1]:>8.3f}"
+        )
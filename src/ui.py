@@ -1,14 +1,8 @@
 """Modern, user-friendly UI for DSG Downloader with terminal fallback support."""
 
 from typing import Set, Iterable, Dict, Any
-import os
 import json
-from tkinter import colorchooser, messagebox, filedialog
-import customtkinter as ctk
-from dotenv import set_key, get_key
-from src.config import USE_UI
-
-ENV_PATH = os.path.join(os.getcwd(), ".env")
+from src.config import USE_UI, get_settings, save_env_values
 
 def prompt_multichoice(
     prompt: str, choices: Iterable[str], defaults: Iterable[str] | None = None
@@ -38,51 +32,50 @@ def prompt_languages(
     """Displays a terminal prompt for language selections."""
     return prompt_multichoice(prompt, list(langs), defaults=defaults)
 
-def _load_json_env(key: str) -> Any:
-    """Loads a JSON-encoded value from the .env file."""
-    try:
-        from dotenv import load_dotenv
-        load_dotenv(ENV_PATH)
-    except Exception:
-        pass
+_PLAIN_KEYS = ["USERNAME", "PASSWORD", "DSGS_DIR"]
 
-    v = os.environ.get(key)
-    if not v:
-        v = get_key(ENV_PATH, key)
+
+def _load_json_env(key: str) -> Any:
+    """Loads a JSON-encoded value from the cached .env settings."""
+    v = get_settings().get(key)
     if not v:
         return None
     try:
-        if key in ["USERNAME", "PASSWORD", "DSGS_DIR"]:
+        if key in _PLAIN_KEYS:
             return v
         return json.loads(v)
     except (json.JSONDecodeError, TypeError):
         return v
 
-def _save_json_env(key: str, value: Any) -> None:
-    """Saves a value as a JSON-encoded string to the .env file."""
-    try:
-        if key in ["USERNAME", "PASSWORD", "DSGS_DIR"]:
-            set_key(ENV_PATH, key, str(value or ""))
-            return
 
-        def _to_jsonable(v: Any) -> Any:
-            if isinstance(v, set):
-                return list(v)
-            if isinstance(v, dict):
-                return {k: _to_jsonable(val) for k, val in v.items()}
-            if isinstance(v, list):
-                return [_to_jsonable(i) for i in v]
-            return v
+def _env_string(key: str, value: Any) -> str:
+    """Encodes a value the way it is stored in .env (plain text or JSON)."""
+    if key in _PLAIN_KEYS:
+        return str(value or "")
 
-        serializable_value = _to_jsonable(value if value is not None else [])
-        set_key(ENV_PATH, key, json.dumps(serializable_value))
-    except Exception:
-        pass
+    def _to_jsonable(v: Any) -> Any:
+        if isinstance(v, set):
+            return list(v)
+        if isinstance(v, dict):
+            return {k: _to_jsonable(val) for k, val in v.items()}
+        if isinstance(v, list):
+            return [_to_jsonable(i) for i in v]
+        return v
 
+    return json.dumps(_to_jsonable(value if value is not None else []))
 
-def get_user_selection() -> Dict[str, Any]:
-    """Entry point that routes to GUI or Terminal CLI based on USE_UI in .env."""
-    saved_data = {
+
+def _save_env(values: Dict[str, Any]) -> None:
+    """Saves several values to the .env file in one rewrite."""
+    try:
+        save_env_values({key: _env_string(key, value) for key, value in values.items()})
+    except Exception as e:
+        print(f"Could not save choices to .env: {e}")
+
+
+def load_saved_choices() -> Dict[str, Any]:
+    """Returns the choices saved in .env by an earlier run, without asking anything."""
+    return {
         "selections": set(_load_json_env("DSG_UI_SELECTIONS") or []),
         "schedules_chosen": set(_load_json_env("DSG_UI_SCHEDULES_CHOSEN") or []),
         "schedules_sub": _load_json_env("DSG_UI_SCHEDULES_SUB") or {},
@@ -95,6 +88,11 @@ def get_user_selection() -> Dict[str, Any]:
         "DSGS_DIR": _load_json_env("DSGS_DIR") or "",
     }
 
+
+def get_user_selection() -> Dict[str, Any]:
+    """Entry point that routes to GUI or Terminal CLI based on USE_UI in .env."""
+    saved_data = load_saved_choices()
+
     if not USE_UI:
         print("USE_UI is false. Bypassing GUI and running in Terminal CLI mode...")
         return _terminal_fallback(saved_data)
@@ -113,6 +111,10 @@ def get_user_selection() -> Dict[str, Any]:
 
 def _launch_gui_selection(saved_data: Dict[str, Any]) -> Dict[str, Any]:
     """Launches CustomTkinter GUI interface."""
+    # GUI toolkits are only loaded when the window is actually shown
+    from tkinter import colorchooser, messagebox, filedialog
+    import customtkinter as ctk
+
     app = ctk.CTk()
     app.title("DSG Downloader - Options")
     app.geometry("800x700")
@@ -415,6 +417,7 @@ def _launch_gui_selection(saved_data: Dict[str, Any]) -> Dict[str, Any]:
     )
 
     result: Dict[str, Any] = {}
+    credentials: Dict[str, Any] = {}
 
     def check_form_changed(*args):
         is_changed = any(v.get() for v in all_vars) or current_ministers
@@ -463,9 +466,12 @@ def _launch_gui_selection(saved_data: Dict[str, Any]) -> Dict[str, Any]:
             }
         )
         
-        _save_json_env("USERNAME", username_entry.get())
-        _save_json_env("PASSWORD", password_entry.get())
-        _save_json_env("DSGS_DIR", path_entry.get())
+        # saved together with the choices once the window closes
+        credentials.update({
+            "USERNAME": username_entry.get(),
+            "PASSWORD": password_entry.get(),
+            "DSGS_DIR": path_entry.get(),
+        })
 
         app.destroy()
 
@@ -485,13 +491,16 @@ def _launch_gui_selection(saved_data: Dict[str, Any]) -> Dict[str, Any]:
     app.mainloop()
 
     if result:
-        _save_json_env("DSG_UI_SELECTIONS", result.get("selections", []))
-        _save_json_env("DSG_UI_BIBLE_READING_LANGS", result.get("bible_reading_langs", []))
-        _save_json_env("DSG_UI_FULL_DSG_LANGS", result.get("full_dsg_langs", []))
-        _save_json_env("DSG_UI_SE_DSG_LANGS", result.get("se_dsg_langs", []))
-        _save_json_env("DSG_UI_SCHEDULES_CHOSEN", result.get("schedules_chosen", []))
-        _save_json_env("DSG_UI_SCHEDULES_SUB", result.get("schedules_sub", {}))
-        _save_json_env("MINISTER_COLORS", result.get("minister_colors", {}))
+        _save_env({
+            **credentials,
+            "DSG_UI_SELECTIONS": result.get("selections", []),
+            "DSG_UI_BIBLE_READING_LANGS": result.get("bible_reading_langs", []),
+            "DSG_UI_FULL_DSG_LANGS": result.get("full_dsg_langs", []),
+            "DSG_UI_SE_DSG_LANGS": result.get("se_dsg_langs", []),
+            "DSG_UI_SCHEDULES_CHOSEN": result.get("schedules_chosen", []),
+            "DSG_UI_SCHEDULES_SUB": result.get("schedules_sub", {}),
+            "MINISTER_COLORS": result.get("minister_colors", {}),
+        })
         return result
     return saved_data
 
@@ -0,0 +1,134 @@
+"""
+Upload helpers for pushing the local DSG archive to OneDrive via rclone.
+
+`RcloneUploader.upload_files` copies only the given files (the files created or
+modified during this run) using `--files-from` and `--no-traverse`, so rclone
+does not list and compare the whole remote archive. `sync_all` is the old full
+`rclone copy` for when a complete sync is wanted.
+
+`main.py` runs `upload_files` from a pipeline stage while the scrape is still
+going. Point `ONEDRIVE_REMOTE` at a local folder to try it without OneDrive.
+
+When a content store is open for the archive (`src.content_store`), a file whose
+content is already on the remote (or is uploaded earlier in the same batch) is
+made with a server-side `rclone copyto` instead of uploading the bytes again.
+The store's own folder and `.part` files of downloads still in progress are
+never uploaded.
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+
+from src import content_store, fs_snapshot
+from src.payload import PART_SUFFIX
+
+
+class RcloneUploader:
+    """Copies files under `local_root` to the rclone `remote` (e.g. 'onedrive:Documents/DSGs').
+
+    `remote` may also be a plain local directory, which rclone treats as a
+    local remote; handy for trying uploads without OneDrive.
+    """
+
+    def __init__(self, local_root, remote, rclone="rclone", extra_args=None):
+        self.local_root = os.path.abspath(local_root)
+        self.remote = remote
+        self.rclone = rclone
+        self.extra_args = list(extra_args or [])
+        # duplicates made on the remote with `rclone copyto` instead of an upload
+        self.server_side_copies = 0
+        self._lock = threading.Lock()
+
+    def relative_paths(self, paths):
+        """Return sorted, de-duplicated paths relative to `local_root`; files outside it or missing are dropped."""
+        rels = set()
+        for p in paths:
+            full = os.path.abspath(p)
+            if not fs_snapshot.isfile(full):
+                continue
+            try:
+                rel = os.path.relpath(full, self.local_root)
+            except ValueError:
+                # different drive on Windows
+                continue
+            if rel.startswith(os.pardir):
+                continue
+            rel = rel.replace(os.sep, "/")
+            if rel.startswith(content_store.OBJECTS_DIRNAME + "/") or rel.endswith(PART_SUFFIX):
+                continue
+            rels.add(rel)
+        return sorted(rels)
+
+    def _remote_path(self, rel):
+        return self.remote.rstrip("/") + "/" + rel
+
+    def _split_duplicates(self, rels, store):
+        """Split `rels` into (uploads, copies); copies are (source rel, rel) pairs whose content is already sent."""
+        if store is None:
+            return rels, []
+        uploads, copies = [], []
+        first = {}
+        for rel in rels:
+            digest = store.digest_for(rel)
+            source = None
+            if digest is not None:
+                source = store.uploaded_copy(digest, exclude=rel) or first.get(digest)
+            if source is not None:
+                copies.append((source, rel))
+            else:
+                if digest is not None:
+                    first[digest] = rel
+                uploads.append(rel)
+        return uploads, copies
+
+    def _copy_files(self, rels):
+        fd, list_path = tempfile.mkstemp(prefix="dsg-upload-", suffix=".txt")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write("\n".join(rels) + "\n")
+            subprocess.run(
+                [self.rclone, "copy", self.local_root, self.remote,
+                 "--files-from", list_path, "--no-traverse"] + self.extra_args,
+                check=True,
+            )
+        finally:
+            try:
+                os.remove(list_path)
+            except OSError:
+                pass
+
+    def upload_files(self, paths):
+        """Upload only `paths`. Returns the number of files now on the remote (uploaded or copied there)."""
+        rels = self.relative_paths(paths)
+        if not rels:
+            return 0
+        store = content_store.store_for(self.local_root)
+        uploads, copies = self._split_duplicates(rels, store)
+        if uploads:
+            self._copy_files(uploads)
+        retry = []
+        for source, rel in copies:
+            # server-side copy on the remote; rclone falls back to download + upload where the backend cannot
+            result = subprocess.run(
+                [self.rclone, "copyto", self._remote_path(source), self._remote_path(rel)] + self.extra_args,
+            )
+            if result.returncode != 0:
+                retry.append(rel)
+        if retry:
+            self._copy_files(retry)
+        with self._lock:
+            self.server_side_copies += len(copies) - len(retry)
+        if store is not None:
+            store.mark_uploaded(rels)
+        return len(rels)
+
+    def sync_all(self):
+        """Copy the whole local archive (rclone compares every file)."""
+        subprocess.run(
+            [self.rclone, "copy", self.local_root, self.remote, "--progress",
+             "--exclude", "/" + content_store.OBJECTS_DIRNAME + "/**",
+             "--exclude", "*" + PART_SUFFIX] + self.extra_args,
+            check=True,
+        )
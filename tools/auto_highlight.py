@@ -1,28 +1,26 @@
 import os
-import json
 import pathlib
 import sys
-from dotenv import load_dotenv
 
 # Set up paths
 ROOT = pathlib.Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from src.config import get_settings
 from src.pdf_tools.highlighter import highlight_names_in_pdf
 
 def main():
-    load_dotenv()
-    
-    target_pdf = os.getenv("PDF_PATH", "").strip('"')
-    opacity = float(os.getenv("HIGHLIGHT_OPACITY", 0.3))
-    
+    # Settings come from the .env file (read once by src.config)
+    settings = get_settings()
+
+    target_pdf = settings.pdf_path
+    opacity = settings.highlight_opacity
+
     # Load the name/color mapping from .env
-    color_config = os.getenv("MINISTER_COLORS", "{}")
-    try:
-        name_color_map = json.loads(color_config)
-    except Exception as e:
-        print(f"Error parsing MINISTER_COLORS: {e}")
+    name_color_map = settings.minister_colors
+    if not name_color_map:
+        print("Error: MINISTER_COLORS is missing or is not valid JSON in .env")
         return
 
     if not target_pdf or not os.path.exists(target_pdf):
@@ -37,7 +35,7 @@ def main():
     if success:
         print("--- All ministers highlighted in their respective colors! ---")
     else:
-        print("--- Process finished, no names found. ---")
+        print("--- Process finished, nothing new to highlight (no names found, or already highlighted). ---")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
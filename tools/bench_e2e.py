@@ -0,0 +1,146 @@
+"""
+End-to-end benchmark: runs the full `main.main()` flow against the offline
+MiniHQ replay server (tools/replay_server.py) and reports wall time, pages
+per second, MB/s and request round trips.
+
+Needs Edge + msedgedriver like a normal run (the browser runs headless).
+Nothing is sent to Google or OneDrive: the calendar uses the in-memory
+backend and uploads go to a local folder (when rclone is installed).
+
+    python tools/bench_e2e.py               # one cold run
+    python tools/bench_e2e.py --runs 3      # three cold runs (fresh download folder each time)
+    python tools/bench_e2e.py --warm        # plus a run where every file already exists
+    python tools/bench_e2e.py --json bench.json
+
+Compare the numbers before and after a change to catch slowdowns.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+# Set up paths so we can import main.py and the replay server
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.replay_server import FIXTURES_DIR, ReplayServer
+
+# What the benchmark asks the downloader for (same keys as src.ui.get_user_selection)
+BENCH_CHOICES = {
+    "selections": {"english", "audio", "transcript", "full dsg"},
+    "full_dsg_langs": {"english"},
+    "schedules_chosen": {"Serving Schedules", "Youth Schedules", "Seniors Schedules", "NACC Calendars"},
+    "schedules_sub": {},
+    "minister_colors": {},
+    "search_name": "Pr. Replay Benchmark",
+}
+
+
+def configure_environment(server, work_dir):
+    """Point the downloader at the replay server and a scratch folder (before main.py is imported)."""
+    site = server.site.manifest
+    os.environ.update({
+        "URL": server.url,
+        "USERNAME": site.get("username", ""),
+        "PASSWORD": site.get("password", ""),
+        "DSGS_DIR": os.path.join(work_dir, "DSGs"),
+        "ONEDRIVE_REMOTE": os.path.join(work_dir, "remote"),
+        "CALENDAR_BACKEND": "memory",
+        "CALENDAR_STATE_DB": os.path.join(work_dir, "calendar_state.db"),
+        "SEARCH_NAME": BENCH_CHOICES["search_name"],
+        "HEADLESS_DRIVER": "true",
+        "USE_UI": "false",
+    })
+
+
+def folder_size(path):
+    count = 0
+    total = 0
+    for dirpath, _dirs, files in os.walk(path):
+        for name in files:
+            count += 1
+            total += os.path.getsize(os.path.join(dirpath, name))
+    return count, total
+
+
+def run_once(main_module, server, dsgs_dir, label):
+    """Run main.main() once and return a dict of measurements."""
+    server.reset_stats()
+    started = time.perf_counter()
+    main_module.main(user_choices={k: (set(v) if isinstance(v, set) else v) for k, v in BENCH_CHOICES.items()})
+    wall = time.perf_counter() - started
+    stats = server.stats()
+    files, size = folder_size(dsgs_dir)
+    return {
+        "run": label,
+        "wall_s": round(wall, 3),
+        "requests": stats["requests"],
+        "pages": stats["pages"],
+        "pages_per_s": round(stats["pages"] / wall, 2) if wall else 0.0,
+        "files_served": stats["files"],
+        "mb_served": round(stats["file_bytes"] / 1e6, 2),
+        "mb_per_s": round(stats["file_bytes"] / 1e6 / wall, 2) if wall else 0.0,
+        "denied": stats["denied"],
+        "redirects": stats["redirects"],
+        "files_on_disk": files,
+        "mb_on_disk": round(size / 1e6, 2),
+    }
+
+
+def print_table(results):
+    cols = ["run", "wall_s", "requests", "pages", "pages_per_s", "files_served", "mb_served", "mb_per_s", "denied", "files_on_disk"]
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in cols}
+    print("\n--- End-to-end benchmark ---")
+    print("  ".join(c.rjust(widths[c]) for c in cols))
+    for r in results:
+        print("  ".join(str(r[c]).rjust(widths[c]) for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main.main() against the offline MiniHQ replay.")
+    parser.add_argument("--runs", type=int, default=1, help="number of cold runs (empty download folder)")
+    parser.add_argument("--warm", action="store_true", help="add a final run with all files already downloaded")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    parser.add_argument("--latency-ms", type=int, default=0, help="delay the replay server adds to each request")
+    parser.add_argument("--login-redirect", action="store_true", help="signed-out file requests get the sign-in page")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch folder")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="dsg-bench-")
+    server = ReplayServer(args.fixtures, latency_ms=args.latency_ms, login_redirect=args.login_redirect).start()
+    print(f"Replay server: {server.url}  scratch folder: {work_dir}")
+    configure_environment(server, work_dir)
+
+    # imported only now, because src.config reads the environment on import
+    import main as main_module
+
+    dsgs_dir = os.environ["DSGS_DIR"]
+    results = []
+    try:
+        for i in range(max(1, args.runs)):
+            shutil.rmtree(dsgs_dir, ignore_errors=True)
+            os.makedirs(dsgs_dir, exist_ok=True)
+            results.append(run_once(main_module, server, dsgs_dir, f"cold-{i + 1}"))
+        if args.warm:
+            results.append(run_once(main_module, server, dsgs_dir, "warm"))
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
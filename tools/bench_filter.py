@@ -0,0 +1,363 @@
+"""
+Microbenchmark for the DSG link filter.
+
+Filters synthetic month pages (10k links by default) for several user
+selections with:
+- `legacy_filter`: a copy of `filter_accordion_items_by_selection` as it was
+  before links were classified once and the selection compiled to a rule table
+- the current `filter_accordion_items_by_selection` with the link cache
+  cleared first ("cold"; this includes classifying each link, which the
+  destination mapping then reuses)
+- the compiled `LinkSelection` alone, on links that are already classified
+
+and checks that every selection keeps exactly the same links as the legacy code.
+
+    python tools/bench_filter.py
+    python tools/bench_filter.py --links 50000 --repeat 5
+
+Exits with status 1 if any result differs.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import pathlib
+import time
+
+# Set up paths so the src package can be imported
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.actions import filter_accordion_items_by_selection
+from src.links import LinkSelection, classify_link
+
+# Selections to compare (same keys as src.ui.get_user_selection)
+SCENARIOS = {
+    "nothing selected": {},
+    "english": {"selections": {"English"}},
+    "english+french": {"selections": {"English", "French"}},
+    "audio+transcript": {"selections": {"Audio", "Transcript"}},
+    "english+full dsg": {"selections": {"English", "Full DSG"}, "full_dsg_langs": ["English"]},
+    "french+references": {"selections": {"French", "Bible References"}},
+    "full dsg+bible references": {
+        "selections": {"Full DSG", "Bible References"},
+        "full_dsg_langs": ["German", "Spanish"],
+        "bible_references_langs": ["English"],
+    },
+    "everything": {
+        "selections": {
+            "English", "French", "Audio", "Transcript", "References", "Bible References",
+            "Bible Reading", "Full DSG", "Special Edition DSG", "Foreword",
+        },
+        "bible_reading_langs": ["English", "Italian"],
+        "se_dsg_langs": ["French"],
+        "foreword_langs": ["Portuguese"],
+    },
+}
+
+# pieces the synthetic hrefs are made from, shaped like the links on MiniHQ
+FOLDERS = [
+    "/common/Uploaded%20files/Divine%20Service%20Prep/",
+    "/common/Uploaded%20files/DSG/English/",
+    "/common/Uploaded%20files/DSG/French/",
+    "/common/Uploaded%20files/Full%20DSG/",
+    "/common/Uploaded%20files/SE%20DSG/",
+    "/common/Uploaded%20files/Document%20Library/",
+    "/common/Uploaded%20files/Audio%20DSG/",
+    "/MiniHQ/Schedules/Serving%20Schedules/",
+]
+KINDS = [
+    "DSG", "Audio", "Transcript", "Bible-Reading", "Bible%20Reading", "Bible-References",
+    "Full-DSG", "SE-DSG", "Foreword", "Youth-DSG", "Childrens-Service", "Serving-Schedule",
+]
+LANG_PARTS = ["-en", "-fr", "_de", ".it", "-pt", "-ru", "-es", "-English", "-French", "-German", "-Spanish", ""]
+EXTS = [".pdf", ".mp3", ".docx"]
+
+
+def make_pages(count, seed=7, per_page=40):
+    """Return month pages shaped like extract_accordion_items() output: [(header, [(text, href), ...]), ...]."""
+    rng = random.Random(seed)
+    links = []
+    for i in range(count):
+        day = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        href = (
+            "https://naccanada.org"
+            + rng.choice(FOLDERS)
+            + f"{day}-{rng.choice(KINDS)}{rng.choice(LANG_PARTS)}-{i}{rng.choice(EXTS)}"
+        )
+        links.append((rng.choice(["English", "French", "Audio", "Transcript", "Download"]), href))
+    return [
+        (f"Divine Service {n // per_page + 1}", links[n:n + per_page])
+        for n in range(0, len(links), per_page)
+    ]
+
+
+# -----------------------------
+# legacy copy (do not edit): the reference the new filter must match
+# -----------------------------
+def legacy_filter(items, user_choices):
+    """Filter accordion items according to the `user_choices` dict from `src.ui.get_user_selection()`.
+
+    - `items` is list of (header, [ (link_text, href), ... ])
+    - `user_choices` is the dict with keys: 'selections', 'bible_reading_langs', 'full_dsg_langs', 'se_dsg_langs'
+
+    Returns filtered list of (header, [(text, href), ...]) where empty-headers or items with no links are omitted.
+    """
+    import os
+
+    selections = set(user_choices.get('selections') or [])
+    # normalize
+    selections = {s.lower() for s in selections}
+
+    english_selected = 'english' in selections
+    french_selected = 'french' in selections
+
+    # per-type language preferences (lowercase names)
+    br_langs = {l.lower() for l in (user_choices.get('bible_reading_langs') or [])}
+    full_langs = {l.lower() for l in (user_choices.get('full_dsg_langs') or [])}
+    se_langs = {l.lower() for l in (user_choices.get('se_dsg_langs') or [])}
+    foreword_langs = {l.lower() for l in (user_choices.get('foreword_langs') or [])}
+    bibref_langs = {l.lower() for l in (user_choices.get('bible_references_langs') or [])}
+
+    # detect which specific "type" selections are present
+    type_selections = set()
+    for key in (
+        'audio',
+        'transcript',
+        'references',
+        'bible references',
+        'bible reading',
+        'full dsg',
+        'special edition dsg',
+        'foreword',
+    ):
+        if key in selections:
+            type_selections.add(key)
+
+    def detect_flags(href):
+        h = (href or '').lower()
+        fname = os.path.basename(h)
+        flags = {}
+        # detect language codes in path or filename (en, fr, de, it, pt, ru, es)
+        import re as _re
+        codes = set()
+        if '/english/' in h:
+            codes.add('en')
+        if '/french/' in h:
+            codes.add('fr')
+        # look for language codes in filename or path segments: -en., _en., .en., /en/
+        m = _re.search(r'(?:(?:-|_|\.|/))(en|fr|de|it|pt|ru|es)(?:\.|_|/|-|$)', h)
+        if m:
+            codes.add(m.group(1))
+        # also detect full language names in the path (English, French, German, etc.)
+        names = set()
+        for name, code in (('english', 'en'), ('french', 'fr'), ('german', 'de'), ('italian', 'it'), ('portuguese', 'pt'), ('russian', 'ru'), ('spanish', 'es')):
+            if name in h or name in fname.lower():
+                names.add(code)
+                codes.add(code)
+        flags['codes'] = codes
+        flags['lang_names'] = names
+        flags['english'] = 'en' in codes
+        flags['french'] = 'fr' in codes
+        flags['audio'] = 'audio' in h or 'audio%20' in h or '-audio-' in fname
+        flags['transcript'] = 'transcript' in h
+        flags['bible_references'] = (
+            ('bible' in h and 'reference' in h) or 'bible-references' in fname or 'bible_references' in fname
+        )
+        flags['bible_reading'] = 'bible-reading' in h or 'bible%20reading' in h or 'bible-reading' in fname
+        flags['full_dsg'] = ('full' in h and 'dsg' in h) or 'full%20dsg' in h or 'full-dsg' in fname
+        flags['se_dsg'] = (
+            'se%20dsg' in h
+            or 'se-dsg' in h
+            or ('/se%20' in h and 'dsg' in h)
+            or ('/document%20library' in h and 'se' in h)
+        )
+        flags['foreword'] = 'foreword' in h or 'foreword' in fname
+        # detect serving schedules / schedule PDFs
+        flags['serving'] = 'serving schedules' in h or '/serving schedules/' in h or 'serving schedule' in h or 'serving schedule' in fname or 'serving schedules' in fname or 'serving' in h
+        return flags
+
+    def link_matches(href):
+        flags = detect_flags(href)
+
+        # language selection handling
+        langs_selected = english_selected or french_selected
+
+        # If type selections exist (e.g., audio/transcript/full dsg/se dsg/etc.) then require type match
+        has_type_selection = len(type_selections) > 0
+
+        # map type selection keys to checks
+        def lang_ok_for_link(flags, per_langs):
+            # per_langs is a set of lowercase language names; if empty -> no restriction
+            lang_map = {
+                'english': 'en',
+                'french': 'fr',
+                'german': 'de',
+                'italian': 'it',
+                'portuguese': 'pt',
+                'russian': 'ru',
+                'spanish': 'es',
+            }
+            req_codes = set()
+            for ln in (per_langs or []):
+                code = lang_map.get(ln.lower())
+                if code:
+                    req_codes.add(code)
+            if req_codes:
+                # match by detected codes OR by language name presence
+                if len(flags.get('codes', set()) & req_codes) > 0:
+                    return True
+                # also check lang_names (from literal name matches)
+                if len(flags.get('lang_names', set()) & req_codes) > 0:
+                    return True
+                return False
+            # fall back to global English/French selections
+            glob_codes = set()
+            if english_selected:
+                glob_codes.add('en')
+            if french_selected:
+                glob_codes.add('fr')
+            if glob_codes:
+                return len(flags.get('codes', set()) & glob_codes) > 0
+            return True
+
+        def type_check():
+            # if any of the type selections match, return True (respecting per-type language choices)
+            for t in type_selections:
+                if t == 'audio' and flags.get('audio'):
+                    if lang_ok_for_link(flags, set()):
+                        return True
+                if t == 'transcript' and flags.get('transcript'):
+                    if lang_ok_for_link(flags, set()):
+                        return True
+                if t in ('references', 'bible references') and flags.get('bible_references'):
+                    # if this link is also a Full DSG item, require Full DSG to be selected as well
+                    if flags.get('full_dsg') and 'full dsg' not in type_selections:
+                        continue
+                    if lang_ok_for_link(flags, bibref_langs):
+                        return True
+                if t == 'bible reading' and flags.get('bible_reading'):
+                    if lang_ok_for_link(flags, br_langs):
+                        return True
+                if t == 'full dsg' and flags.get('full_dsg'):
+                    # if this link is a bible reference inside Full DSG, only include if bible references also selected
+                    if flags.get('bible_references') and 'bible references' not in type_selections:
+                        continue
+                    if lang_ok_for_link(flags, full_langs):
+                        return True
+                if t == 'special edition dsg' and flags.get('se_dsg'):
+                    if lang_ok_for_link(flags, se_langs):
+                        return True
+                if t == 'foreword' and flags.get('foreword'):
+                    if lang_ok_for_link(flags, foreword_langs):
+                        return True
+            return False
+
+        # If languages are explicitly selected
+        if langs_selected:
+            # standard DSG (language file) is a link that is language-specific but not any special type
+            is_standard = (flags.get('english') or flags.get('french')) and not (
+                flags.get('audio')
+                or flags.get('transcript')
+                or flags.get('bible_references')
+                or flags.get('bible_reading')
+                or flags.get('full_dsg')
+                or flags.get('se_dsg')
+                or flags.get('foreword')
+            )
+            if has_type_selection:
+                # include standard language files only if they match the selected global language(s)
+                include_standard = False
+                if english_selected and flags.get('english'):
+                    include_standard = True
+                if french_selected and flags.get('french'):
+                    include_standard = include_standard or True if flags.get('french') else include_standard
+                # include standard if it matches global languages, or include any matching types
+                return (is_standard and include_standard) or type_check()
+            # no type selection: include only standard language files
+            # require the standard file to match the selected global language(s)
+            if english_selected and flags.get('english'):
+                return is_standard
+            if french_selected and flags.get('french'):
+                return is_standard
+            return False
+
+        # No explicit language selection
+        if has_type_selection:
+            return type_check()
+
+        # No selections at all — default to include everything
+        return True
+
+    filtered = []
+    for hdr, links in items:
+        kept = []
+        for t, h in links:
+            if not h:
+                continue
+            try:
+                if link_matches(h):
+                    kept.append((t, h))
+            except Exception:
+                # if detection fails, be conservative and skip
+                continue
+        if kept:
+            filtered.append((hdr, kept))
+    return filtered
+
+
+def timed(func, repeat):
+    """Median seconds of `repeat` runs of `func` and its last result."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compiled DSG link filter with the legacy one.")
+    parser.add_argument("--links", type=int, default=10000, help="synthetic links to filter")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    pages = make_pages(args.links, args.seed)
+    all_links = [h for _hdr, links in pages for _t, h in links]
+    repeat = max(1, args.repeat)
+
+    def run_current(choices):
+        classify_link.cache_clear()
+        selection = LinkSelection(choices)
+        return filter_accordion_items_by_selection(pages, choices, selection=selection)
+
+    infos = [classify_link(h) for h in all_links]
+
+    failed = False
+    print(f"{len(all_links)} links, median of {repeat} run(s)")
+    print(f"{'selection':<28} {'kept':>6} {'legacy ms':>10} {'cold ms':>11} {'rules ms':>9}  check")
+    for name, choices in SCENARIOS.items():
+        legacy_s, expected = timed(lambda: legacy_filter(pages, choices), repeat)
+        current_s, got = timed(lambda: run_current(choices), repeat)
+        selection = LinkSelection(choices)
+        rules_s, _ = timed(lambda: [selection.matches(info) for info in infos], repeat)
+        ok = got == expected
+        failed = failed or not ok
+        kept = sum(len(links) for _hdr, links in got)
+        print(
+            f"{name:<28} {kept:>6} {legacy_s * 1000:>10.1f} {current_s * 1000:>11.1f} "
+            f"{rules_s * 1000:>9.1f}  {'same' if ok else 'DIFFERENT'}"
+        )
+
+    if failed:
+        print("\nFilter results differ from the legacy filter")
+        sys.exit(1)
+    print("\nAll selections match the legacy filter")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Parsing and highlighting benchmark over the synthetic schedule corpus.
+
+Times, for every PDF made by tools/make_schedule_pdfs.py:
+- `extract_text_from_pdf` (pdfplumber table extraction)
+- `process_pdf` (extraction + grid parsing + assignment matching, no calendar sync)
+- `highlight_names_in_pdf` (PyMuPDF search + annotations, on a scratch copy)
+
+and checks that `process_pdf` finds the planted name as often as the
+manifest says.
+
+    python tools/bench_parsing.py                 # builds the corpus if needed, 3 repeats
+    python tools/bench_parsing.py --repeat 10 --json parsing.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Set up paths so the src and tools packages can be imported
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from tools.make_schedule_pdfs import DEFAULT_OUT, build_corpus
+from src.actions import extract_text_from_pdf
+from src.pdf_tools.highlighter import highlight_names_in_pdf
+from tools.read_schedule import process_pdf
+
+HIGHLIGHT_COLORS = {"Pr. Replay Benchmark": [1.0, 1.0, 0.0], "Ev. M. Weber": [0.6, 0.9, 1.0], "Dc. J. Taylor": [1.0, 0.7, 0.7]}
+
+
+def median_ms(func, repeat):
+    """Run `func` `repeat` times and return (median milliseconds, last result)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), result
+
+
+def bench_file(path, target, expected, repeat, scratch):
+    extract_ms, _ = median_ms(lambda: extract_text_from_pdf(path), repeat)
+
+    # process_pdf prints the whole schedule table; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        process_ms, matches = median_ms(lambda: process_pdf(path, target, sync=False), repeat)
+
+    # highlighting rewrites the file, so work on a fresh copy each time
+    def highlight_copy():
+        copy = os.path.join(scratch, os.path.basename(path))
+        shutil.copyfile(path, copy)
+        return highlight_names_in_pdf(copy, HIGHLIGHT_COLORS, 0.5)
+
+    highlight_ms, _ = median_ms(highlight_copy, repeat)
+    return {
+        "extract_ms": round(extract_ms, 1),
+        "process_ms": round(process_ms, 1),
+        "highlight_ms": round(highlight_ms, 1),
+        "matches": len(matches),
+        "expected": expected,
+        "ok": len(matches) == expected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF parsing and highlighting on synthetic schedules.")
+    parser.add_argument("--corpus", default=str(DEFAULT_OUT), help="folder with the PDFs and manifest.json")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate the corpus first")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (median is reported)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    manifest_path = os.path.join(args.corpus, "manifest.json")
+    if args.rebuild or not os.path.exists(manifest_path):
+        build_corpus(args.corpus)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    results = []
+    scratch = tempfile.mkdtemp(prefix="dsg-bench-parse-")
+    try:
+        for entry in manifest["files"]:
+            path = os.path.join(args.corpus, entry["file"])
+            row = {
+                "file": entry["file"],
+                "grid": f"{entry['locations']}x{entry['dates']}",
+                "pages": entry["pages"],
+                "kb": round(entry["bytes"] / 1024),
+            }
+            row.update(bench_file(path, manifest["target"], entry["target_count"], max(1, args.repeat), scratch))
+            results.append(row)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print("\n--- Parsing benchmark (median ms) ---")
+    print(f"{'file':<45} {'grid':>7} {'pages':>5} {'KB':>5} {'extract':>8} {'process':>8} {'highlight':>9}  matches")
+    for r in results:
+        check = "ok" if r["ok"] else f"MISMATCH (expected {r['expected']})"
+        print(
+            f"{r['file']:<45} {r['grid']:>7} {r['pages']:>5} {r['kb']:>5} "
+            f"{r['extract_ms']:>8.1f} {r['process_ms']:>8.1f} {r['highlight_ms']:>9.1f}  {r['matches']} {check}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if not all(r["ok"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
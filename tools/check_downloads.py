@@ -0,0 +1,178 @@
+"""
+Check `save_url_to_path` against the offline replay site (tools/replay_server.py).
+
+Downloads the replay site's files three times, with the per-host limiter and
+the bandwidth limiter switched on like in a normal run:
+
+- signed in: every file must be saved with one request (one limiter slot,
+  one request token) and no limiter errors
+- signed out: every file must fail as 'auth' without leaving the file or a
+  `.part` behind, and the signed-out answers must not shrink the window
+- signed out with a re-auth callback: one sign-in, then every file is saved
+
+    python tools/check_downloads.py                   # signed-out files get a 401
+    python tools/check_downloads.py --login-redirect  # ... the sign-in page, like the live site
+    python tools/check_downloads.py --files 20
+
+Exits with status 1 when any check fails.
+"""
+
+import argparse
+import http.client
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import threading
+from urllib.parse import quote, urlencode, urlsplit
+
+# Set up paths so the src and tools packages can be imported
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.actions import save_url_to_path
+from src.payload import PART_SUFFIX
+from src.ratelimit import AdaptiveLimiter, BandwidthLimiter
+from src.retry import RetryPolicy
+from tools.replay_server import FIXTURES_DIR, SIGN_IN_PATH, ReplayServer
+
+WORKERS = 4
+
+
+def sign_in(server):
+    """Post the replay credentials and return the cookies like `driver.get_cookies()` would."""
+    site = server.site.manifest
+    parts = urlsplit(server.url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    body = urlencode({"signInUserName": site.get("username", ""), "signInPassword": site.get("password", "")})
+    conn.request("POST", SIGN_IN_PATH, body, {"Content-Type": "application/x-www-form-urlencoded"})
+    resp = conn.getresponse()
+    resp.read()
+    cookies = []
+    for header in resp.headers.get_all("Set-Cookie") or []:
+        name, _, rest = header.partition("=")
+        cookies.append({"name": name.strip(), "value": rest.split(";", 1)[0]})
+    conn.close()
+    return cookies
+
+
+def download_all(server, urls, folder, cookies, reauth=None):
+    """Download `urls` with WORKERS threads; returns (results, limiter, throttle)."""
+    limiter = AdaptiveLimiter(initial=WORKERS, maximum=WORKERS * 2)
+    # high enough never to wait, but every request still takes a token
+    throttle = BandwidthLimiter(0, 10000)
+    results = {}
+    lock = threading.Lock()
+    todo = list(enumerate(urls))
+
+    def worker():
+        while True:
+            with lock:
+                if not todo:
+                    return
+                i, url = todo.pop()
+            name = f"{i:03d}-{os.path.basename(urlsplit(url).path).replace('%20', ' ')}"
+            ok, reason = save_url_to_path(
+                url, folder, name, cookies=cookies, limiter=limiter, policy=RetryPolicy(2, base=0.01),
+                throttle=throttle, reauth=reauth,
+            )
+            with lock:
+                results[name] = (ok, reason)
+
+    threads = [threading.Thread(target=worker) for _ in range(WORKERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, limiter, throttle
+
+
+def check(label, server, urls, folder, cookies, expect_ok, reauth=None):
+    """Run one scenario and return the list of problems found."""
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    server.reset_stats()
+    results, limiter, throttle = download_all(server, urls, folder, cookies, reauth)
+    stats = server.stats()
+    host, window, low, high, reqs, throttled, errors, avg = limiter.stats()[0]
+    left = sorted(os.listdir(folder))
+    problems = []
+
+    saved = sum(1 for ok, _ in results.values() if ok)
+    if expect_ok and saved != len(urls):
+        bad = [f"{name}: {reason}" for name, (ok, reason) in sorted(results.items()) if not ok]
+        problems.append(f"{len(urls) - saved} file(s) not saved, e.g. {bad[0]}")
+    if not expect_ok:
+        if saved:
+            problems.append(f"{saved} file(s) saved while signed out")
+        wrong = [reason for ok, reason in results.values() if not ok and not reason.startswith("auth:")]
+        if wrong:
+            problems.append(f"{len(wrong)} failure(s) not reported as auth, e.g. {wrong[0]}")
+    parts = [name for name in left if name.endswith(PART_SUFFIX)]
+    if parts:
+        problems.append(f"{len(parts)} .part file(s) left behind")
+    if len(left) - len(parts) != saved:
+        problems.append(f"{len(left) - len(parts)} file(s) on disk for {saved} saved")
+    if errors:
+        problems.append(f"limiter counted {errors} error(s)")
+    if low < WORKERS:
+        problems.append(f"limiter window dropped to {low:.1f}")
+    requests_made = sum(row[2] for row in throttle.stats())
+    expected = len(urls) * (2 if reauth is not None else 1)
+    if requests_made > expected:
+        problems.append(f"{requests_made} request token(s) for {len(urls)} file(s)")
+
+    print(
+        f"{label:<22} saved {saved:>3}/{len(urls):<3}  server requests {stats['requests']:>4}  "
+        f"tokens {requests_made:>4}  denied {stats['denied']:>3}  logins {stats['logins']:>2}  "
+        f"window min {low:.1f}  errors {errors}"
+    )
+    for problem in problems:
+        print(f"    FAIL: {problem}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check downloads, payload checks and re-auth against the replay site.")
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR))
+    parser.add_argument("--login-redirect", action="store_true", help="signed-out file requests get the sign-in page")
+    parser.add_argument("--files", type=int, default=0, help="only the first N files (default: all)")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixtures, login_redirect=args.login_redirect).start()
+    base = server.url.rstrip("/")
+    urls = [base + quote(path) for path in sorted(server.site.files)]
+    if args.files:
+        urls = urls[:args.files]
+    work_dir = tempfile.mkdtemp(prefix="dsg-check-")
+    folder = os.path.join(work_dir, "DSGs")
+    stale = [{"name": ".ASPXAUTH", "value": "expired"}]
+    signed_in = []
+    lock = threading.Lock()
+
+    def reauth(_stale):
+        # the real run signs in with the browser on the main thread (src/session.py)
+        with lock:
+            if not signed_in:
+                signed_in.extend(sign_in(server))
+        return signed_in
+
+    problems = []
+    try:
+        print(f"Replay server {server.url} ({'sign-in redirect' if args.login_redirect else '401'} when signed out)")
+        problems += check("signed in", server, urls, folder, sign_in(server), expect_ok=True)
+        problems += check("signed out", server, urls, folder, stale, expect_ok=False)
+        problems += check("signed out + re-auth", server, urls, folder, stale, expect_ok=True, reauth=reauth)
+    finally:
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{len(problems)} problem(s)")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
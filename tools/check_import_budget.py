@@ -0,0 +1,141 @@
+"""
+Import-time budget check for the entry points.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for
+each entry point and fails when:
+- the module's cumulative import time is over its budget, or
+- it pulls in a heavy library that should only load when it is used
+  (selenium, PyMuPDF, pdfplumber, the GUI toolkit, the Google client, ...)
+
+    python tools/check_import_budget.py
+    python tools/check_import_budget.py --repeat 5 --scale 2   # slower machine: double the budgets
+    python tools/check_import_budget.py --verbose              # show the slowest imports per entry point
+
+Exits with status 1 when any entry point is over budget.
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+# libraries that must not be loaded just by importing an entry point
+HEAVY = (
+    "selenium",
+    "webdriver_manager",
+    "fitz",
+    "pymupdf",
+    "pdfplumber",
+    "pdfminer",
+    "customtkinter",
+    "tkinter",
+    "googleapiclient",
+    "google_auth_oauthlib",
+    "google_auth_httplib2",
+    "pytz",
+)
+
+# entry point module -> cumulative import budget in milliseconds
+BUDGETS_MS = {
+    "src.config": 80,
+    "src.actions": 80,
+    "tools.sync_calendar": 150,
+    "tools.read_schedule": 250,
+    "main": 200,
+}
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module):
+    """Return (cumulative microseconds, {imported module: (self us, cumulative us)}) for one fresh import."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["(no output)"]
+        raise RuntimeError(f"import {module} failed: {tail[0]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3))))
+    # a module's own imports are listed just before it, indented deeper;
+    # walk back from the entry point's line to skip interpreter start-up imports
+    for end in range(len(rows) - 1, -1, -1):
+        if rows[end][0] == module:
+            break
+    else:
+        return 0, {}
+    depth = rows[end][3]
+    imported = {module: (rows[end][1], rows[end][2])}
+    start = end - 1
+    while start >= 0 and rows[start][3] > depth:
+        name, self_us, cum_us, _indent = rows[start]
+        imported[name] = (self_us, cum_us)
+        start -= 1
+    # parent packages (e.g. 'src' for 'src.actions') are imported first, at the same depth
+    while start >= 0 and module.startswith(rows[start][0] + "."):
+        depth = rows[start][3]
+        imported[rows[start][0]] = (rows[start][1], rows[start][2])
+        start -= 1
+        while start >= 0 and rows[start][3] > depth:
+            name, self_us, cum_us, _indent = rows[start]
+            imported[name] = (self_us, cum_us)
+            start -= 1
+    total = sum(cum for name, (self_us, cum) in imported.items() if name == module or module.startswith(name + "."))
+    return total, imported
+
+
+def heavy_modules(imported):
+    return sorted({name.split(".")[0] for name in imported if name.split(".")[0] in HEAVY})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import time and heavy imports of the entry points.")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh imports per entry point (fastest is used)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget (e.g. 2 on slow machines)")
+    parser.add_argument("--verbose", action="store_true", help="list the slowest imports of each entry point")
+    parser.add_argument("modules", nargs="*", help="entry points to check (default: all)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'entry point':<22} {'import ms':>10} {'budget ms':>10}  status")
+    for module in args.modules or list(BUDGETS_MS):
+        budget = BUDGETS_MS.get(module, 200) * args.scale
+        try:
+            runs = [measure(module) for _ in range(max(1, args.repeat))]
+        except RuntimeError as e:
+            print(f"{module:<22} {'-':>10} {budget:>10.0f}  ERROR: {e}")
+            failed = True
+            continue
+        total_us, imported = min(runs, key=lambda r: r[0])
+        heavy = heavy_modules(imported)
+        ms = total_us / 1000
+        status = []
+        if ms > budget:
+            status.append("OVER BUDGET")
+        if heavy:
+            status.append("loads " + ", ".join(heavy))
+        failed = failed or bool(status)
+        print(f"{module:<22} {ms:>10.1f} {budget:>10.0f}  {'; '.join(status) or 'ok'}")
+        if args.verbose:
+            slowest = sorted(imported.items(), key=lambda kv: kv[1][0], reverse=True)[:10]
+            for name, (self_us, cum_us) in slowest:
+                print(f"    {name:<40} self {self_us / 1000:>7.1f} ms   cumulative {cum_us / 1000:>7.1f} ms")
+
+    if failed:
+        print("\nImport budget check FAILED")
+        sys.exit(1)
+    print("\nImport budget check passed")
+
+
+if __name__ == "__main__":
+    main()
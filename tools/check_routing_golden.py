@@ -0,0 +1,188 @@
+"""
+Golden-corpus check for `map_link_to_destination` (folder and file naming).
+
+tools/fixtures/routing/golden.json holds link shapes (href, link text,
+section header) with the folder and filename the naming code produced when
+the corpus was recorded. The check maps every case again and fails on any
+difference, so a refactor of the routing rules cannot silently rename files.
+
+The corpus is made of:
+- every link on the replay site's month pages (tools/fixtures/minihq)
+- hand-written shapes seen on MiniHQ (DSG, audio, transcripts, full/special
+  edition DSGs, foreword, youth, children, schedules, NACC calendars, ...)
+- seeded synthetic combinations of those pieces
+
+    python tools/check_routing_golden.py            # compare with the golden file
+    python tools/check_routing_golden.py --bench    # also print links/s (cold and cached)
+    python tools/check_routing_golden.py --write    # re-record (only after an intended naming change)
+
+Exits with status 1 when any case differs.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import random
+import sys
+import time
+
+# Set up paths so the src and tools packages can be imported
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src import actions
+from src.links import classify_link
+
+GOLDEN_PATH = ROOT / "tools" / "fixtures" / "routing" / "golden.json"
+BASE_DIR = "DSGS"
+SITE = "https://naccanada.org"
+
+# (href path, link text, header) shapes seen on the live site and a few odd ones
+EXTRA_SHAPES = [
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/English/DSG-2026-01-04-en.pdf", "English", "Sunday, January 4, 2026"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/French/DSG-2026-01-04-fr.pdf", "French", "Sunday, January 4, 2026"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/DSG-2026-01-11.pdf", "Download", "Sunday, January 11, 2026"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/German/DSG-2026-02-01-de.pdf", "German", "Divine Service Prep"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/English/Audio/DSG-2026-01-04-Audio-en.mp3", "Audio (English)", "Sunday, January 4, 2026"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/English/Transcripts/DSG-2026-01-04-Transcript-en.pdf", "Transcript (English)", ""),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Full%20DSG/January%202026%20Full%20DSG%20English.pdf", "English", "Full DSG"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Full%20DSG/Full-DSG-2026-02.pdf", "French", "Full DSG"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/SE%20DSG/Special%20Edition%20DSG%20March%202026%20Spanish.pdf", "Spanish", "Special Edition"),
+    ("/common/Uploaded%20files/Document%20Library/se-dsg-2026_04-it.pdf", "Italian", "Special Edition DSG"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Foreword/Foreword%20February%202026%20English.pdf", "English", "Foreword"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Forward-2026.pdf", "Forward", "Forward"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Youth/Youth%20DSG%20January%202026%20French.pdf", "French", "Youth"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Children/Childrens%20Service%202026-05%20Portuguese.pdf", "Portuguese", "Children"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Bible%20References/Bible-References-2026-01-18-en.pdf", "Bible References", ""),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/Bible-Reading-2026-01-18-ru.pdf", "Bible Reading", "Divine Service Prep"),
+    ("/common/Uploaded%20files/Divine%20Service%20Prep/2026-02-30-en.pdf", "English", "Divine Service Prep"),
+    ("/common/Uploaded%20files/Serving%20Schedules/March%202026/Kitchener%20East%20Serving%20Schedule.pdf", "Kitchener East", "Serving Schedules"),
+    ("/common/Uploaded%20files/Serving%20Schedules/Waterloo%20Serving%20Schedule.pdf", "Waterloo 2026-03", "District Serving Schedules"),
+    ("/common/Uploaded%20files/Serving%20Schedules/London%20Serving%20Schedule.pdf", "London", "Serving Schedules"),
+    ("/common/Uploaded%20files/Serving%20Schedules/2026/Guelph%20Serving%20Schedule.pdf", "Guelph/Fergus", "Serving Schedules"),
+    ("/common/Uploaded%20files/Youth%20Schedules/April%202026/SWO%20Youth%20Serving%20Schedule.pdf", "Southwestern Ontario", "Youth Schedules"),
+    ("/common/Uploaded%20files/Seniors%20Schedules/April%202026/London%20Seniors%20Schedule.pdf", "London", "Seniors Schedules"),
+    ("/common/Uploaded%20files/Seniors/Seniors-2026_06.pdf", "  London\\West  ", "Seniors"),
+    ("/common/Uploaded%20files/NACC%20Calendars/2026/May%202026%20NACC%20Calendar%20National.pdf", "National", "NACC Calendars"),
+    ("/common/Uploaded%20files/NACC%20Calendars/2026/NACC-Calendar-Districts.pdf", "Districts", "NACC Calendars"),
+    ("/common/Uploaded%20files/Calendars/calendar.pdf", "National", "NACC Calendars"),
+    ("/common/Uploaded%20files/misc/notice.pdf", "Notice", "Announcements"),
+    ("/common/Uploaded%20files/misc/", "", ""),
+    ("", "Empty link", "Divine Service Prep"),
+]
+
+# pieces the synthetic cases are made from
+PARTS = [
+    "/common/Uploaded%20files/", "Divine%20Service%20Prep/", "/english/", "/french/", "Full%20DSG/", "SE%20DSG/",
+    "Document%20Library/", "Audio%20", "Transcript", "Bible-Reading", "bible%20reading", "Bible%20References",
+    "Foreword", "Youth", "Seniors", "Serving%20Schedules/", "Children", "NACC", "-en.", "_fr.", ".de.", "/it/",
+    "2026-01-04", "2025-12-28", "2026-13-01", "January%202026", "March 2026", "2026_02", "2025.11", "German",
+    "Spanish", "special edition", "se-dsg", "dsg", "schedule", "Kitchener", "%46ull", "/se%20", "x",
+]
+EXTS = [".pdf", ".mp3", ".docx", ""]
+TEXTS = ["Kitchener", "English", "French", "January 2026", "Audio", "", None, "Waterloo 2026-03", "Full DSG", "a/b"]
+HEADERS = [
+    "Divine Service Prep", "Serving Schedules", "Youth Schedules", "Seniors", "NACC Calendars", "Foreword",
+    "Forward", "", None, "Children Service February 2026", "Sunday, March 1, 2026",
+]
+
+
+def build_corpus(synthetic=600, seed=43):
+    """Return [(href, link text, header), ...] covering the link shapes the naming code handles."""
+    from tools.replay_server import ReplaySite
+
+    cases = []
+    site = ReplaySite()
+    for pages in (site.dsg_pages, site.schedule_pages):
+        for sections in pages.values():
+            for header, links in sections:
+                for text, href in links:
+                    cases.append((SITE + href, text, header))
+    cases.extend((SITE + href if href else href, text, header) for href, text, header in EXTRA_SHAPES)
+    rng = random.Random(seed)
+    for _ in range(synthetic):
+        href = SITE + "".join(rng.choice(PARTS) for _ in range(rng.randint(1, 6))) + rng.choice(EXTS)
+        cases.append((href, rng.choice(TEXTS), rng.choice(HEADERS)))
+    return cases
+
+
+def route(href, text, header):
+    """Map one case; the folder is returned relative to BASE_DIR with '/' separators."""
+    dest, filename = actions.map_link_to_destination(href, text, header, BASE_DIR)
+    folder = os.path.relpath(dest, BASE_DIR).replace(os.sep, "/")
+    return ("" if folder == "." else folder), filename
+
+
+def clear_caches():
+    classify_link.cache_clear()
+    actions._link_destination.cache_clear()
+
+
+def write_golden(path):
+    cases = []
+    for href, text, header in build_corpus():
+        folder, filename = route(href, text, header)
+        cases.append({"href": href, "text": text, "header": header, "folder": folder, "filename": filename})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        json.dump({"base_dir": BASE_DIR, "cases": cases}, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    print(f"Recorded {len(cases)} case(s) to {path}")
+
+
+def bench(cases, repeat=5):
+    """Print links/s with empty caches and with warm caches."""
+    inputs = [(c["href"], c["text"], c["header"]) for c in cases]
+    for label, cold in (("cold (caches cleared)", True), ("cached", False)):
+        best = None
+        for _ in range(repeat):
+            if cold:
+                clear_caches()
+            started = time.perf_counter()
+            for href, text, header in inputs:
+                actions.map_link_to_destination(href, text, header, BASE_DIR)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"  {label:<22} {len(inputs) / best:>12,.0f} links/s  ({best * 1000:.1f} ms for {len(inputs)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check folder/file naming against the recorded golden corpus.")
+    parser.add_argument("--golden", default=str(GOLDEN_PATH), help="golden corpus JSON")
+    parser.add_argument("--write", action="store_true", help="re-record the corpus with the current code")
+    parser.add_argument("--bench", action="store_true", help="also measure mapping throughput")
+    args = parser.parse_args()
+
+    golden = pathlib.Path(args.golden)
+    if args.write:
+        write_golden(golden)
+        return
+
+    with open(golden, encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+
+    clear_caches()
+    failures = []
+    for case in cases:
+        got = route(case["href"], case["text"], case["header"])
+        if got != (case["folder"], case["filename"]):
+            failures.append((case, got))
+
+    for case, (folder, filename) in failures[:20]:
+        print(f"DIFF {case['href']!r} text={case['text']!r} header={case['header']!r}")
+        print(f"     expected {case['folder']}/{case['filename']}")
+        print(f"     got      {folder}/{filename}")
+    print(f"{len(cases) - len(failures)}/{len(cases)} case(s) match the golden corpus")
+
+    if args.bench:
+        print("\nMapping throughput:")
+        bench(cases)
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Deduplicate files that are already in the DSG archive.
+
+New downloads go through the content store as they are saved (see
+src/content_store.py). This hashes the files that were downloaded before
+dedup was turned on, so identical PDFs and MP3s saved under several months or
+languages become links to one stored copy too.
+
+    python tools/dedup_archive.py              # DSGS_DIR from .env
+    python tools/dedup_archive.py --dry-run    # only report what would be linked
+    python tools/dedup_archive.py --root D:\\DSGs
+    python tools/dedup_archive.py --prune      # only remove stored copies no file uses any more
+
+Stored copies that no archive file uses any more (a schedule that was
+highlighted after it was stored, a file that was deleted) are removed at the
+end of every run; --prune does only that, without hashing anything.
+"""
+
+import argparse
+import os
+import pathlib
+import sys
+
+# Set up paths so the src package can be imported
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src import content_store
+
+# only the downloaded document types are worth hashing
+EXTENSIONS = (".pdf", ".mp3", ".docx", ".doc", ".pptx")
+
+
+def iter_archive_files(root):
+    """Every document under `root`, skipping the store itself and hidden folders."""
+    for folder, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name.lower().endswith(EXTENSIONS):
+                yield os.path.join(folder, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link identical files in the DSG archive to one stored copy.")
+    parser.add_argument("--root", help="archive folder (default: DSGS_DIR)")
+    parser.add_argument("--dry-run", action="store_true", help="hash and report, change nothing")
+    parser.add_argument("--prune", action="store_true", help="only remove stored copies no archive file uses")
+    args = parser.parse_args()
+
+    root = args.root
+    if not root:
+        from src.config import DSGS_DIR
+
+        root = DSGS_DIR
+    if not os.path.isdir(root):
+        print(f"No archive folder at {root}")
+        sys.exit(1)
+
+    if args.prune:
+        if args.dry_run:
+            # a store that is not opened for downloads, so nothing prunes it on close
+            removed, freed = content_store.ContentStore(root).prune(dry_run=True)
+        else:
+            # closing the store prunes it and saves the index without the missing files
+            store = content_store.open_store(root)
+            content_store.close_stores()
+            removed, freed = store.pruned, store.bytes_pruned
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(f"{verb} {removed} unused stored object(s), {freed / (1024 * 1024):.1f} MB.")
+        return
+
+    if args.dry_run:
+        # group by digest without touching anything
+        seen = {}
+        duplicate_bytes = 0
+        duplicates = 0
+        for path in iter_archive_files(root):
+            digest = content_store.hash_file(path)
+            if digest in seen:
+                duplicates += 1
+                duplicate_bytes += os.path.getsize(path)
+                print(f"same as {os.path.relpath(seen[digest], root)}: {os.path.relpath(path, root)}")
+            else:
+                seen[digest] = path
+        print(f"{duplicates} duplicate file(s), {duplicate_bytes / (1024 * 1024):.1f} MB could be shared.")
+        return
+
+    store = content_store.open_store(root)
+    files = 0
+    for path in iter_archive_files(root):
+        files += 1
+        try:
+            store.add_file(path)
+        except OSError as e:
+            print(f"Skipped {path}: {e}")
+    content_store.close_stores()
+    print(f"Checked {files} file(s).")
+    print(store.summary() or "No duplicates found.")
+
+
+if __name__ == "__main__":
+    main()
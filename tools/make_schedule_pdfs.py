@@ -0,0 +1,212 @@
+"""
+Synthetic serving-schedule PDF generator (PyMuPDF).
+
+Draws district grids shaped like the real schedules `process_pdf` reads:
+- row 1: the title ('January 2026 Serving Schedule') in one wide cell
+- row 2: an empty corner cell, then one 'Sun Jan 4' style header per service date
+- then one row per location: 'London' plus service times in the first
+  column and minister names in the date cells
+
+Every cell border is drawn as a line, so pdfplumber's "lines" table
+strategy finds the grid like it does on the real files.
+
+    python tools/make_schedule_pdfs.py                  # default corpus into tools/fixtures/schedules
+    python tools/make_schedule_pdfs.py --out my_corpus --locations 40 --dates 13 --pages 3 --density 0.9
+
+The corpus folder gets a manifest.json with each file's grid size and how
+many times the target name appears, so benchmarks can check the parser's
+answers as well as its speed.
+"""
+
+import argparse
+import calendar
+import datetime
+import json
+import os
+import pathlib
+import random
+
+import fitz  # PyMuPDF
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+DEFAULT_OUT = ROOT / "tools" / "fixtures" / "schedules"
+TARGET_NAME = "Pr. Replay Benchmark"
+
+BASE_LOCATIONS = [
+    "London", "Sarnia", "Windsor", "Cambridge", "Woodstock", "Kitchener Spanish", "Kitchener East",
+    "Margaret Ave", "New Hamburg", "Guelph", "Fergus", "Hanover", "Owen Sound",
+]
+FIRST_NAMES = ["Adam", "Brian", "Carlos", "Daniel", "Erik", "Frank", "Georg", "Henry", "Ivan", "James",
+               "Karl", "Lukas", "Mark", "Noah", "Oscar", "Peter", "Rafael", "Simon", "Thomas", "Walter"]
+LAST_NAMES = ["Becker", "Fischer", "Graham", "Hoffmann", "Klein", "Lange", "Martin", "Neumann", "Olsen",
+              "Peters", "Richter", "Schmidt", "Taylor", "Vogel", "Wagner", "Weber", "Young", "Zimmer"]
+TITLES = ["Ap.", "Bp.", "Dist. Ev.", "Ev.", "Pr.", "Dc."]
+
+# name of each corpus file -> generator settings
+DEFAULT_CORPUS = {
+    "small": {"locations": 6, "dates": 5, "pages": 1, "density": 0.6},
+    "district": {"locations": 13, "dates": 9, "pages": 1, "density": 0.8},
+    "wide": {"locations": 13, "dates": 18, "pages": 1, "density": 0.8},
+    "long": {"locations": 40, "dates": 9, "pages": 3, "density": 0.8},
+    "dense": {"locations": 26, "dates": 13, "pages": 2, "density": 1.0},
+}
+
+
+def service_dates(year, month, count):
+    """Sundays and Wednesdays of the month (continuing into the next months if `count` needs more)."""
+    dates = []
+    day = datetime.date(year, month, 1)
+    while len(dates) < count:
+        if day.weekday() in (6, 2):
+            dates.append(day)
+        day += datetime.timedelta(days=1)
+    return dates
+
+
+def header_label(day):
+    # same shape as the real headers: 'Sun Jan 4'
+    return f"{day:%a %b} {day.day}"
+
+
+def location_names(count):
+    names = []
+    i = 0
+    while len(names) < count:
+        base = BASE_LOCATIONS[i % len(BASE_LOCATIONS)]
+        names.append(base if i < len(BASE_LOCATIONS) else f"{base} {i // len(BASE_LOCATIONS) + 1}")
+        i += 1
+    return names
+
+
+def minister_pool(rng, size=60):
+    pool = set()
+    while len(pool) < size:
+        pool.add(f"{rng.choice(TITLES)} {rng.choice(FIRST_NAMES)[0]}. {rng.choice(LAST_NAMES)}")
+    return sorted(pool)
+
+
+def build_grid(locations=13, dates=9, density=0.8, target=TARGET_NAME, target_share=0.05,
+               year=2026, month=1, seed=1):
+    """Return (title, headers, rows, target_count). Rows are [location cell, cell, cell, ...]."""
+    rng = random.Random(seed)
+    days = service_dates(year, month, dates)
+    headers = [""] + [header_label(d) for d in days]
+    pool = minister_pool(rng)
+    rows = []
+    target_count = 0
+    for loc in location_names(locations):
+        row = [f"{loc}\nSun 9:30 Wed 7:30"]
+        for _ in days:
+            if rng.random() >= density:
+                row.append("")
+                continue
+            if rng.random() < target_share:
+                names = [target]
+                target_count += 1
+            else:
+                names = [rng.choice(pool)]
+            # some services list a second minister (e.g. a visiting priest)
+            if rng.random() < 0.25:
+                names.append(rng.choice(pool))
+            row.append("\n".join(names))
+        rows.append(row)
+    title = f"{calendar.month_name[month]} {year} Serving Schedule"
+    return title, headers, rows, target_count
+
+
+def _draw_cell(page, rect, text, fontsize, bold=False):
+    page.draw_rect(rect, color=(0, 0, 0), width=0.6)
+    if not text:
+        return
+    inner = fitz.Rect(rect.x0 + 2, rect.y0 + 2, rect.x1 - 2, rect.y1 - 1)
+    font = "hebo" if bold else "helv"
+    size = fontsize
+    # shrink the text until it fits (long names in narrow columns)
+    while size >= 4:
+        if page.insert_textbox(inner, text, fontsize=size, fontname=font) >= 0:
+            return
+        size -= 0.5
+
+
+def write_schedule_pdf(path, title, headers, rows, pages=1, first_col=120, col=78, row_h=26):
+    """Draw the grid into `path`, spreading the location rows over `pages` pages."""
+    margin = 36
+    width = margin * 2 + first_col + col * (len(headers) - 1)
+    pages = max(1, min(pages, len(rows)))
+    per_page = -(-len(rows) // pages)
+    height = margin * 2 + row_h * (per_page + 2)
+
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=width, height=height)
+        y = margin
+        if p == 0:
+            # title row (one cell across the whole table) and the date header row
+            _draw_cell(page, fitz.Rect(margin, y, width - margin, y + row_h), title, 12, bold=True)
+            y += row_h
+            x = margin
+            for i, h in enumerate(headers):
+                w = first_col if i == 0 else col
+                _draw_cell(page, fitz.Rect(x, y, x + w, y + row_h), h, 9, bold=True)
+                x += w
+            y += row_h
+        for row in rows[p * per_page:(p + 1) * per_page]:
+            x = margin
+            for i, cell in enumerate(row):
+                w = first_col if i == 0 else col
+                _draw_cell(page, fitz.Rect(x, y, x + w, y + row_h), cell, 8, bold=(i == 0))
+                x += w
+            y += row_h
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def build_corpus(out_dir=DEFAULT_OUT, corpus=None, target=TARGET_NAME, seed=1):
+    """Write every PDF in `corpus` (name -> settings) plus manifest.json. Returns the manifest."""
+    corpus = corpus or DEFAULT_CORPUS
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"target": target, "files": []}
+    for i, (name, opts) in enumerate(corpus.items()):
+        title, headers, rows, hits = build_grid(
+            locations=opts["locations"], dates=opts["dates"], density=opts["density"],
+            target=target, seed=seed + i,
+        )
+        filename = f"January 2026 {name.title()} Serving Schedule.pdf"
+        path = os.path.join(out_dir, filename)
+        write_schedule_pdf(path, title, headers, rows, pages=opts["pages"])
+        manifest["files"].append({
+            "file": filename,
+            "locations": opts["locations"],
+            "dates": opts["dates"],
+            "pages": opts["pages"],
+            "density": opts["density"],
+            "target_count": hits,
+            "bytes": os.path.getsize(path),
+        })
+        print(f"Wrote {filename}: {opts['locations']} locations x {opts['dates']} dates, "
+              f"{opts['pages']} page(s), {hits} x '{target}'")
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic serving-schedule PDFs.")
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="output folder")
+    parser.add_argument("--target", default=TARGET_NAME, help="minister name planted in the grids")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--locations", type=int, help="make one custom file with this many location rows")
+    parser.add_argument("--dates", type=int, default=9, help="date columns for the custom file")
+    parser.add_argument("--pages", type=int, default=1, help="pages for the custom file")
+    parser.add_argument("--density", type=float, default=0.8, help="share of filled cells for the custom file")
+    args = parser.parse_args()
+
+    corpus = None
+    if args.locations:
+        corpus = {"custom": {"locations": args.locations, "dates": args.dates, "pages": args.pages, "density": args.density}}
+    build_corpus(args.out, corpus, target=args.target, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
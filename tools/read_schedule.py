@@ -1,31 +1,35 @@
 # Import system tools to handle files, dates, and text patterns
 import sys
 import os
-import glob
 import pathlib
 import datetime
 import re
 
 # Import the tool that creates pretty tables in your terminal
 from prettytable import PrettyTable, HRuleStyle
-# Import the tool that lets us use the private settings in your .env file
-from dotenv import load_dotenv
-# Import the function from your other file to send data to Google
-from sync_calendar import create_google_event
-
-# Load the private values (like your name) from the .env file
-load_dotenv()
 
 # Tell Python where the 'src' folder is so it can use your PDF reading tools
 ROOT = pathlib.Path(__file__).resolve().parent.parent
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+# Import the function from your other file to send data to Google
+# (imported through the 'tools' folder so main.py can use this file directly too)
+from tools.sync_calendar import sync_assignments, close_backend
+
 # Import the specific actions for extracting text and finding files
 from src.actions import (
     extract_text_from_pdf,
     find_schedule_pdfs,
+    is_excluded_schedule_path,
+    list_files_in_dir,
 )
+# Folder checks use the DSGS_DIR snapshot when main.py took one (faster on OneDrive)
+from src import fs_snapshot
+# Optional timing spans (only recorded when main.py runs with --trace)
+from src.tracing import span
+# Settings from your .env file (read once and shared with the rest of the app)
+from src.config import get_settings
 
 # This function takes a date like 'Sun Dec 28' and turns it into 'Sunday Dec 28'
 def format_display_date(raw_date):
@@ -44,20 +48,22 @@ def format_display_date(raw_date):
     return raw_date
 
 # This is the main engine that looks through a single PDF for your name
-def process_pdf(path: str, query: str | None = None):
+# Set sync=False to only find the assignments (the caller syncs them to the calendar itself)
+def process_pdf(path: str, query: str | None = None, sync: bool = True):
     # Get the full path and the simple filename for the PDF
     p_abs = os.path.abspath(path)
     filename = os.path.basename(p_abs)
     
     # Pull the raw text out of the PDF file
-    txt = extract_text_from_pdf(path)
+    with span("extract_text", file=filename):
+        txt = extract_text_from_pdf(path)
     if not txt:
-        return
+        return []
 
     # Clean the text into individual lines and remove empty ones
     lines = [line for line in txt.splitlines() if line.strip()]
     if not lines:
-        return
+        return []
 
     # Look at the first line to see if it's the Title (like 'December 2025')
     first_row_cells = [c.strip() for c in lines[0].split("|")]
@@ -92,10 +98,6 @@ def process_pdf(path: str, query: str | None = None):
     full_table.max_width = 25 
     full_table.hrules = HRuleStyle.ALL
 
-    # Pull the list of cities from your .env file
-    raw_locs = os.getenv("LOCATIONS", "")
-    locations_list = [l.strip() for l in raw_locs.split(",")] if raw_locs else []
-
     # Loop through every row in the PDF
     final_matches = []
     for loc_row in lines[header_row_index + 1:]:
@@ -130,12 +132,65 @@ def process_pdf(path: str, query: str | None = None):
         for m in final_matches:
             clean_city = re.split(r'\b(?:Sun|Wed|Mon|Tue|Thu|Fri|Sat)\b', m['location'])[0].strip()
             res_table.add_row([m['date'], clean_city])
-            create_google_event(m['date'], m['location'])
             
         print(res_table)
 
+    # Create, update or remove events so the calendar matches this schedule.
+    # This also runs with no matches so assignments taken off the schedule get deleted.
+    if query and sync:
+        result = sync_assignments(final_matches, filename, query)
+        print(
+            f"Calendar: {result['created']} created, {result['updated']} updated, {result['adopted']} adopted, "
+            f"{result['unchanged']} unchanged, {result['deleted']} removed, {result['failed']} failed"
+        )
+
+    return final_matches
+
+# Only serving schedules are parsed: PDFs in a 'Schedules' folder, skipping Youth and Seniors
+def is_serving_schedule(path):
+    if not path.lower().endswith(".pdf") or is_excluded_schedule_path(path):
+        return False
+    return os.path.basename(os.path.dirname(path)) == "Schedules"
+
+# The name to look for: the UI choice if there is one, otherwise SEARCH_NAME from .env
+def get_search_name(user_choices=None):
+    return (user_choices or {}).get("search_name") or get_settings().search_name or "Dc. Marcus Grau"
+
+# Run the calendar sync on an exact list of schedule files (used by main.py, no subprocess needed).
+# Returns {pdf path: [matches]} so the caller can see what was found.
+def sync_schedule_files(files, user_choices=None, search_name=None):
+    if search_name is None:
+        search_name = get_search_name(user_choices)
+
+    # Keep each file once, in the order it was downloaded
+    targets = []
+    seen = set()
+    for f in files:
+        key = os.path.normcase(os.path.abspath(f))
+        if key in seen:
+            continue
+        seen.add(key)
+        if is_serving_schedule(f):
+            targets.append(f)
+
+    if not targets:
+        print("No serving schedule PDFs to check for assignments.")
+        return {}
+
+    results = {}
+    try:
+        for f in targets:
+            results[f] = process_pdf(f, search_name)
+    finally:
+        # Write calendar feeds (ICS backend) and close the sync state store
+        close_backend()
+    return results
+
 # The logic to find and scan the correct month folders
 def main():
+    # The private values (like your name) come from the .env file, read once by src.config
+    settings = get_settings()
+
     if len(sys.argv) < 2:
         try:
             from src.config import DSGS_DIR
@@ -169,8 +224,8 @@ def main():
         # 4. FIND ALL PDF FILES
         found = []
         for d in (first_dir, second_dir):
-            if os.path.isdir(d):
-                pdfs = sorted(glob.glob(os.path.join(d, '*.pdf')))
+            if fs_snapshot.isdir(d):
+                pdfs = sorted(os.path.join(d, name) for name in list_files_in_dir(d, '*.pdf'))
                 if pdfs:
                     print(f"\nFound {len(pdfs)} file(s) in {d}:")
                     for f in pdfs:
@@ -182,14 +237,21 @@ def main():
             return
 
         # 5. PROCESS EVERY DISCOVERED PDF
-        search_name = os.getenv("SEARCH_NAME", "Dc. Marcus Grau")
-        for f in found:
-            process_pdf(f, search_name)
+        search_name = settings.search_name or "Dc. Marcus Grau"
+        try:
+            for f in found:
+                process_pdf(f, search_name)
+        finally:
+            # Write calendar feeds (ICS backend) and close the sync state store
+            close_backend()
     else:
         # Handle manual file path or 'scan' command
         target = sys.argv[1]
-        search_name = os.getenv("SEARCH_NAME", "Dc. Marcus Grau")
-        process_pdf(target, search_name)
+        search_name = settings.search_name or "Dc. Marcus Grau"
+        try:
+            process_pdf(target, search_name)
+        finally:
+            close_backend()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
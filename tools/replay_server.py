@@ -0,0 +1,478 @@
+"""
+Offline replay of the naccanada.org (iMIS) pages the downloader uses.
+
+Serves the home page, the iMIS sign-in form, MiniHQ, the Divine Service Prep
+and Schedules month pages and the files they link to, using the templates
+and the `site.json` manifest in tools/fixtures/minihq. The HTML keeps the
+element ids and structure from src/config.py and src/actions.py, so
+`main.py` runs against it unchanged:
+
+    python tools/replay_server.py --port 8765
+    # then in .env: URL="http://127.0.0.1:8765/"  USERNAME=replay  PASSWORD=replay
+
+Like iMIS, signing in sets an `.ASPXAUTH` cookie and MiniHQ pages and files
+need it. Files without the cookie get a 401 (or, with --login-redirect, a
+redirect to the sign-in page like the real site). Files are synthetic PDFs
+and MP3s of the sizes in `site.json`; put a real file under
+tools/fixtures/minihq/files/<url path> to serve that instead.
+
+Request counters (pages, files, bytes, redirects, ...) are available at
+/__replay/stats and reset with /__replay/reset.
+"""
+
+import argparse
+import calendar
+import datetime
+import http.cookies
+import json
+import os
+import pathlib
+import secrets
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+FIXTURES_DIR = pathlib.Path(__file__).resolve().parent / "fixtures" / "minihq"
+
+FILES_PREFIX = "/common/Uploaded files"
+SIGN_IN_PATH = "/Sign_In.aspx"
+MINIHQ_PATH = "/MiniHQ"
+MINIHQ_LINK_ID = "ctl01_Auxiliary_Auxiliary_rptWrapper_Auxiliary_rptWrapper_rpt_ctl02_NavigationLink"
+LANGUAGE_NAMES = {"en": "English", "fr": "French", "de": "German", "es": "Spanish"}
+
+
+# -----------------------------
+# synthetic files
+# -----------------------------
+def make_pdf(title, size=0):
+    """Return a small valid one-page PDF showing `title`, padded to about `size` bytes."""
+    text = title.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    content = f"BT /F1 18 Tf 72 720 Td ({text}) Tj ET\nBT /F1 10 Tf 72 700 Td (DSG Downloader replay fixture) Tj ET\n"
+    content = content.encode("latin-1", "replace")
+    # pad the page stream with PDF comments so downloads have a realistic size
+    missing = size - len(content) - 600
+    if missing > 0:
+        line = b"% replay fixture padding " + b"." * 53 + b"\n"
+        content += line * (missing // len(line) + 1)
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length " + str(len(content)).encode() + b" >>\nstream\n" + content + b"endstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def make_mp3(size):
+    """Return silent MPEG-1 Layer III frames (128 kbit/s, 44.1 kHz) behind an ID3 tag, about `size` bytes."""
+    header = b"ID3\x04\x00\x00\x00\x00\x00\x00"
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+    return header + frame * max(1, (size - len(header)) // len(frame))
+
+
+# -----------------------------
+# site model
+# -----------------------------
+def sundays(month_label):
+    """Return the Sundays (date objects) of a 'January 2026' style label."""
+    dt = datetime.datetime.strptime(month_label, "%B %Y")
+    days = calendar.monthrange(dt.year, dt.month)[1]
+    return [
+        datetime.date(dt.year, dt.month, d)
+        for d in range(1, days + 1)
+        if datetime.date(dt.year, dt.month, d).weekday() == 6
+    ]
+
+
+def month_slug(month_label):
+    return month_label.replace(" ", "-")
+
+
+def file_url(*parts):
+    """Build a quoted URL path under the iMIS uploaded-files folder."""
+    return quote("/".join([FILES_PREFIX] + list(parts)))
+
+
+class ReplaySite:
+    """Pages and files of the replayed site, built from `site.json` and the HTML templates."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self.dir = pathlib.Path(fixtures_dir)
+        with open(self.dir / "site.json", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.templates = {
+            name: Template((self.dir / f"{name}.html").read_text(encoding="utf-8"))
+            for name in ("home", "sign_in", "minihq", "dsg_month", "schedules_month")
+        }
+        self.months = list(self.manifest.get("months") or [])
+        # url path (unquoted) -> (content type, size, title)
+        self.files = {}
+        self.dsg_pages = {}
+        self.schedule_pages = {}
+        for month in self.months:
+            self.dsg_pages[month_slug(month)] = self._dsg_sections(month)
+            self.schedule_pages[month_slug(month)] = self._schedule_sections(month)
+
+    def _size(self, kind):
+        return int((self.manifest.get("sizes_kb") or {}).get(kind, 100)) * 1024
+
+    def _add_file(self, url, kind, title):
+        ctype = "audio/mpeg" if url.endswith(".mp3") else "application/pdf"
+        self.files[unquote(url)] = (ctype, self._size(kind), title)
+        return url
+
+    def _dsg_sections(self, month):
+        """Return [(header, [(link text, href), ...]), ...] for a Divine Service Prep month page."""
+        m = self.manifest
+        sections = []
+        for day in sundays(month):
+            iso = day.isoformat()
+            links = []
+            for code in m.get("dsg_languages", []):
+                lang = LANGUAGE_NAMES.get(code, code)
+                links.append((lang, self._add_file(
+                    file_url("Divine Service Prep", lang, f"DSG-{iso}-{code}.pdf"), "dsg", f"DSG {iso} {lang}")))
+            for code in m.get("audio_languages", []):
+                lang = LANGUAGE_NAMES.get(code, code)
+                links.append((f"Audio ({lang})", self._add_file(
+                    file_url("Divine Service Prep", lang, "Audio", f"DSG-{iso}-Audio-{code}.mp3"), "audio", "")))
+            for code in m.get("transcript_languages", []):
+                lang = LANGUAGE_NAMES.get(code, code)
+                links.append((f"Transcript ({lang})", self._add_file(
+                    file_url("Divine Service Prep", lang, "Transcripts", f"DSG-{iso}-Transcript-{code}.pdf"),
+                    "transcript", f"Transcript {iso} {lang}")))
+            sections.append((f"{day:%A, %B} {day.day}, {day.year}", links))
+
+        full = []
+        for lang in m.get("full_dsg_languages", []):
+            full.append((lang, self._add_file(
+                file_url("Divine Service Prep", "Full DSG", f"{month} Full DSG {lang}.pdf"),
+                "full_dsg", f"{month} Full DSG {lang}")))
+        if full:
+            sections.append(("Full DSG", full))
+        return sections
+
+    def _schedule_sections(self, month):
+        """Return [(section title, [(link text, href), ...]), ...] for a Schedules month page."""
+        m = self.manifest
+        year = month.split()[-1]
+        groups = [
+            ("Serving Schedules", m.get("serving_locations", []),
+             lambda loc: file_url("Serving Schedules", month, f"{loc} Serving Schedule.pdf")),
+            ("Youth Schedules", m.get("youth_locations", []),
+             lambda loc: file_url("Youth Schedules", month, f"{loc} Youth Serving Schedule.pdf")),
+            ("Seniors Schedules", m.get("seniors_locations", []),
+             lambda loc: file_url("Seniors Schedules", month, f"{loc} Seniors Schedule.pdf")),
+            ("NACC Calendars", m.get("nacc_calendars", []),
+             lambda loc: file_url("NACC Calendars", year, f"{month} NACC Calendar {loc}.pdf")),
+        ]
+        sections = []
+        for title, names, make_url in groups:
+            links = [(name, self._add_file(make_url(name), "schedule", f"{month} {name} {title}")) for name in names]
+            if links:
+                sections.append((title, links))
+        return sections
+
+    # -----------------------------
+    # rendering
+    # -----------------------------
+    def home(self, signed_in):
+        if signed_in:
+            minihq = f'<li><a id="{MINIHQ_LINK_ID}" href="{MINIHQ_PATH}">MiniHQ</a></li>'
+            status = '<a id="ctl01_LoginStatus1" href="/Sign_Out.aspx">Sign Out</a>'
+        else:
+            minihq = ""
+            status = f'<a id="ctl01_LoginStatus1" href="{SIGN_IN_PATH}">Sign In</a>'
+        return self.templates["home"].substitute(minihq_link=minihq, login_status=status)
+
+    def sign_in(self, return_url="/", error=""):
+        err = f'<p class="error">{error}</p>' if error else ""
+        return self.templates["sign_in"].substitute(return_url=quote(return_url, safe=""), error=err)
+
+    def minihq(self):
+        dsg = "\n".join(
+            f'        <li><a href="{MINIHQ_PATH}/Divine-Service-Prep/{month_slug(m)}.aspx">{m}</a></li>'
+            for m in self.months
+        )
+        sched = "\n".join(
+            f'        <li><a href="{MINIHQ_PATH}/Schedules/{month_slug(m)}.aspx">{m}</a></li>'
+            for m in self.months
+        )
+        return self.templates["minihq"].substitute(dsg_links=dsg, schedule_links=sched)
+
+    def dsg_month(self, slug):
+        sections = self.dsg_pages.get(slug)
+        if sections is None:
+            return None
+        parts = []
+        for header, links in sections:
+            items = "\n".join(f'          <li><a href="{href}">{text}</a></li>' for text, href in links)
+            parts.append(
+                f'    <h4 class="ui-accordion-header">{header}</h4>\n'
+                f'    <div class="ui-accordion-content">\n        <ul>\n{items}\n        </ul>\n    </div>'
+            )
+        return self.templates["dsg_month"].substitute(month=slug.replace("-", " "), sections="\n".join(parts))
+
+    def schedules_month(self, slug):
+        sections = self.schedule_pages.get(slug)
+        if sections is None:
+            return None
+        rows = []
+        for title, links in sections:
+            rows.append(f"    <tr><td><h3>{title}</h3></td></tr>")
+            for text, href in links:
+                rows.append(f'    <tr><td><a href="{href}">{text}</a></td></tr>')
+        return self.templates["schedules_month"].substitute(month=slug.replace("-", " "), rows="\n".join(rows))
+
+    def file_body(self, path):
+        """Return (content type, bytes) for a file path (unquoted), or None."""
+        info = self.files.get(path)
+        if info is None:
+            return None
+        override = self.dir / "files" / path.lstrip("/")
+        if override.is_file():
+            return info[0], override.read_bytes()
+        return info[0], _synthetic_body(path, *info)
+
+
+@lru_cache(maxsize=512)
+def _synthetic_body(path, ctype, size, title):
+    if ctype == "audio/mpeg":
+        return make_mp3(size)
+    return make_pdf(title or os.path.basename(path), size)
+
+
+# -----------------------------
+# HTTP server
+# -----------------------------
+class ReplayStats:
+    """Thread-safe request counters."""
+
+    FIELDS = ("requests", "pages", "page_bytes", "files", "file_bytes", "redirects", "denied", "logins", "not_found")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.values = {k: 0 for k in self.FIELDS}
+
+    def add(self, **counts):
+        with self._lock:
+            for k, v in counts.items():
+                self.values[k] += v
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    server_version = "Microsoft-IIS/10.0"
+
+    # set on the server instance: site, stats, sessions, latency, login_redirect, quiet
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def _cookies(self):
+        jar = http.cookies.SimpleCookie()
+        try:
+            jar.load(self.headers.get("Cookie", ""))
+        except http.cookies.CookieError:
+            pass
+        return {k: m.value for k, m in jar.items()}
+
+    def _signed_in(self):
+        return self._cookies().get(".ASPXAUTH") in self.server.sessions
+
+    def _send(self, status, body=b"", ctype="text/html; charset=utf-8", headers=None, kind="pages"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        if "ASP.NET_SessionId" not in self._cookies():
+            self.send_header("Set-Cookie", f"ASP.NET_SessionId={secrets.token_hex(12)}; path=/; HttpOnly")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        if kind == "pages":
+            self.server.stats.add(pages=1, page_bytes=len(body))
+        elif kind == "files":
+            self.server.stats.add(files=1, file_bytes=len(body))
+
+    def _redirect(self, location, headers=None):
+        hdrs = {"Location": location}
+        hdrs.update(headers or {})
+        self.server.stats.add(redirects=1)
+        self._send(302, b"", headers=hdrs, kind=None)
+
+    def _require_login(self, path):
+        self.server.stats.add(denied=1)
+        if self.server.login_redirect:
+            self._redirect(f"{SIGN_IN_PATH}?ReturnUrl={quote(path, safe='')}")
+        else:
+            self._send(401, "<h1>401 - Unauthorized</h1>", kind=None)
+
+    def _not_found(self):
+        self.server.stats.add(not_found=1)
+        self._send(404, "<h1>404 - File or directory not found.</h1>", kind=None)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        self.server.stats.add(requests=1)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        path = unquote(parts.path)
+        site = self.server.site
+
+        if path == "/__replay/stats":
+            return self._send(200, json.dumps(self.server.stats.snapshot()), "application/json", kind=None)
+        if path == "/__replay/reset":
+            self.server.stats.reset()
+            return self._send(200, "{}", "application/json", kind=None)
+
+        if path in ("/", "/Home.aspx"):
+            return self._send(200, site.home(self._signed_in()))
+        if path == SIGN_IN_PATH:
+            return_url = (parse_qs(parts.query).get("ReturnUrl") or ["/"])[0]
+            return self._send(200, site.sign_in(return_url))
+        if path == "/Sign_Out.aspx":
+            token = self._cookies().get(".ASPXAUTH")
+            self.server.sessions.discard(token)
+            return self._redirect("/", {"Set-Cookie": ".ASPXAUTH=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT"})
+
+        if path == MINIHQ_PATH or path.startswith(MINIHQ_PATH + "/") or path.startswith(FILES_PREFIX + "/"):
+            if not self._signed_in():
+                return self._require_login(parts.path)
+
+        if path == MINIHQ_PATH:
+            return self._send(200, site.minihq())
+        if path.startswith(MINIHQ_PATH + "/Divine-Service-Prep/"):
+            page = site.dsg_month(path.rsplit("/", 1)[1].replace(".aspx", ""))
+            return self._send(200, page) if page is not None else self._not_found()
+        if path.startswith(MINIHQ_PATH + "/Schedules/"):
+            page = site.schedules_month(path.rsplit("/", 1)[1].replace(".aspx", ""))
+            return self._send(200, page) if page is not None else self._not_found()
+        if path.startswith(FILES_PREFIX + "/"):
+            found = site.file_body(path)
+            if found is None:
+                return self._not_found()
+            ctype, body = found
+            name = os.path.basename(path)
+            return self._send(200, body, ctype, {"Content-Disposition": f'inline; filename="{name}"'}, kind="files")
+        return self._not_found()
+
+    def do_POST(self):
+        self.server.stats.add(requests=1)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        if unquote(parts.path) != SIGN_IN_PATH:
+            return self._not_found()
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8", "replace"))
+        user = (form.get("signInUserName") or [""])[0]
+        pwd = (form.get("signInPassword") or [""])[0]
+        return_url = (parse_qs(parts.query).get("ReturnUrl") or ["/"])[0]
+        manifest = self.server.site.manifest
+        if user != manifest.get("username", user) or pwd != manifest.get("password", pwd):
+            return self._send(200, self.server.site.sign_in(return_url, "Invalid username or password."))
+        token = secrets.token_hex(32)
+        self.server.sessions.add(token)
+        self.server.stats.add(logins=1)
+        return self._redirect(return_url or "/", {"Set-Cookie": f".ASPXAUTH={token}; path=/; HttpOnly"})
+
+
+class ReplayServer:
+    """Runs the replay site on a background thread: `start()`, `.url`, `stats()`, `stop()`."""
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, host="127.0.0.1", port=0, latency_ms=0,
+                 login_redirect=False, quiet=True):
+        self.httpd = ThreadingHTTPServer((host, port), ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.site = ReplaySite(fixtures_dir)
+        self.httpd.stats = ReplayStats()
+        self.httpd.sessions = set()
+        self.httpd.latency = max(0, latency_ms) / 1000.0
+        self.httpd.login_redirect = login_redirect
+        self.httpd.quiet = quiet
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def site(self):
+        return self.httpd.site
+
+    def stats(self):
+        return self.httpd.stats.snapshot()
+
+    def reset_stats(self):
+        self.httpd.stats.reset()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve an offline replay of the MiniHQ site.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="folder with site.json and the HTML templates")
+    parser.add_argument("--latency-ms", type=int, default=0, help="delay added to every request")
+    parser.add_argument("--login-redirect", action="store_true",
+                        help="redirect signed-out file requests to the sign-in page (like the live site) instead of 401")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixtures, args.host, args.port, args.latency_ms, args.login_redirect, quiet=not args.verbose)
+    site = server.site
+    print(f"Replaying MiniHQ at {server.url} ({len(site.months)} months, {len(site.files)} files)")
+    print(f"Sign in with USERNAME={site.manifest.get('username')} PASSWORD={site.manifest.get('password')}")
+    print("Press Ctrl+C to stop.")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
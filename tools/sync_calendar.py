@@ -1,18 +1,31 @@
-# Import tools for Google API, timezones, and text patterns
+# Import tools for file paths, dates, and text patterns
+# (the Google API and timezone libraries are loaded inside the functions that use them,
+# so parsing schedules or writing ICS feeds does not have to load them)
 import os.path
+import pathlib
 import re
-import pytz
+import sys
 from datetime import datetime, timedelta
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+# Tell Python where the 'src' folder is so it can use the calendar backends and state store
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.calendar_backends import get_backend as make_backend
+from src.config import get_settings
+from src.calendar_state import assignment_key, content_hash
 
 # Define what permissions we need (Reading and Writing to the Calendar)
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
 # This function handles the "Login" with Google
 def get_calendar_service():
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     # Check if we already have a 'token.json' file (logged in previously)
     if os.path.exists('token.json'):
@@ -33,91 +46,203 @@ def get_calendar_service():
     # Build the official Google Calendar connection tool
     return build('calendar', 'v3', credentials=creds)
 
-# This is the main function that puts your assignment into Google Calendar
-def create_google_event(date_str, location_str, title=None):
+# This builds the event Google needs from a date like 'Sunday Dec 28' and a location cell
+# Returns (event_body, start_dt) or None if the cell has no service time in it
+def build_event_body(date_str, location_str, title=None, name=None, source=None):
+    # Fetch search_name from env (default to 'Scheduled Service' if missing)
+    settings = get_settings()
+    if name is None:
+        name = settings.search_name or "Scheduled Service"
+
+    # 1. Figure out the Year and Time
+    now = datetime.now()
+    year = now.year
+    # If it's currently December but the schedule is for January, it's next year
+    if now.month == 12 and "Jan" in date_str:
+        year += 1
+
+    # Use a pattern search to find the time (like 10:30 AM) in the location text
+    time_match = re.search(r'(\d{1,2}:\d{2}\s+[AP]M)', location_str)
+    if not time_match:
+        return None
+
+    # Combine the date and time into a format Python understands
+    clean_time = time_match.group(1)
+    start_dt = datetime.strptime(f"{date_str} {year} {clean_time}", "%A %b %d %Y %I:%M %p")
+
+    # Get your settings (Timezone, how long the service is, and reminder time) from .env
+    tz_name = settings.local_timezone
+    duration = settings.service_duration_hours
+    reminder_min = settings.reminder_minutes
+
+    # Attach the correct timezone to the time
+    import pytz
+    local_tz = pytz.timezone(tz_name)
+    start_dt = local_tz.localize(start_dt)
+    # Calculate when the service ends (e.g., 1.5 hours after it starts)
+    end_dt = start_dt + timedelta(hours=duration)
+
+    # 2. Get the City Name and set the Event Title
+    city_name = clean_city_name(location_str)
+    if title is None:
+        title = f"{name} | Scheduled in {city_name}"
+
+    event_body = {
+        'summary': title,
+        'location': city_name,
+        'description': f"{name} | Scheduled in {city_name}",
+        'start': {
+            'dateTime': start_dt.isoformat(),
+            'timeZone': tz_name,
+        },
+        'end': {
+            'dateTime': end_dt.isoformat(),
+            'timeZone': tz_name,
+        },
+        'reminders': {
+            'useDefault': False,
+            # Set the custom reminder (e.g., 1440 minutes = 1 day before)
+            'overrides': [{'method': 'popup', 'minutes': reminder_min}],
+        },
+        # Remember who and which schedule this came from, so it can be found again later
+        'extendedProperties': {
+            'private': {
+                'dsgMinister': name,
+                'dsgSource': source or '',
+            },
+        },
+    }
+    return event_body, start_dt
+
+# Strip the service times off a location cell (e.g. 'London Sun 9:30 AM' -> 'London')
+def clean_city_name(location_str):
+    return re.split(r'\b(?:Sun|Wed|Mon|Tue|Thu|Fri|Sat)\b', location_str)[0].strip()
+
+# Pick the calendar backend from .env (CALENDAR_BACKEND=google|ics|memory).
+# One backend is shared for the whole run so feeds are written once and Google is logged into once.
+_BACKEND = None
+
+def get_backend():
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = make_backend(get_settings().calendar_backend, get_calendar_service)
+    return _BACKEND
+
+# Finish the run: write any calendar feeds and close the local state store
+def close_backend():
+    global _BACKEND
+    if _BACKEND is not None:
+        _BACKEND.close()
+        _BACKEND = None
+
+# This is the main function that puts your assignment into the calendar
+def create_google_event(date_str, location_str, title=None, backend=None):
     try:
-        # Get our connection to Google
-        service = get_calendar_service()
-        
-        # Fetch search_name from env (default to 'Scheduled Service' if missing)
-        name = os.getenv("SEARCH_NAME", "Scheduled Service")
-
-        # 1. Figure out the Year and Time
-        now = datetime.now()
-        year = now.year
-        # If it's currently December but the schedule is for January, it's next year
-        if now.month == 12 and "Jan" in date_str:
-            year += 1
-
-        # Use a pattern search to find the time (like 10:30 AM) in the location text
-        time_match = re.search(r'(\d{1,2}:\d{2}\s+[AP]M)', location_str)
-        if not time_match: 
-            return
-        
-        # Combine the date and time into a format Python understands
-        clean_time = time_match.group(1)
-        start_dt = datetime.strptime(f"{date_str} {year} {clean_time}", "%A %b %d %Y %I:%M %p")
-        
-        # Get your settings (Timezone, how long the service is, and reminder time) from .env
-        tz_name = os.getenv("LOCAL_TIMEZONE", "America/Toronto")
-        duration = float(os.getenv("SERVICE_DURATION_HOURS", 1.5))
-        reminder_min = int(os.getenv("REMINDER_MINUTES", 1440))
-        
-        # Attach the correct timezone to the time
-        local_tz = pytz.timezone(tz_name)
-        start_dt = local_tz.localize(start_dt)
-        # Calculate when the service ends (e.g., 1.5 hours after it starts)
-        end_dt = start_dt + timedelta(hours=duration)
-
-        # 2. Get the City Name and set the Event Title
-        city_name = re.split(r'\b(?:Sun|Wed|Mon|Tue|Thu|Fri|Sat)\b', location_str)[0].strip()
-        if title is None:
-            title = f"{name} | Scheduled in {city_name}"
+        built = build_event_body(date_str, location_str, title=title)
+        if not built:
+            return None
+        event_body, start_dt = built
+        title = event_body['summary']
+
+        # Get our connection to the calendar
+        if backend is None:
+            backend = get_backend()
 
         # 3. Check for Duplicates (So we don't add the same service twice)
-        # Search a 5-minute window around the start time
-        time_min = (start_dt - timedelta(minutes=5)).isoformat()
-        time_max = (start_dt + timedelta(minutes=5)).isoformat()
-        
-        # Ask Google for a list of events already in that time slot
-        events_result = service.events().list(
-            calendarId='primary', 
-            timeMin=time_min, 
-            timeMax=time_max,
-            singleEvents=True
-        ).execute()
-        
-        # If an event with the same title exists, skip adding it
-        existing_events = events_result.get('items', [])
-        for event in existing_events:
-            if event.get('summary') == title:
-                print(f"Skipping: '{title}' already exists in your calendar.")
-                return 
-
-        # 4. Create the Calendar Event
-        event_body = {
-            'summary': title,
-            'location': city_name,
-            'description': f"{name} | Scheduled in {city_name}",
-            'start': {
-                'dateTime': start_dt.isoformat(),
-                'timeZone': tz_name,
-            },
-            'end': {
-                'dateTime': end_dt.isoformat(),
-                'timeZone': tz_name,
-            },
-            'reminders': {
-                'useDefault': False,
-                # Set the custom reminder (e.g., 1440 minutes = 1 day before)
-                'overrides': [{'method': 'popup', 'minutes': reminder_min}],
-            },
-        }
+        existing_id = backend.find_event(title, start_dt)
+        if existing_id:
+            print(f"Skipping: '{title}' already exists in your calendar.")
+            return existing_id
 
-        # Send the event to Google and print the success message
-        service.events().insert(calendarId='primary', body=event_body).execute()
+        # 4. Send the event to the calendar and print the success message
+        event_id = backend.insert_event(event_body)
         print(f"Successfully created: {title} on {date_str}")
+        return event_id
 
     except Exception as e:
         # If anything goes wrong, print the error so we can fix it
-        print(f"Error managing Google event: {e}")
\ No newline at end of file
+        print(f"Error managing Google event: {e}")
+        return None
+
+# This keeps the calendar in step with one schedule PDF.
+# `assignments` is the list of {'date': ..., 'location': ...} matches found in `source`.
+# - new assignments are created
+# - changed assignments have their existing event patched
+# - unchanged assignments are skipped without talking to the calendar at all
+# - assignments already in the calendar (but not yet remembered) are adopted instead of created again
+# - assignments that disappeared from the schedule have their event deleted
+# Feed backends (ICS) get the whole list for this schedule at once and rewrite the feeds at the end of the run.
+def sync_assignments(assignments, source, name=None, backend=None):
+    if name is None:
+        name = get_settings().search_name or "Scheduled Service"
+    if backend is None:
+        backend = get_backend()
+
+    summary = {'created': 0, 'updated': 0, 'adopted': 0, 'unchanged': 0, 'deleted': 0, 'failed': 0}
+    seen_keys = set()
+    # events for a feed backend, handed over together once the schedule is read
+    feed_events = []
+    for m in assignments:
+        built = build_event_body(m['date'], m['location'], name=name, source=source)
+        if not built:
+            continue
+        event_body, start_dt = built
+        title = event_body['summary']
+        key = assignment_key(name, m['date'], event_body['location'], source)
+        seen_keys.add(key)
+
+        if not backend.incremental:
+            feed_events.append((key, event_body))
+            summary['created'] += 1
+            continue
+
+        digest = content_hash(event_body)
+        stored = backend.store.get(key)
+        if stored and stored['content_hash'] == digest:
+            summary['unchanged'] += 1
+            continue
+
+        try:
+            if stored:
+                # Same assignment, different details (time, duration, reminder...) -> patch in place
+                backend.patch_event(stored['event_id'], event_body)
+                event_id = stored['event_id']
+                summary['updated'] += 1
+                print(f"Updated: {title} on {m['date']}")
+            else:
+                # First time we see this assignment; adopt a matching event if one is already there
+                event_id = backend.find_event(title, start_dt)
+                if event_id:
+                    # Already in the calendar (made by hand or by an older version); remember it from now on
+                    summary['adopted'] += 1
+                    print(f"Skipping: '{title}' already exists in your calendar.")
+                else:
+                    event_id = backend.insert_event(event_body, key=key)
+                    summary['created'] += 1
+                    print(f"Successfully created: {title} on {m['date']}")
+            backend.store.upsert(key, name, m['date'], event_body['location'], source, event_id, digest)
+        except Exception as e:
+            summary['failed'] += 1
+            print(f"Error managing calendar event: {e}")
+
+    if not backend.incremental:
+        # replaces what this schedule had in the feed, so removed assignments disappear too
+        backend.replace_source(source, name, feed_events)
+        return summary
+
+    # Anything we created earlier from this schedule that is no longer in it gets removed
+    for row in backend.store.rows_for_source(source):
+        if row['key'] in seen_keys or row['minister'] != name:
+            continue
+        try:
+            backend.delete_event(row['event_id'])
+            print(f"Removed: {row['location']} on {row['date']} (no longer on {source})")
+        except Exception as e:
+            # Keep the row so we try again next run
+            summary['failed'] += 1
+            print(f"Error removing calendar event: {e}")
+            continue
+        backend.store.delete(row['key'])
+        summary['deleted'] += 1
+
+    return summary